@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Nomur 基准测试历史
+每次测试/压测结束后把各接口的延迟百分位、吞吐和错误率写入本地 SQLite，按 git 提交和
+数据规模（订单行数）归档；compare 命令把一次运行与之前的基线对比，只标出统计上显著的退化。
+
+- 延迟：Mann-Whitney U 检验比较两次运行的服务延迟直方图（按桶处理并列值），
+  显著且 p50 增幅超过阈值才算退化
+- 尾延迟：超过基线 p99 的请求比例做双比例 z 检验，显著且 p99 增幅超过阈值才算退化
+- 错误率：双比例 z 检验
+显著性检验使用 service 直方图，其中每个样本对应一次真实请求；response 直方图可能含
+协调遗漏修正补记的样本，只用于展示百分位。
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from test_api import EndpointLatency, LatencyHistogram
+
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.benchmarks', 'history.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    git_commit TEXT,
+    git_dirty INTEGER NOT NULL DEFAULT 0,
+    dataset_size INTEGER,
+    source TEXT NOT NULL,
+    label TEXT NOT NULL DEFAULT '',
+    elapsed REAL
+);
+CREATE TABLE IF NOT EXISTS endpoint_results (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    endpoint TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    error_rate REAL NOT NULL,
+    throughput REAL,
+    p50_ms REAL, p90_ms REAL, p95_ms REAL, p99_ms REAL, p999_ms REAL,
+    mean_ms REAL, max_ms REAL,
+    histogram TEXT NOT NULL,
+    PRIMARY KEY (run_id, endpoint)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_key ON runs (source, label, dataset_size);
+"""
+
+# 两个样本均少于该数量时不做检验
+MIN_SAMPLES = 20
+
+
+def git_commit(cwd: Optional[str] = None) -> Tuple[Optional[str], bool]:
+    """当前 git 提交和工作区是否有未提交的改动，不在仓库中时返回 (None, False)"""
+    cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=cwd, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status.strip())
+
+
+def dataset_size(db_config: Dict = None) -> Optional[int]:
+    """nomur 库的订单行数，作为数据规模；无法连接数据库时返回 None"""
+    try:
+        import pymysql
+        from seed_data import DB_CONFIG
+        conn = pymysql.connect(**{**DB_CONFIG, **(db_config or {})})
+    except Exception as e:
+        print(f"⚠ 无法读取数据规模（{e}），可用 --dataset-size 指定")
+        return None
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM orders')
+            return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def mann_whitney_p(baseline: LatencyHistogram, candidate: LatencyHistogram) -> float:
+    """单侧 Mann-Whitney U 检验：candidate 的延迟整体大于 baseline 的 p 值
+
+    同一个桶内的值视为并列，取平均秩并做并列修正，使用带连续性修正的正态近似。
+    """
+    n1, n2 = candidate.total_count, baseline.total_count
+    n = n1 + n2
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    rank = 0
+    rank_sum = 0.0
+    ties = 0
+    for index in sorted(set(baseline.counts) | set(candidate.counts)):
+        c = candidate.counts.get(index, 0)
+        t = c + baseline.counts.get(index, 0)
+        rank_sum += c * (rank + (t + 1) / 2.0)
+        ties += t ** 3 - t
+        rank += t
+    u = rank_sum - n1 * (n1 + 1) / 2.0
+    variance = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2.0 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def two_proportion_p(k1: int, n1: int, k2: int, n2: int) -> float:
+    """单侧双比例 z 检验：k2/n2 大于 k1/n1 的 p 值"""
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    pooled = (k1 + k2) / (n1 + n2)
+    se = math.sqrt(pooled * (1 - pooled) * (1.0 / n1 + 1.0 / n2))
+    if se == 0:
+        return 1.0
+    z = (k2 / n2 - k1 / n1) / se
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def count_above(hist: LatencyHistogram, value_us: int) -> int:
+    """直方图中大于 value_us 的样本数（按桶上界判断）"""
+    return sum(count for index, count in hist.counts.items() if hist._value_at(index) > value_us)
+
+
+@dataclass
+class EndpointComparison:
+    """单个接口在基线与本次运行之间的对比"""
+    endpoint: str
+    baseline: Optional[Dict]
+    current: Optional[Dict]
+    latency_p: Optional[float] = None
+    tail_p: Optional[float] = None
+    error_p: Optional[float] = None
+    regressions: List[str] = field(default_factory=list)
+
+    def change(self, column: str) -> Optional[float]:
+        """相对基线的变化比例"""
+        if not self.baseline or not self.current or not self.baseline.get(column):
+            return None
+        return self.current[column] / self.baseline[column] - 1
+
+
+class BenchmarkHistory:
+    """SQLite 中的基准测试历史"""
+
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, source: str, latencies: Dict[str, EndpointLatency], errors: Dict[str, int] = None,
+               elapsed: Optional[float] = None, dataset_size: Optional[int] = None, label: str = '',
+               commit: Optional[str] = None) -> int:
+        """保存一次运行，返回运行编号
+
+        source 为测试类型（如 api_test、load），label 描述运行配置；只有 source、label 相同且
+        数据规模相近的运行之间才会互相比较。errors 为各接口额外的错误数（如压测结果中单独统计的错误）。
+        """
+        errors = errors or {}
+        dirty = False
+        if commit is None:
+            commit, dirty = git_commit()
+        with self.conn:
+            run_id = self.conn.execute(
+                'INSERT INTO runs (created_at, git_commit, git_dirty, dataset_size, source, label, elapsed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (datetime.now().isoformat(timespec='seconds'), commit, int(dirty), dataset_size,
+                 source, label, elapsed)).lastrowid
+            for endpoint, latency in latencies.items():
+                count = latency.count
+                if not count:
+                    continue
+                error_count = latency.errors + errors.get(endpoint, 0)
+                s = latency.response.summary()
+                s.update(latency.response.percentiles_ms((95,)))
+                self.conn.execute(
+                    'INSERT INTO endpoint_results (run_id, endpoint, count, errors, error_rate, throughput, '
+                    'p50_ms, p90_ms, p95_ms, p99_ms, p999_ms, mean_ms, max_ms, histogram) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (run_id, endpoint, count, error_count, error_count / count,
+                     count / elapsed if elapsed else None, s['p50'], s['p90'], s['p95'], s['p99'],
+                     s['p99.9'], s['mean_ms'], s['max_ms'], json.dumps(latency.to_dict())))
+        return run_id
+
+    def runs(self, limit: int = 20, source: Optional[str] = None) -> List[sqlite3.Row]:
+        sql = 'SELECT * FROM runs'
+        args: List = []
+        if source:
+            sql += ' WHERE source = ?'
+            args.append(source)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        return self.conn.execute(sql, args + [limit]).fetchall()
+
+    def run(self, run_id: Optional[int] = None) -> Optional[sqlite3.Row]:
+        """指定编号的运行，未指定时为最近一次"""
+        if run_id is None:
+            return self.conn.execute('SELECT * FROM runs ORDER BY id DESC LIMIT 1').fetchone()
+        return self.conn.execute('SELECT * FROM runs WHERE id = ?', (run_id,)).fetchone()
+
+    def results(self, run_id: int) -> Dict[str, Dict]:
+        rows = self.conn.execute('SELECT * FROM endpoint_results WHERE run_id = ? ORDER BY endpoint', (run_id,))
+        return {row['endpoint']: dict(row) for row in rows}
+
+    def baseline(self, run: sqlite3.Row, size_tolerance: float = 0.1) -> Optional[sqlite3.Row]:
+        """run 之前最近一次可比的运行：source、label 相同，数据规模相差不超过 size_tolerance
+
+        优先选择不同 git 提交的运行；同一提交下只有重复运行时退而取其中最近的一次。
+        """
+        sql = 'SELECT * FROM runs WHERE id < ? AND source = ? AND label = ?'
+        args: List = [run['id'], run['source'], run['label']]
+        if run['dataset_size'] is None:
+            sql += ' AND dataset_size IS NULL'
+        else:
+            sql += ' AND dataset_size BETWEEN ? AND ?'
+            args += [run['dataset_size'] * (1 - size_tolerance), run['dataset_size'] * (1 + size_tolerance)]
+        candidates = self.conn.execute(sql + ' ORDER BY id DESC', args).fetchall()
+        for candidate in candidates:
+            if run['git_commit'] is None or candidate['git_commit'] != run['git_commit']:
+                return candidate
+        return candidates[0] if candidates else None
+
+    def compare(self, run_id: int, baseline_id: int, alpha: float = 0.01,
+                min_change: float = 0.1) -> List[EndpointComparison]:
+        """逐接口对比，显著（p < alpha）且变化超过 min_change 时记为退化"""
+        baseline = self.results(baseline_id)
+        current = self.results(run_id)
+        comparisons = []
+        for endpoint in sorted(set(baseline) | set(current)):
+            comparison = EndpointComparison(endpoint, baseline.get(endpoint), current.get(endpoint))
+            comparisons.append(comparison)
+            if endpoint not in baseline or endpoint not in current:
+                continue
+            old, new = baseline[endpoint], current[endpoint]
+            old_hist = EndpointLatency.from_dict(json.loads(old['histogram'])).service
+            new_hist = EndpointLatency.from_dict(json.loads(new['histogram'])).service
+            if old_hist.total_count < MIN_SAMPLES or new_hist.total_count < MIN_SAMPLES:
+                continue
+
+            comparison.latency_p = mann_whitney_p(old_hist, new_hist)
+            if comparison.latency_p < alpha and (comparison.change('p50_ms') or 0) > min_change:
+                comparison.regressions.append('延迟')
+
+            threshold = old_hist.value_at_percentile(99)
+            comparison.tail_p = two_proportion_p(count_above(old_hist, threshold), old_hist.total_count,
+                                                 count_above(new_hist, threshold), new_hist.total_count)
+            if comparison.tail_p < alpha and (comparison.change('p99_ms') or 0) > min_change:
+                comparison.regressions.append('尾延迟')
+
+            comparison.error_p = two_proportion_p(old['errors'], old['count'], new['errors'], new['count'])
+            if comparison.error_p < alpha:
+                comparison.regressions.append('错误率')
+        return comparisons
+
+
+def record_run(source: str, latencies: Dict[str, EndpointLatency], errors: Dict[str, int] = None,
+               elapsed: Optional[float] = None, dataset_size: Optional[int] = None, label: str = '',
+               path: str = HISTORY_PATH) -> Optional[int]:
+    """保存一次运行到历史库，供测试和压测脚本在结束时调用；失败时只打印警告"""
+    try:
+        with BenchmarkHistory(path) as history:
+            run_id = history.record(source, latencies, errors, elapsed, dataset_size, label)
+    except sqlite3.Error as e:
+        print(f"⚠ 保存基准历史失败: {e}")
+        return None
+    print(f"基准历史已记录: 运行 #{run_id}（{path}）")
+    return run_id
+
+
+def _format_run(run: sqlite3.Row) -> str:
+    commit = (run['git_commit'] or '-')[:10] + ('*' if run['git_dirty'] else '')
+    size = run['dataset_size'] if run['dataset_size'] is not None else '-'
+    return f"#{run['id']:<6}{run['created_at']:<21}{commit:<13}{size!s:>10}  {run['source']} {run['label']}"
+
+
+def _format_change(value: Optional[float]) -> str:
+    return f"{value * 100:+.1f}%" if value is not None else '-'
+
+
+def _format_p(value: Optional[float]) -> str:
+    return f"{value:.3g}" if value is not None else '-'
+
+
+def print_comparison(run: sqlite3.Row, baseline: sqlite3.Row, comparisons: List[EndpointComparison]):
+    print('=' * 120)
+    print(f"本次: {_format_run(run)}")
+    print(f"基线: {_format_run(baseline)}")
+    print('-' * 120)
+    print(f"{'接口':<36}{'p50':>16}{'p95':>16}{'p99':>16}{'吞吐':>9}{'错误率':>14}{'p(延迟/尾/错误)':>26}  结论")
+    for c in comparisons:
+        if not c.baseline or not c.current:
+            print(f"{c.endpoint:<36}{'仅基线' if c.baseline else '新增接口'}")
+            continue
+        cells = [f"{c.current[col]:.1f}({_format_change(c.change(col))})" for col in ('p50_ms', 'p95_ms', 'p99_ms')]
+        errors = f"{c.current['error_rate'] * 100:.2f}%({c.baseline['error_rate'] * 100:.2f}%)"
+        p_values = '/'.join(_format_p(p) for p in (c.latency_p, c.tail_p, c.error_p))
+        verdict = '退化: ' + '、'.join(c.regressions) if c.regressions else (
+            '样本不足' if c.latency_p is None else '正常')
+        print(f"{c.endpoint:<36}{cells[0]:>16}{cells[1]:>16}{cells[2]:>16}"
+              f"{_format_change(c.change('throughput')):>9}{errors:>14}{p_values:>26}  {verdict}")
+    print('=' * 120)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='Nomur 基准测试历史与退化检测')
+    parser.add_argument('--history', default=HISTORY_PATH, help='SQLite 历史库路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    runs = subparsers.add_parser('list', help='列出最近的运行')
+    runs.add_argument('--limit', type=int, default=20)
+    runs.add_argument('--source', default=None, help='只列出指定类型的运行')
+
+    show = subparsers.add_parser('show', help='查看一次运行的各接口结果')
+    show.add_argument('run', type=int, nargs='?', default=None, help='运行编号，默认最近一次')
+
+    compare = subparsers.add_parser('compare', help='与基线对比，发现显著退化时退出码为 1')
+    compare.add_argument('run', type=int, nargs='?', default=None, help='运行编号，默认最近一次')
+    compare.add_argument('--baseline', type=int, default=None,
+                         help='基线运行编号，默认取之前最近一次可比的运行（优先不同提交）')
+    compare.add_argument('--alpha', type=float, default=0.01, help='显著性水平')
+    compare.add_argument('--min-change', type=float, default=0.1, help='延迟增幅低于该比例时不视为退化')
+    compare.add_argument('--size-tolerance', type=float, default=0.1, help='可比运行的数据规模相对差异上限')
+    args = parser.parse_args()
+
+    with BenchmarkHistory(args.history) as history:
+        if args.command == 'list':
+            for run in history.runs(args.limit, args.source):
+                print(_format_run(run))
+            return
+
+        run = history.run(args.run)
+        if run is None:
+            raise SystemExit('历史库中没有对应的运行')
+        if args.command == 'show':
+            print(_format_run(run))
+            print(f"{'接口':<40}{'请求数':>8}{'错误':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'p99.9':>9}{'吞吐':>9}")
+            for endpoint, r in history.results(run['id']).items():
+                throughput = f"{r['throughput']:.1f}" if r['throughput'] is not None else '-'
+                print(f"{endpoint:<40}{r['count']:>8}{r['errors']:>7}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+                      f"{r['p99_ms']:>9.1f}{r['p999_ms']:>9.1f}{throughput:>9}")
+            return
+
+        baseline = history.run(args.baseline) if args.baseline else history.baseline(run, args.size_tolerance)
+        if baseline is None:
+            print(f"运行 #{run['id']} 之前没有可比的基线（相同类型、配置和数据规模）")
+            return
+        comparisons = history.compare(run['id'], baseline['id'], args.alpha, args.min_change)
+        print_comparison(run, baseline, comparisons)
+        regressed = [c.endpoint for c in comparisons if c.regressions]
+        if regressed:
+            print(f"\n发现 {len(regressed)} 个接口显著退化: {', '.join(regressed)}")
+            sys.exit(1)
+        print('\n未发现显著退化')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Nomur 可复现测试数据生成器
+
+与 data_entry_automation.py / full_demo_automation.py 中的 TestDataGenerator 使用相同的
+名称词表，但不依赖全局 random：
+- 同一个种子总是生成完全相同的数据，可在任意机器上重建大规模基准数据集
+- 名称和手机号保证唯一
+- 以生成器形式惰性产出，内存占用与数据量无关
+- 可选的数据画像：代理活跃度和商品热度服从 Zipf 分布，订单时间跨多年并在春节前形成备货高峰
+"""
+
+import math
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import accumulate, count as counter, islice
+from typing import Dict, Iterator, List, Optional, Sequence
+
+
+PRODUCT_NAMES = [
+    "芒果果汁", "金桂茶", "茉莉茶", "龙井茶", "绿茶", "红茶",
+    "乌龙茶", "普洱茶", "铁观音", "碧螺春", "毛峰",
+    "柠檬汁", "橙汁", "苹果汁", "葡萄汁", "西瓜汁"
+]
+
+AGENT_NAMES = [
+    "张三", "李四", "王五", "赵六", "钱七",
+    "孙八", "周九", "吴十", "郑一", "王二",
+    "刘三", "陈四", "杨五", "黄六", "林七"
+]
+
+CITIES = [
+    "北京", "上海", "广州", "深圳", "杭州",
+    "成都", "武汉", "西安", "南京", "重庆"
+]
+
+DISTRICTS = ['朝阳', '海淀', '西城', '东城', '丰台', '石景山']
+
+PROMOTION_NAMES = [
+    "年终大促", "春节特惠", "夏季促销", "秋季优惠", "冬季特卖",
+    "新品上市", "限时抢购", "满减活动", "买赠活动", "会员专享"
+]
+
+PRICES = [50, 60, 70, 80, 90, 100, 120, 150, 200, 299, 399, 499, 599]
+WEIGHTS = [1.5, 2.0, 2.5, 3.0, 3.5, 4.0]
+THRESHOLDS = [50, 100, 150, 200, 300, 500]
+QUANTITIES = [10, 20, 50, 100, 200, 500]
+
+# 手机号空间：1[3-9] + 9 位数字
+PHONE_SPACE = 7 * 10 ** 9
+
+# 春节（正月初一）公历日期
+SPRING_FESTIVAL = {
+    2020: date(2020, 1, 25), 2021: date(2021, 2, 12), 2022: date(2022, 2, 1),
+    2023: date(2023, 1, 22), 2024: date(2024, 2, 10), 2025: date(2025, 1, 29),
+    2026: date(2026, 2, 17), 2027: date(2027, 2, 6), 2028: date(2028, 1, 26),
+    2029: date(2029, 2, 13), 2030: date(2030, 2, 3),
+}
+
+# 下单时段权重（0-23 点），集中在白天营业时间
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 14, 18, 20, 18, 12, 14, 18, 20, 18, 14, 10, 8, 6, 4, 2, 1]
+
+
+@dataclass
+class DatasetProfile:
+    """数据画像：决定各类数据的分布形状
+
+    agent_skew / product_skew 为 Zipf 指数，0 表示均匀分布；seasonal 为 True 时订单时间
+    按春节周期加权，并按 yearly_growth 逐年增长。
+    """
+    name: str
+    agent_skew: float = 0.0
+    product_skew: float = 0.0
+    days: int = 365
+    seasonal: bool = False
+    yearly_growth: float = 1.0
+    promotion_rate: float = 0.3
+    group_promotions: float = 0.0
+    product_promotions: float = 0.0
+
+
+PROFILES = {
+    # 与早期版本一致：代理、商品、时间均匀分布，促销全年有效
+    'uniform': DatasetProfile('uniform'),
+    # 少数代理贡献大部分订单，热门商品集中，三年数据且春节前备货、假期停摆，
+    # 促销按档期投放，部分促销以商品组合或指定商品为条件
+    'realistic': DatasetProfile('realistic', agent_skew=1.1, product_skew=0.9, days=3 * 365,
+                                seasonal=True, yearly_growth=1.3, promotion_rate=0.8,
+                                group_promotions=0.4, product_promotions=0.3),
+}
+
+
+def spring_festival(year: int) -> date:
+    """返回某年春节日期，表外年份近似取 2 月 1 日"""
+    return SPRING_FESTIVAL.get(year, date(year, 2, 1))
+
+
+class ZipfSampler:
+    """按 Zipf 分布抽取元素，第 k 个元素的权重为 1 / k^exponent（靠前的元素更热门）"""
+
+    def __init__(self, items: Sequence, exponent: float):
+        self.items = items
+        self.cum_weights = list(accumulate(1.0 / (rank ** exponent) for rank in range(1, len(items) + 1)))
+
+    def sample(self, rng: random.Random):
+        return rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+    def share(self, top: int) -> float:
+        """前 top 个元素的期望占比"""
+        return self.cum_weights[min(top, len(self.items)) - 1] / self.cum_weights[-1]
+
+
+class SeasonalCalendar:
+    """在 [end - days, end) 内按季节权重抽取时间点
+
+    日权重 = 基线 1 + 春节前约两周的备货高峰，春节假期一周降到基线的 20%，
+    再乘以逐年增长系数；时段按 HOUR_WEIGHTS 分布。
+    """
+
+    def __init__(self, end: datetime, days: int, yearly_growth: float = 1.0):
+        self.start = datetime.combine((end - timedelta(days=days)).date(), datetime.min.time())
+        self.days = [self.start.date() + timedelta(days=i) for i in range(days)]
+        self.cum_weights = list(accumulate(
+            self.day_weight(day, end.date(), yearly_growth) for day in self.days))
+        self.hour_cum_weights = list(accumulate(HOUR_WEIGHTS))
+
+    @staticmethod
+    def day_weight(day: date, end: date, yearly_growth: float) -> float:
+        festival = min((spring_festival(y) for y in (day.year - 1, day.year, day.year + 1)),
+                       key=lambda d: abs((day - d).days))
+        offset = (day - festival).days
+        weight = 1.0 + 4.0 * math.exp(-((offset + 15) / 8.0) ** 2)
+        if 0 <= offset < 7:
+            weight *= 0.2
+        return weight * yearly_growth ** (-(end - day).days / 365.0)
+
+    def sample(self, rng: random.Random) -> datetime:
+        day = rng.choices(self.days, cum_weights=self.cum_weights)[0]
+        hour = rng.choices(range(24), cum_weights=self.hour_cum_weights)[0]
+        return datetime.combine(day, datetime.min.time()) + timedelta(
+            hours=hour, seconds=rng.randrange(3600))
+
+
+class SeededDataGenerator:
+    """按种子生成可复现的测试数据流
+
+    每类数据使用由 (种子, 类别) 派生的独立随机源，因此各个流之间互不影响，
+    只要种子相同、按相同顺序读取，同一个流总是产出相同的数据。
+    """
+
+    def __init__(self, seed: int = 0, name_prefix: str = '测试'):
+        self.seed = seed
+        self.name_prefix = name_prefix
+        rng = self._rng('phones')
+        # 仿射置换 i -> (a*i + b) mod PHONE_SPACE 在 i < PHONE_SPACE 时一一对应，保证手机号不重复
+        self._phone_a = rng.randrange(1, PHONE_SPACE)
+        while math.gcd(self._phone_a, PHONE_SPACE) != 1:
+            self._phone_a = rng.randrange(1, PHONE_SPACE)
+        self._phone_b = rng.randrange(PHONE_SPACE)
+        self._phone_counter = counter()
+
+    def _rng(self, stream: str) -> random.Random:
+        return random.Random(f"{self.seed}:{stream}")
+
+    @staticmethod
+    def _unique_name(prefix: str, words: Sequence[str], index: int) -> str:
+        """词表轮流使用，序号区分同名，保证不重复"""
+        return f"{prefix}{words[index % len(words)]}{index // len(words) + 1}"
+
+    @staticmethod
+    def _new_id(rng: random.Random) -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def unique_phone(self) -> str:
+        """返回一个本生成器内不重复的手机号"""
+        value = (self._phone_a * next(self._phone_counter) + self._phone_b) % PHONE_SPACE
+        return f"1{3 + value // 10 ** 9}{value % 10 ** 9:09d}"
+
+    def unique_phones(self, count: int) -> List[str]:
+        """批量返回 count 个不重复的手机号，与逐个调用 unique_phone 的结果相同"""
+        return [self.unique_phone() for _ in range(count)]
+
+    def products(self, count: Optional[int] = None) -> Iterator[Dict]:
+        """商品流：id、name、price、weight"""
+        rng = self._rng('products')
+        for i in islice(counter(), count):
+            yield {
+                'id': self._new_id(rng),
+                'name': self._unique_name(self.name_prefix, PRODUCT_NAMES, i),
+                'price': float(rng.choice(PRICES)),
+                'weight': rng.choice(WEIGHTS),
+            }
+
+    def agents(self, count: Optional[int] = None) -> Iterator[Dict]:
+        """代理商流：id、name、phone1、phone2、address"""
+        rng = self._rng('agents')
+        for i in islice(counter(), count):
+            yield {
+                'id': self._new_id(rng),
+                'name': self._unique_name(self.name_prefix, AGENT_NAMES, i),
+                'phone1': self.unique_phone(),
+                'phone2': self.unique_phone() if rng.random() > 0.6 else None,
+                'address': (f"{rng.choice(CITIES)}市{rng.choice(DISTRICTS)}"
+                            f"{rng.choice(['区', '县', '市'])}{rng.randint(1, 99)}号"),
+            }
+
+    def promotions(self, products: Sequence[Dict], count: Optional[int] = None) -> Iterator[Dict]:
+        """促销流：id、name、description、threshold、gifts（赠品取自 products）"""
+        rng = self._rng('promotions')
+        for i in islice(counter(), count):
+            threshold = rng.choice(THRESHOLDS)
+            gift = rng.choice(products)
+            quantity = rng.choice([3, 5, 10, 20])
+            yield {
+                'id': self._new_id(rng),
+                'name': self._unique_name(self.name_prefix, PROMOTION_NAMES, i),
+                'description': f"每满{threshold}件赠送{quantity}件",
+                'threshold': threshold,
+                'gifts': [{'productId': gift['id'], 'quantity': quantity}],
+                'gift_names': {gift['id']: gift['name']},
+            }
+
+    def order_items(self, products: Sequence[Dict], count: Optional[int] = None,
+                    max_products: int = 3, product_skew: float = 0.0) -> Iterator[List[Dict]]:
+        """订单商品项流，每个元素是一个订单的 items 列表，格式与 POST /orders 一致
+
+        product_skew > 0 时商品按 Zipf 分布挑选，products 中靠前的商品更热门。
+        """
+        rng = self._rng('order_items')
+        sampler = ZipfSampler(products, product_skew) if product_skew > 0 else None
+        for _ in islice(counter(), count):
+            size = min(len(products), rng.randint(1, max_products))
+            if sampler is None:
+                chosen = rng.sample(products, size)
+            else:
+                chosen = {}
+                while len(chosen) < size:
+                    product = sampler.sample(rng)
+                    chosen[product['id']] = product
+                chosen = list(chosen.values())
+            yield [{
+                'productId': p['id'],
+                'productName': p['name'],
+                'quantity': rng.choice(QUANTITIES),
+                'price': p['price'],
+                'weight': p['weight'],
+            } for p in chosen]
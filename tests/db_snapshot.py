@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Nomur 数据库快照与还原
+每次压测都会改动代理余额、订单和流水，用快照让连续的性能测试从完全相同的数据开始，无需重新灌数据。
+
+- clone 模式（默认）：把 nomur 库的全部表复制到 `nomur__snap_<名称>` 库，并预先再复制一份到
+  `nomur__stage_<名称>` 暂存库；还原时用一条 RENAME TABLE 原子地把暂存库的表换入 nomur，
+  千万行级数据也只需几秒，随后在压测之外重建下一份暂存副本
+- dump 模式：用 mysqldump 导出到本地缓存文件，用 mysql 客户端导入，可在机器之间复用
+"""
+
+import argparse
+import gzip
+import os
+import shutil
+import subprocess
+import time
+from typing import Dict, List, Optional
+
+import pymysql
+
+from seed_data import DB_CONFIG
+
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.snapshots')
+
+
+class DatabaseSnapshot:
+    """nomur 库的命名快照（clone 模式）"""
+
+    def __init__(self, name: str = 'baseline', db_config: Dict = None):
+        self.name = name
+        self.db_config = {**DB_CONFIG, **(db_config or {})}
+        self.database = self.db_config['database']
+        self.snapshot_db = f"{self.database}__snap_{name}"
+        self.stage_db = f"{self.database}__stage_{name}"
+        self.trash_db = f"{self.database}__trash"
+        self.conn = None
+        self.timings: Dict[str, float] = {}
+
+    def connect(self):
+        config = {k: v for k, v in self.db_config.items() if k != 'database'}
+        self.conn = pymysql.connect(charset='utf8mb4', autocommit=True, **config)
+        with self.conn.cursor() as cursor:
+            cursor.execute('SET foreign_key_checks = 0')
+            cursor.execute('SET unique_checks = 0')
+        return self.conn
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _execute(self, sql: str, args=None):
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql, args)
+            return cursor.fetchall()
+
+    def exists(self, database: Optional[str] = None) -> bool:
+        return bool(self._execute('SELECT 1 FROM information_schema.schemata WHERE schema_name = %s',
+                                  (database or self.snapshot_db,)))
+
+    def tables(self, database: str) -> List[str]:
+        rows = self._execute(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_schema = %s AND table_type = 'BASE TABLE' ORDER BY table_name", (database,))
+        return [row[0] for row in rows]
+
+    def row_counts(self, database: Optional[str] = None) -> Dict[str, int]:
+        """各表精确行数"""
+        database = database or self.snapshot_db
+        return {table: self._execute(f"SELECT COUNT(*) FROM `{database}`.`{table}`")[0][0]
+                for table in self.tables(database)}
+
+    def _clone(self, source: str, target: str):
+        """重建 target 库，按 SHOW CREATE TABLE 建表（保留索引和外键）并整表复制数据"""
+        start = time.perf_counter()
+        self._execute(f"DROP DATABASE IF EXISTS `{target}`")
+        self._execute(f"CREATE DATABASE `{target}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        for table in self.tables(source):
+            ddl = self._execute(f"SHOW CREATE TABLE `{source}`.`{table}`")[0][1]
+            self.conn.select_db(target)
+            self._execute(ddl)
+            self._execute(f"INSERT INTO `{target}`.`{table}` SELECT * FROM `{source}`.`{table}`")
+        self.timings[f"复制 {source} -> {target}"] = time.perf_counter() - start
+
+    def create(self):
+        """为当前 nomur 库创建快照，并准备好第一份暂存副本"""
+        self._clone(self.database, self.snapshot_db)
+        self._clone(self.snapshot_db, self.stage_db)
+
+    def prepare(self):
+        """从快照重建暂存副本，还原前未准备好时会自动调用"""
+        if not self.exists():
+            raise RuntimeError(f"快照不存在: {self.name}")
+        self._clone(self.snapshot_db, self.stage_db)
+
+    def restore(self, prepare_next: bool = True) -> float:
+        """把暂存副本原子地换入 nomur 库，返回换表耗时（秒）
+
+        nomur 中快照之后新建的表一并移走；prepare_next 为 False 时不重建下一份暂存副本，
+        可在下次还原前单独调用 prepare()。
+        """
+        snapshot_tables = self.tables(self.snapshot_db) if self.exists() else []
+        if not snapshot_tables:
+            raise RuntimeError(f"快照不存在: {self.name}")
+        if set(self.tables(self.stage_db)) != set(snapshot_tables):
+            self.prepare()
+
+        start = time.perf_counter()
+        self._execute(f"DROP DATABASE IF EXISTS `{self.trash_db}`")
+        self._execute(f"CREATE DATABASE `{self.trash_db}`")
+        renames = [f"`{self.database}`.`{t}` TO `{self.trash_db}`.`{t}`" for t in self.tables(self.database)]
+        renames += [f"`{self.stage_db}`.`{t}` TO `{self.database}`.`{t}`" for t in snapshot_tables]
+        self._execute(f"RENAME TABLE {', '.join(renames)}")
+        swap_seconds = time.perf_counter() - start
+        self.timings['换表'] = swap_seconds
+
+        self._execute(f"DROP DATABASE `{self.trash_db}`")
+        self._execute(f"DROP DATABASE IF EXISTS `{self.stage_db}`")
+        if prepare_next:
+            self.prepare()
+        return swap_seconds
+
+    def drop(self):
+        self._execute(f"DROP DATABASE IF EXISTS `{self.snapshot_db}`")
+        self._execute(f"DROP DATABASE IF EXISTS `{self.stage_db}`")
+
+    def list(self) -> List[str]:
+        prefix = f"{self.database}__snap_"
+        rows = self._execute('SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE %s',
+                             (prefix.replace('_', '\\_') + '%',))
+        return sorted(row[0][len(prefix):] for row in rows)
+
+
+def restore_snapshot(name: str, db_config: Dict = None) -> float:
+    """还原指定快照，供压测脚本在每轮开始前调用，返回换表耗时（秒）
+
+    不重建下一份暂存副本（整库 INSERT ... SELECT），避免在压测开始前等待并造成写入高峰；
+    压测结束后调用 prepare_snapshot()。暂存副本未就绪时本次还原仍会先重建。
+    """
+    with DatabaseSnapshot(name, db_config) as snapshot:
+        return snapshot.restore(prepare_next=False)
+
+
+def prepare_snapshot(name: str, db_config: Dict = None):
+    """从快照重建暂存副本，供压测脚本在每轮结束后调用，使下一轮的还原只需换表"""
+    with DatabaseSnapshot(name, db_config) as snapshot:
+        snapshot.prepare()
+
+
+def dump_path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}.sql.gz")
+
+
+def _client_args(db_config: Dict) -> List[str]:
+    args = [f"--host={db_config['host']}", f"--port={db_config['port']}", f"--user={db_config['user']}",
+            '--default-character-set=utf8mb4']
+    if db_config.get('password'):
+        args.append(f"--password={db_config['password']}")
+    return args
+
+
+def dump_snapshot(name: str, db_config: Dict = None) -> str:
+    """dump 模式：mysqldump 导出到 .snapshots/<名称>.sql.gz"""
+    config = {**DB_CONFIG, **(db_config or {})}
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = dump_path(name)
+    with gzip.open(path, 'wb') as f:
+        process = subprocess.Popen(['mysqldump', *_client_args(config), '--single-transaction', '--quick',
+                                    '--skip-lock-tables', '--no-tablespaces', config['database']],
+                                   stdout=subprocess.PIPE)
+        shutil.copyfileobj(process.stdout, f, 1024 * 1024)
+        if process.wait() != 0:
+            raise RuntimeError(f"mysqldump 失败，退出码 {process.returncode}")
+    return path
+
+
+def load_snapshot(name: str, db_config: Dict = None):
+    """dump 模式：把缓存的导出文件导入 nomur 库"""
+    config = {**DB_CONFIG, **(db_config or {})}
+    path = dump_path(name)
+    if not os.path.exists(path):
+        raise RuntimeError(f"导出文件不存在: {path}")
+    process = subprocess.Popen(['mysql', *_client_args(config), config['database']], stdin=subprocess.PIPE)
+    with gzip.open(path, 'rb') as f:
+        process.stdin.write(b'SET foreign_key_checks = 0; SET unique_checks = 0;\n')
+        shutil.copyfileobj(f, process.stdin, 1024 * 1024)
+    process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError(f"mysql 导入失败，退出码 {process.returncode}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='Nomur 数据库快照与还原')
+    parser.add_argument('action', choices=['create', 'restore', 'prepare', 'drop', 'list', 'dump', 'load'],
+                        help='create/restore/prepare/drop/list 为 clone 模式，dump/load 为导出文件模式')
+    parser.add_argument('name', nargs='?', default='baseline', help='快照名称')
+    parser.add_argument('--host', default=DB_CONFIG['host'])
+    parser.add_argument('--port', type=int, default=DB_CONFIG['port'])
+    parser.add_argument('--user', default=DB_CONFIG['user'])
+    parser.add_argument('--password', default=DB_CONFIG['password'])
+    parser.add_argument('--database', default=DB_CONFIG['database'])
+    parser.add_argument('--no-prepare', action='store_true', help='restore 后不重建下一份暂存副本')
+    args = parser.parse_args()
+
+    db_config = {'host': args.host, 'port': args.port, 'user': args.user,
+                 'password': args.password, 'database': args.database}
+    start = time.perf_counter()
+    if args.action == 'dump':
+        print(f"已导出到: {dump_snapshot(args.name, db_config)}")
+    elif args.action == 'load':
+        load_snapshot(args.name, db_config)
+        print(f"已从 {dump_path(args.name)} 导入")
+    else:
+        with DatabaseSnapshot(args.name, db_config) as snapshot:
+            if args.action == 'create':
+                snapshot.create()
+                for table, rows in snapshot.row_counts().items():
+                    print(f"  {table:<24}{rows:>12} 行")
+                print(f"快照已创建: {args.name}")
+            elif args.action == 'restore':
+                swap = snapshot.restore(prepare_next=not args.no_prepare)
+                print(f"已还原快照 {args.name}，换表耗时 {swap:.2f} 秒")
+            elif args.action == 'prepare':
+                snapshot.prepare()
+                print(f"暂存副本已就绪: {args.name}")
+            elif args.action == 'drop':
+                snapshot.drop()
+                print(f"快照已删除: {args.name}")
+            else:
+                print('\n'.join(snapshot.list()) or '（无快照）')
+            for step, seconds in snapshot.timings.items():
+                print(f"  {step}: {seconds:.1f} 秒")
+    print(f"总耗时 {time.perf_counter() - start:.1f} 秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Nomur 性能测试 HTML 报告
+生成单个自包含的 HTML 文件：图表为内联 SVG，Selenium 截图以 base64 内嵌，不依赖任何脚本或外部资源，
+可直接发给他人用浏览器查看。
+
+- 各接口延迟分布直方图（对数刻度）和百分位汇总表
+- 吞吐和错误数随时间的变化（按秒）
+- 最慢请求、最慢测试和失败测试列表
+- 测试结果中的截图
+"""
+
+import argparse
+import base64
+import html
+import math
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from result_sink import read_results
+
+
+COLORS = ['#2f6fdf', '#e5533d', '#2ca05a', '#f0a020', '#8e5bd6', '#17a2b8', '#7f7f7f']
+
+STYLE = """
+body { font-family: -apple-system, "PingFang SC", "Microsoft YaHei", sans-serif; margin: 24px; color: #222; }
+h1 { font-size: 22px; } h2 { font-size: 18px; border-bottom: 1px solid #ddd; padding-bottom: 4px; margin-top: 32px; }
+h3 { font-size: 15px; margin: 18px 0 6px; }
+table { border-collapse: collapse; font-size: 13px; margin: 8px 0; }
+th, td { border: 1px solid #ddd; padding: 4px 8px; text-align: right; }
+th { background: #f5f5f5; } td.text, th.text { text-align: left; }
+.pass { color: #2ca05a; } .fail, .error { color: #e5533d; } .skip { color: #7f7f7f; }
+.charts { display: flex; flex-wrap: wrap; gap: 16px; }
+.chart { border: 1px solid #eee; padding: 6px; }
+svg text { font-size: 10px; fill: #555; }
+figure { display: inline-block; margin: 8px; max-width: 420px; vertical-align: top; }
+figure img { max-width: 400px; border: 1px solid #ccc; }
+figcaption { font-size: 12px; }
+"""
+
+
+def _escape(value) -> str:
+    return html.escape(str(value), quote=True)
+
+
+def _table(headers: Sequence[str], rows: Iterable[Sequence], text_columns: int = 1) -> str:
+    """text_columns 为左对齐的前几列"""
+    def cell(tag: str, i: int, value) -> str:
+        attrs = ' class="text"' if i < text_columns else ''
+        return f"<{tag}{attrs}>{_escape(value)}</{tag}>"
+
+    head = ''.join(cell('th', i, h) for i, h in enumerate(headers))
+    body = ''.join('<tr>' + ''.join(cell('td', i, value) for i, value in enumerate(row)) + '</tr>' for row in rows)
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+
+def _format_ms(value: float) -> str:
+    return f"{value:.1f}" if value < 1000 else f"{value:,.0f}"
+
+
+def histogram_bins(hist, bins: int = 40) -> List[Tuple[float, float, int]]:
+    """把 LatencyHistogram 的桶归并为 bins 个对数等宽区间，返回 (下界ms, 上界ms, 样本数)"""
+    if not hist.total_count:
+        return []
+    low = max(hist.min_value or 1, 1)
+    high = max(hist.max_value, low + 1)
+    scale = math.log(high / low) / bins
+    counts = [0] * bins
+    for index, count in hist.counts.items():
+        value = min(max(hist._value_at(index), low), high)
+        counts[min(int(math.log(value / low) / scale), bins - 1)] += count
+    return [(low * math.exp(i * scale) / 1000.0, low * math.exp((i + 1) * scale) / 1000.0, c)
+            for i, c in enumerate(counts)]
+
+
+def svg_histogram(bins: List[Tuple[float, float, int]], width: int = 420, height: int = 180,
+                  markers: Dict[str, float] = None) -> str:
+    """延迟分布柱状图，横轴为对数刻度的毫秒，markers 为要标出的百分位（名称 -> 毫秒）"""
+    if not bins:
+        return ''
+    left, bottom, top = 40, 24, 10
+    plot_w, plot_h = width - left - 10, height - bottom - top
+    peak = max(c for _, _, c in bins) or 1
+    bar_w = plot_w / len(bins)
+    parts = [f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">']
+    for i, (lo, hi, count) in enumerate(bins):
+        h = plot_h * count / peak
+        parts.append(f'<rect x="{left + i * bar_w:.1f}" y="{top + plot_h - h:.1f}" width="{max(bar_w - 1, 1):.1f}" '
+                     f'height="{h:.1f}" fill="{COLORS[0]}"><title>{_format_ms(lo)}–{_format_ms(hi)} ms: '
+                     f'{count}</title></rect>')
+    low, high = bins[0][0], bins[-1][1]
+    span = math.log(high / low) if high > low else 1.0
+    for i in range(0, len(bins) + 1, max(len(bins) // 4, 1)):
+        value = low * math.exp(span * i / len(bins))
+        parts.append(f'<text x="{left + i * bar_w:.1f}" y="{height - 8}" text-anchor="middle">{_format_ms(value)}</text>')
+    for n, (name, value) in enumerate((markers or {}).items()):
+        if low <= value <= high:
+            x = left + plot_w * math.log(value / low) / span
+            parts.append(f'<line x1="{x:.1f}" y1="{top}" x2="{x:.1f}" y2="{top + plot_h}" '
+                         f'stroke="{COLORS[1 + n % (len(COLORS) - 1)]}" stroke-dasharray="3,2"/>')
+            parts.append(f'<text x="{x + 2:.1f}" y="{top + 10 + n * 11}">{_escape(name)}</text>')
+    parts.append(f'<text x="2" y="{top + 8}">{peak}</text>')
+    parts.append(f'<line x1="{left}" y1="{top + plot_h}" x2="{left + plot_w}" y2="{top + plot_h}" stroke="#999"/>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def svg_line_chart(series: Dict[str, List[Tuple[float, float]]], width: int = 860, height: int = 220,
+                   unit: str = '') -> str:
+    """多条折线，横轴为相对开始的秒数"""
+    points = [p for values in series.values() for p in values]
+    if not points:
+        return ''
+    left, bottom, top, legend = 48, 24, 10, 150
+    plot_w, plot_h = width - left - legend, height - bottom - top
+    x0 = min(x for x, _ in points)
+    x_span = max(max(x for x, _ in points) - x0, 1)
+    y_max = max(max(y for _, y in points), 1)
+    parts = [f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">']
+    for i in range(5):
+        y = top + plot_h * i / 4
+        parts.append(f'<line x1="{left}" y1="{y:.1f}" x2="{left + plot_w}" y2="{y:.1f}" stroke="#eee"/>')
+        parts.append(f'<text x="{left - 4}" y="{y + 3:.1f}" text-anchor="end">{y_max * (4 - i) / 4:.3g}</text>')
+    for i in range(6):
+        parts.append(f'<text x="{left + plot_w * i / 5:.1f}" y="{height - 8}" text-anchor="middle">'
+                     f'{x_span * i / 5:.0f}s</text>')
+    for n, (name, values) in enumerate(series.items()):
+        color = COLORS[n % len(COLORS)]
+        coords = ' '.join(f"{left + plot_w * (x - x0) / x_span:.1f},{top + plot_h * (1 - y / y_max):.1f}"
+                          for x, y in sorted(values))
+        parts.append(f'<polyline points="{coords}" fill="none" stroke="{color}" stroke-width="1.5"/>')
+        parts.append(f'<rect x="{width - legend + 8}" y="{top + n * 14}" width="10" height="3" fill="{color}"/>')
+        parts.append(f'<text x="{width - legend + 22}" y="{top + n * 14 + 5}">{_escape(name[:24])}</text>')
+    if unit:
+        parts.append(f'<text x="2" y="{top + plot_h / 2:.1f}">{_escape(unit)}</text>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def _timeline_series(stats: Dict, column: int, max_series: int = 5) -> Dict[str, List[Tuple[float, float]]]:
+    """按秒的完成数（column=0）或错误数（column=1）：总计加上请求量最大的几个接口，空缺的秒补 0"""
+    seconds = sorted({s for latency in stats.values() for s in latency.timeline})
+    if not seconds:
+        return {}
+    span = range(seconds[0], seconds[-1] + 1)
+    total = Counter()
+    for latency in stats.values():
+        for second, bucket in latency.timeline.items():
+            total[second] += bucket[column]
+    series = {'总计': [(s, total[s]) for s in span]}
+    busiest = sorted(stats.items(), key=lambda item: -sum(b[column] for b in item[1].timeline.values()))
+    for name, latency in busiest[:max_series]:
+        if len(stats) > 1 and any(b[column] for b in latency.timeline.values()):
+            series[name] = [(s, latency.timeline.get(s, [0, 0])[column]) for s in span]
+    return series
+
+
+class HtmlReport:
+    """自包含 HTML 报告，按调用顺序拼接各部分"""
+
+    def __init__(self, title: str = 'Nomur 性能测试报告'):
+        self.title = title
+        self.sections: List[str] = []
+
+    def add_html(self, fragment: str):
+        self.sections.append(fragment)
+
+    def add_latency(self, stats: Dict, heading: str = '接口延迟', slowest: int = 30):
+        """stats 为接口名 -> EndpointLatency"""
+        stats = {name: latency for name, latency in sorted(stats.items()) if latency.count}
+        if not stats:
+            return
+        parts = [f"<h2>{_escape(heading)}</h2>"]
+        rows = []
+        for name, latency in stats.items():
+            s = latency.response.summary()
+            seconds = len(latency.timeline) or 1
+            rows.append([name, latency.count, latency.errors,
+                         f"{latency.errors / latency.count * 100:.2f}%", f"{latency.count / seconds:.1f}",
+                         _format_ms(s['p50']), _format_ms(s['p90']), _format_ms(s['p99']),
+                         _format_ms(s['p99.9']), _format_ms(s['max_ms']),
+                         _format_ms(latency.service.value_at_percentile(99) / 1000.0)])
+        parts.append(_table(['接口', '请求数', '错误', '错误率', '吞吐(req/s)', 'p50', 'p90', 'p99', 'p99.9',
+                             'max', '服务p99'], rows))
+        parts.append('<p>延迟单位为毫秒；响应延迟从计划发送时间算起（已修正协调遗漏），服务延迟从实际发送时间算起；'
+                     '吞吐按有请求完成的秒数计算。</p>')
+
+        parts.append('<h3>吞吐（每秒完成请求数）</h3>')
+        parts.append(f'<div class="chart">{svg_line_chart(_timeline_series(stats, 0), unit="req/s")}</div>')
+        if any(latency.errors for latency in stats.values()):
+            parts.append('<h3>错误（每秒）</h3>')
+            parts.append(f'<div class="chart">{svg_line_chart(_timeline_series(stats, 1), unit="错误")}</div>')
+
+        parts.append('<h3>延迟分布</h3><div class="charts">')
+        for name, latency in stats.items():
+            markers = {f"p{p:g}": latency.response.value_at_percentile(p) / 1000.0 for p in (50, 99)}
+            parts.append(f'<div class="chart"><div>{_escape(name)}</div>'
+                         f'{svg_histogram(histogram_bins(latency.response), markers=markers)}</div>')
+        parts.append('</div>')
+
+        entries = [(seconds, timestamp, detail or name, name)
+                   for name, latency in stats.items() for seconds, timestamp, detail in latency.slowest]
+        entries.sort(reverse=True)
+        if entries:
+            parts.append(f'<h3>最慢的 {min(slowest, len(entries))} 个请求</h3>')
+            parts.append(_table(['请求', '接口', '延迟(ms)', '完成时间'], [
+                [detail, name, _format_ms(seconds * 1000.0),
+                 datetime.fromtimestamp(timestamp).strftime('%H:%M:%S.%f')[:-3]]
+                for seconds, timestamp, detail, name in entries[:slowest]], text_columns=2))
+        self.sections.append(''.join(parts))
+
+    def add_results(self, path: str, heading: str = '测试结果', slowest: int = 20,
+                    max_screenshots: int = 60):
+        """从 JSONL 结果文件读取测试结果，失败测试的截图优先内嵌"""
+        counts: Counter = Counter()
+        durations: List[Tuple[float, str, str]] = []
+        issues, screenshots = [], []
+        for result in read_results(path):
+            status = result.get('status')
+            counts[status] += 1
+            durations.append((result.get('duration') or 0, result.get('test_name', ''), status))
+            if status not in ('PASS', 'SKIP'):
+                issues.append(result)
+            if result.get('screenshot'):
+                screenshots.append(result)
+        if not counts:
+            return
+        durations.sort(reverse=True)
+        parts = [f"<h2>{_escape(heading)}</h2>",
+                 f"<p>结果文件: {_escape(path)}　" + '　'.join(
+                     f"<span class=\"{_escape(str(status).lower())}\">{_escape(status)}: {count}</span>"
+                     for status, count in counts.most_common()) + '</p>']
+        parts.append(f'<h3>最慢的 {min(slowest, len(durations))} 个测试</h3>')
+        parts.append(_table(['测试', '状态', '耗时(秒)'],
+                            [[name, status, f"{duration:.3f}"] for duration, name, status in durations[:slowest]],
+                            text_columns=2))
+        if issues:
+            parts.append(f'<h3>失败的测试（{len(issues)}）</h3>')
+            parts.append(_table(['测试', '状态', '消息', '错误'], [
+                [r.get('test_name'), r.get('status'), r.get('message', ''), (r.get('error') or '')[:300]]
+                for r in issues], text_columns=4))
+        if screenshots:
+            screenshots.sort(key=lambda r: r.get('status') in ('PASS', 'SKIP'))
+            parts.append(f'<h3>截图（{min(len(screenshots), max_screenshots)}/{len(screenshots)}）</h3>')
+            base = os.path.dirname(os.path.abspath(path))
+            for result in screenshots[:max_screenshots]:
+                parts.append(self._figure(result, base))
+        self.sections.append(''.join(parts))
+
+    @staticmethod
+    def _figure(result: Dict, base: str) -> str:
+        screenshot = result['screenshot']
+        caption = f"[{result.get('status')}] {result.get('test_name')}"
+        for candidate in (screenshot, os.path.join(base, screenshot)):
+            if os.path.isfile(candidate):
+                with open(candidate, 'rb') as f:
+                    data = base64.b64encode(f.read()).decode('ascii')
+                return (f'<figure><img src="data:image/png;base64,{data}" alt="{_escape(caption)}">'
+                        f'<figcaption>{_escape(caption)}</figcaption></figure>')
+        return f'<figure><figcaption>{_escape(caption)}（截图文件不存在: {_escape(screenshot)}）</figcaption></figure>'
+
+    def render(self) -> str:
+        return (f'<!DOCTYPE html><html lang="zh-CN"><head><meta charset="utf-8">'
+                f'<title>{_escape(self.title)}</title><style>{STYLE}</style></head><body>'
+                f'<h1>{_escape(self.title)}</h1><p>生成时间: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>'
+                + ''.join(self.sections) + '</body></html>')
+
+    def write(self, path: Optional[str] = None, prefix: str = 'perf_report') -> str:
+        path = path or f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        return path
+
+
+def main():
+    """主函数：把多个结果文件和基准历史中的运行合并为一份报告"""
+    parser = argparse.ArgumentParser(description='Nomur 性能测试 HTML 报告')
+    parser.add_argument('--results', nargs='*', default=[], help='JSONL 结果文件（API/Selenium 测试）')
+    parser.add_argument('--history-run', type=int, nargs='*', default=[],
+                        help='benchmark_history.py 中的运行编号，读取其中保存的延迟直方图')
+    parser.add_argument('--title', default='Nomur 性能测试报告')
+    parser.add_argument('--output', default=None, help='输出 HTML 文件路径')
+    args = parser.parse_args()
+
+    report = HtmlReport(args.title)
+    if args.history_run:
+        import json
+        from benchmark_history import BenchmarkHistory
+        from test_api import EndpointLatency
+        with BenchmarkHistory() as history:
+            for run_id in args.history_run:
+                run = history.run(run_id)
+                if run is None:
+                    raise SystemExit(f"历史库中没有运行 #{run_id}")
+                stats = {endpoint: EndpointLatency.from_dict(json.loads(row['histogram']))
+                         for endpoint, row in history.results(run_id).items()}
+                report.add_latency(stats, f"运行 #{run_id} {run['source']} {run['label']} "
+                                          f"({(run['git_commit'] or '-')[:10]}, {run['created_at']})")
+    for path in args.results:
+        report.add_results(path, f"测试结果: {os.path.basename(path)}")
+    print(f"报告已保存到: {report.write(args.output)}")
+
+
+if __name__ == '__main__':
+    main()
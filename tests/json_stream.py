@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+JSON 解码
+loads 是 APIClient 默认的解码函数，安装 orjson 时使用 orjson，否则退回标准库 json。
+
+JSONArrayParser 增量解析 {"code": 0, "data": [...]} 形式的列表接口响应：按块喂入响应体，
+逐个产出 data 数组中的元素，内存中只保留当前尚未解析完的片段，百万行的订单/流水列表
+也不需要先在内存中拼出完整的字符串和字典树。
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+try:
+    import orjson
+except ImportError:  # orjson 只是更快，没有时使用标准库
+    orjson = None
+
+
+loads: Callable[[Any], Any] = orjson.loads if orjson else json.loads
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_SEPARATORS = (',', ']', '}', ':')
+
+
+class JSONArrayParser:
+    """顶层对象中指定数组字段的增量解析器
+
+    feed(chunk) 返回这一块中解析完整的数组元素，数据结束时调用 close() 取得剩余元素。
+    数组之外的顶层字段（code、message 等）保存在 envelope 中，位于数组之前的字段在产出
+    第一个元素时即已可用。单个元素用标准库的 raw_decode 在 C 层解码，跨块的元素会在
+    下一块到达后重新解码，因此块应明显大于单个元素（默认 64KB）。
+    """
+
+    def __init__(self, key: str = 'data'):
+        self.key = key
+        self.envelope: Dict[str, Any] = {}
+        self.found = False
+        self.done = False
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._state = 'object'
+        self._name = None
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        self._append(self._text.decode(chunk))
+        return self._parse()
+
+    def close(self) -> List[Any]:
+        self._append(self._text.decode(b'', final=True))
+        self._eof = True
+        items = self._parse()
+        if not self.done:
+            raise ValueError("JSON 响应不完整")
+        return items
+
+    def _append(self, text: str):
+        # 丢弃已解析的部分，缓冲区只保留未完成的片段
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+
+    def _char(self) -> str:
+        """跳过空白，返回下一个字符，需要更多数据时返回空串"""
+        self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+        return self._buffer[self._pos] if self._pos < len(self._buffer) else ''
+
+    def _expect(self, char: str, expected: str) -> str:
+        if char not in expected:
+            raise ValueError(f"JSON 格式错误: 应为 {' 或 '.join(expected)}，实际为 {char!r}")
+        self._pos += 1
+        return char
+
+    def _value(self):
+        """解码一个完整的值，返回 (是否完成, 值)
+
+        值之后必须紧跟分隔符（, ] } :）才算完成，避免把被截断的数字（如 12.5 只收到 12）当成完整的值。
+        """
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if self._eof:
+                raise
+            return False, None
+        following = _WHITESPACE.match(self._buffer, end).end()
+        if not self._eof and self._buffer[following:following + 1] not in _SEPARATORS:
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _parse(self) -> List[Any]:
+        items = []
+        while not self.done:
+            char = self._char()
+            if not char:
+                if self._eof:
+                    raise ValueError("JSON 响应不完整")
+                break
+            state = self._state
+            if state == 'object':
+                self._expect(char, '{')
+                self._state = 'first_key'
+            elif state == 'first_key':
+                if char == '}':
+                    self._pos += 1
+                    self.done = True
+                else:
+                    self._state = 'key'
+            elif state == 'key':
+                complete, self._name = self._value()
+                if not complete:
+                    break
+                self._state = 'colon'
+            elif state == 'colon':
+                self._expect(char, ':')
+                self._state = 'value'
+            elif state == 'value':
+                if self._name == self.key and char == '[':
+                    self._pos += 1
+                    self.found = True
+                    self._state = 'first_item'
+                    continue
+                complete, value = self._value()
+                if not complete:
+                    break
+                self.envelope[self._name] = value
+                self._state = 'after_value'
+            elif state == 'first_item':
+                if char == ']':
+                    self._pos += 1
+                    self._state = 'after_value'
+                else:
+                    self._state = 'item'
+            elif state == 'item':
+                complete, value = self._value()
+                if not complete:
+                    break
+                items.append(value)
+                self._state = 'after_item'
+            elif state == 'after_item':
+                self._state = 'item' if self._expect(char, ',]') == ',' else 'after_value'
+            elif state == 'after_value':
+                if self._expect(char, ',}') == ',':
+                    self._state = 'key'
+                else:
+                    self.done = True
+        return items
+
+
+def iter_json_array(chunks: Iterable[bytes], parser: JSONArrayParser) -> Iterator[Any]:
+    """把按块读取的响应体交给 parser，逐个产出数组元素"""
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
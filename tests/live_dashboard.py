@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+压测实时面板
+长时间压测或容量搜索时每秒刷新一次终端：当前 RPS、在途请求数、各接口滑动窗口内的 p50/p99、
+错误数和客户端 CPU，便于及早发现饱和并中止（Ctrl-C）。
+
+面板在后台线程中轮询 LoadResult 的累计直方图，与上一次的差值即为这一周期的新增样本，
+每个差值带有采样时间，最近 window 秒的差值合并后计算滚动百分位，RPS 按实际经过的时间计算，
+因此不需要改动请求路径上的记录逻辑，刷新间隔也不必是 1 秒。
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from test_api import LatencyHistogram
+
+try:
+    import psutil
+except ImportError:  # 仅用于统计多进程压测中子进程的 CPU
+    psutil = None
+
+
+class CpuMeter:
+    """客户端 CPU 占用（百分比，多核可超过 100%）
+
+    安装 psutil 时包含子进程（多进程压测的工作进程），否则只统计当前进程。
+    """
+
+    def __init__(self):
+        self.process = psutil.Process() if psutil else None
+        self.children: Dict[int, 'psutil.Process'] = {}
+        self.last_wall = time.perf_counter()
+        self.last_cpu = time.process_time()
+        if self.process:
+            self.process.cpu_percent()
+
+    def percent(self) -> float:
+        if self.process is None:
+            wall, cpu = time.perf_counter(), time.process_time()
+            value = (cpu - self.last_cpu) / max(wall - self.last_wall, 1e-6) * 100
+            self.last_wall, self.last_cpu = wall, cpu
+            return value
+        total = self.process.cpu_percent()
+        try:
+            children = self.process.children(recursive=True)
+        except psutil.Error:
+            children = []
+        alive = {}
+        for child in children:
+            # 新出现的子进程第一次调用 cpu_percent 只建立基准，下一秒起才有读数
+            known = self.children.get(child.pid, child)
+            try:
+                total += known.cpu_percent()
+                alive[child.pid] = known
+            except psutil.Error:
+                pass
+        self.children = alive
+        return total
+
+
+class _EndpointWindow:
+    """单个接口的上次累计值和最近 window 秒内各次采样的增量"""
+
+    def __init__(self, window: float, started: float):
+        self.window = window
+        self.counts: Dict[int, int] = {}
+        self.completed = 0
+        self.errors = 0
+        self.last_sample = started
+        # (采样时间, 距上次采样的秒数, 直方图增量, 完成数增量, 错误数增量)
+        self.deltas: Deque[Tuple[float, float, Dict[int, int], int, int]] = deque()
+
+    def update(self, counts: Dict[int, int], completed: int, errors: int, now: float):
+        delta = {index: count - self.counts.get(index, 0) for index, count in counts.items()
+                 if count != self.counts.get(index, 0)}
+        self.deltas.append((now, now - self.last_sample, delta, completed - self.completed, errors - self.errors))
+        self.counts, self.completed, self.errors = counts, completed, errors
+        self.last_sample = now
+        # 丢弃窗口之外的采样，至少保留最近一次
+        while len(self.deltas) > 1 and self.deltas[0][0] <= now - self.window:
+            self.deltas.popleft()
+
+    def histogram(self) -> LatencyHistogram:
+        hist = LatencyHistogram()
+        for _, _, delta, _, _ in self.deltas:
+            for index, count in delta.items():
+                hist.counts[index] = hist.counts.get(index, 0) + count
+                hist.total_count += count
+        if hist.counts:
+            hist.max_value = max(hist._value_at(index) for index in hist.counts)
+        return hist
+
+    def rate(self, seconds: float = 1.0) -> float:
+        """最近 seconds 秒（至少最近一次采样）的每秒完成数，按采样之间实际经过的时间计算"""
+        recent = [sample for sample in self.deltas if sample[0] > self.last_sample - seconds]
+        recent = recent or list(self.deltas)[-1:]
+        elapsed = sum(span for _, span, _, _, _ in recent)
+        return sum(completed for _, _, _, completed, _ in recent) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def window_errors(self) -> int:
+        return sum(errors for _, _, _, _, errors in self.deltas)
+
+
+class LiveDashboard:
+    """压测实时面板，用法：
+
+        with LiveDashboard() as dashboard:
+            asyncio.run(run_open_loop(..., dashboard=dashboard))
+
+    压测函数创建 LoadResult 后调用 watch(result, title)，结束时调用 detach() 画出最后一帧并停止刷新，
+    之后打印的报告不会被下一帧覆盖；容量搜索和分阶段压测可反复 watch 新的结果。
+    标准输出是终端时原地刷新，否则每个周期输出一行摘要。
+    """
+
+    def __init__(self, interval: float = 1.0, window: float = 10, stream=None):
+        self.interval = interval
+        self.window = window
+        self.stream = stream or sys.stdout
+        self.tty = self.stream.isatty()
+        self.cpu = CpuMeter()
+        self.result = None
+        self.title = ''
+        self.started = 0.0
+        self.endpoints: Dict[str, _EndpointWindow] = {}
+        self.rps = 0.0
+        self._lines = 0
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def watch(self, result, title: str = ''):
+        """切换到新的 LoadResult，滚动窗口重新开始"""
+        with self._lock:
+            self.result = result
+            self.title = title
+            self.started = time.perf_counter()
+            self.endpoints = {}
+            self.rps = 0.0
+
+    def detach(self):
+        """画出当前结果的最后一帧并停止跟踪，下一帧从新的一行开始"""
+        with self._lock:
+            self.refresh()
+            self.result = None
+            self._lines = 0
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
+        self.refresh()
+
+    def sample(self) -> Optional[Dict]:
+        """读取一次累计值并更新滚动窗口，返回当前面板数据"""
+        with self._lock:
+            result = self.result
+            if result is None:
+                return None
+            # 压测在其他线程中运行，先复制再读取；dict 复制在 GIL 下是原子的
+            latencies = dict(result.latencies)
+            errors = dict(result.errors)
+            completed = 0
+            rows = []
+            now = time.perf_counter()
+            for name in sorted(latencies):
+                latency = latencies[name]
+                window = self.endpoints.get(name)
+                if window is None:
+                    window = self.endpoints[name] = _EndpointWindow(self.window, self.started)
+                window.update(dict(latency.response.counts), latency.count, errors.get(name, 0), now)
+                completed += window.completed
+                hist = window.histogram()
+                rows.append((name, window.rate(), hist.value_at_percentile(50) / 1000.0,
+                             hist.value_at_percentile(99) / 1000.0, window.window_errors,
+                             window.errors, window.completed))
+            sent = result.sent
+            self.rps = sum(row[1] for row in rows)
+            return {
+                'title': self.title,
+                'elapsed': now - self.started,
+                'duration': result.duration,
+                'rps': self.rps,
+                'in_flight': max(sent - completed, 0),
+                'sent': sent,
+                'completed': completed,
+                'errors': sum(errors.values()),
+                'cpu': self.cpu.percent(),
+                'rows': rows,
+            }
+
+    def render(self, data: Dict) -> List[str]:
+        error_rate = data['errors'] / data['completed'] * 100 if data['completed'] else 0.0
+        lines = [
+            f"Nomur 压测实时面板  {data['title']}  已运行 {data['elapsed']:.0f}s / {data['duration']:g}s  "
+            f"(Ctrl-C 中止)",
+            f"当前 RPS {data['rps']:.1f}  在途 {data['in_flight']}  已完成 {data['completed']}  "
+            f"错误 {data['errors']} ({error_rate:.2f}%)  客户端 CPU {data['cpu']:.0f}% ({os.cpu_count()} 核)",
+            '-' * 96,
+            f"{'接口':<40}{'RPS':>8}{f'p50({self.window:g}s)':>11}{f'p99({self.window:g}s)':>11}"
+            f"{f'错误({self.window:g}s)':>10}{'累计错误':>8}{'累计':>8}",
+        ]
+        for name, rps, p50, p99, window_errors, errors, completed in data['rows']:
+            lines.append(f"{name[:40]:<40}{rps:>8.1f}{p50:>11.1f}{p99:>11.1f}{window_errors:>10}"
+                         f"{errors:>8}{completed:>8}")
+        return lines
+
+    def refresh(self):
+        with self._lock:
+            self._draw(self.sample())
+
+    def _draw(self, data: Optional[Dict]):
+        if data is None:
+            return
+        if not self.tty:
+            p99 = max((row[3] for row in data['rows']), default=0.0)
+            self.stream.write(f"[{data['elapsed']:.0f}s] RPS {data['rps']:.1f} 在途 {data['in_flight']} "
+                              f"错误 {data['errors']} 最大p99 {p99:.1f}ms CPU {data['cpu']:.0f}%\n")
+            self.stream.flush()
+            return
+        lines = self.render(data)
+        # 回到上一帧的起始行并清除到屏幕末尾，保留面板之前的输出
+        prefix = f"\x1b[{self._lines}F\x1b[J" if self._lines else ''
+        self.stream.write(prefix + '\n'.join(lines) + '\n')
+        self.stream.flush()
+        self._lines = len(lines)
@@ -0,0 +1,1115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Nomur API 压力测试脚本
+基于 test_api.py 中的客户端和延迟直方图，以开环恒定到达率向接口施压，
+不等待前序请求返回，用于观察 Express 服务和 MySQL 连接池在并发下的退化情况
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from html_report import HtmlReport
+from live_dashboard import LiveDashboard
+from response_cache import ResponseCache
+from test_api import (BASE_URL, RESULT_SINK, APIClient, AsyncAPIClient, EndpointLatency, TestReporter,
+                      TestStatus)
+
+try:
+    import yaml
+except ImportError:  # 仅 YAML 格式的负载文件需要
+    yaml = None
+
+
+@dataclass
+class Fixtures:
+    """压测所需的基础数据"""
+    agent_ids: List[str] = field(default_factory=list)
+    products: List[Dict] = field(default_factory=list)
+    promotions: List[Dict] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, base_url: str = BASE_URL) -> 'Fixtures':
+        """读取现有代理和商品，缺失时创建测试数据"""
+        client = APIClient(base_url)
+        fixtures = cls(
+            agent_ids=[a['id'] for a in client.get('/agents').get('data') or []],
+            products=client.get('/products').get('data') or [],
+            promotions=[p for p in client.get('/promotions').get('data') or [] if p.get('isActive')],
+        )
+        if not fixtures.products:
+            response = client.post('/products', {
+                'name': f'测试商品_{uuid.uuid4().hex[:8]}',
+                'image': '',
+                'price': 299.00,
+                'weight': 5.5,
+                'materials': []
+            })
+            fixtures.products.append({'id': response['data']['id'], 'name': '测试商品',
+                                      'price': 299.00, 'weight': 5.5})
+        while len(fixtures.agent_ids) < 2:
+            response = client.post('/agents', {
+                'name': f'测试代理_{uuid.uuid4().hex[:8]}',
+                'phone1': f'138{random.randint(0, 99999999):08d}',
+                'phone2': '',
+                'address': '测试地址123号'
+            })
+            fixtures.agent_ids.append(response['data']['id'])
+        return fixtures
+
+
+# build(fixtures, rng) -> (endpoint, data, params)
+RequestBuilder = Callable[[Fixtures, random.Random], Tuple[str, Optional[Dict], Optional[Dict]]]
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    build: RequestBuilder
+
+
+def _order_payload(fixtures: Fixtures, rng: random.Random) -> Dict:
+    product = rng.choice(fixtures.products)
+    quantity = rng.choice([10, 20, 50, 100])
+    price = float(product.get('price') or 0)
+    weight = float(product.get('weight') or 0)
+    return {
+        'agentId': rng.choice(fixtures.agent_ids),
+        'items': [{
+            'productId': product['id'],
+            'productName': product.get('name', ''),
+            'quantity': quantity,
+            'price': price,
+            'weight': weight
+        }],
+        'totalWeight': round(weight * quantity, 2),
+        'totalAmount': round(price * quantity, 2),
+        'driverPhone': '13800000000',
+        'images': []
+    }
+
+
+def _transfer_payload(fixtures: Fixtures, rng: random.Random) -> Dict:
+    from_agent, to_agent = rng.sample(fixtures.agent_ids, 2)
+    return {
+        'fromAgentId': from_agent,
+        'toAgentId': to_agent,
+        'amount': 100.00,
+        'productId': rng.choice(fixtures.products)['id'],
+        'quantity': 1
+    }
+
+
+# 可压测的接口目录，键即命令行中使用的名称
+ENDPOINTS: Dict[str, Endpoint] = {e.name: e for e in [
+    Endpoint('GET /orders', 'GET', lambda f, r: ('/orders', None, None)),
+    Endpoint('GET /orders?agentId', 'GET',
+             lambda f, r: ('/orders', None, {'agentId': r.choice(f.agent_ids)})),
+    Endpoint('POST /orders', 'POST', lambda f, r: ('/orders', _order_payload(f, r), None)),
+    Endpoint('GET /agents', 'GET', lambda f, r: ('/agents', None, None)),
+    Endpoint('GET /agents/:id/statistics', 'GET',
+             lambda f, r: (f'/agents/{r.choice(f.agent_ids)}/statistics', None, None)),
+    Endpoint('GET /agents/:id/promotions/progress', 'GET',
+             lambda f, r: (f'/agents/{r.choice(f.agent_ids)}/promotions/progress', None, None)),
+    Endpoint('GET /products', 'GET', lambda f, r: ('/products', None, None)),
+    Endpoint('GET /promotions', 'GET', lambda f, r: ('/promotions', None, None)),
+    Endpoint('GET /statistics', 'GET', lambda f, r: ('/statistics', None, None)),
+    Endpoint('GET /transactions', 'GET', lambda f, r: ('/transactions', None, None)),
+    Endpoint('POST /transactions/recharge', 'POST', lambda f, r: ('/transactions/recharge', {
+        'agentId': r.choice(f.agent_ids),
+        'amount': 1000.00,
+        'reason': 'payment',
+        'remark': '压测充值'
+    }, None)),
+    Endpoint('POST /transactions/transfer', 'POST',
+             lambda f, r: ('/transactions/transfer', _transfer_payload(f, r), None)),
+]}
+
+
+@dataclass
+class LoadResult:
+    """一次压测的结果"""
+    rate: float
+    duration: float
+    elapsed: float = 0.0
+    sent: int = 0
+    from_cache: int = 0  # 直接由客户端缓存返回的请求，没有到达服务端，不计入已发送、延迟和吞吐
+    max_in_flight: int = 0
+    latencies: Dict[str, EndpointLatency] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+    connections: Dict[str, int] = field(default_factory=dict)  # 客户端连接统计，见 ConnectionStats
+    cache: Dict[str, int] = field(default_factory=dict)  # 客户端响应缓存统计，见 ResponseCache
+    coalesced: Dict[str, int] = field(default_factory=dict)  # 相同 GET 合并统计，见 SingleFlight
+
+    def latency(self, name: str) -> EndpointLatency:
+        if name not in self.latencies:
+            self.latencies[name] = EndpointLatency()
+        return self.latencies[name]
+
+    def merge_snapshot(self, snapshot: Dict):
+        """合并工作进程上报的增量快照"""
+        self.sent += snapshot.get('sent', 0)
+        self.from_cache += snapshot.get('from_cache', 0)
+        for name, data in snapshot.get('latencies', {}).items():
+            self.latency(name).merge(EndpointLatency.from_dict(data))
+        for name, count in snapshot.get('errors', {}).items():
+            self.errors[name] = self.errors.get(name, 0) + count
+        for name, count in snapshot.get('connections', {}).items():
+            self.connections[name] = self.connections.get(name, 0) + count
+        for name, count in snapshot.get('cache', {}).items():
+            self.cache[name] = self.cache.get(name, 0) + count
+
+    def overall(self) -> EndpointLatency:
+        total = EndpointLatency()
+        for latency in self.latencies.values():
+            total.merge(latency)
+        return total
+
+    @property
+    def completed(self) -> int:
+        return sum(latency.count for latency in self.latencies.values())
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors.values())
+
+    @property
+    def throughput(self) -> float:
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'rate': self.rate,
+            'duration': self.duration,
+            'elapsed': round(self.elapsed, 3),
+            'sent': self.sent,
+            'from_cache': self.from_cache,
+            'completed': self.completed,
+            'throughput': round(self.throughput, 2),
+            'max_in_flight': self.max_in_flight,
+            'errors': dict(self.errors),
+            'connections': dict(self.connections),
+            'cache': dict(self.cache),
+            'coalesced': dict(self.coalesced),
+            'overall': _latency_summary(self.overall()),
+            'endpoints': {name: _latency_summary(latency) for name, latency in self.latencies.items()},
+        }
+
+    def report(self) -> str:
+        header = (f"{'接口':<40}{'请求数':>8}{'错误':>7}{'p50':>9}{'p90':>9}{'p99':>9}"
+                  f"{'p99.9':>9}{'max':>9}{'服务p99':>9}")
+        lines = [
+            '=' * 100,
+            '压测报告（延迟单位：毫秒）',
+            '=' * 100,
+            f"测试时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"目标速率: {f'{self.rate:g} req/s' if self.rate else '不限速'}  "
+            f"持续: {self.duration:g}秒  实际耗时: {self.elapsed:.1f}秒",
+            f"已发送: {self.sent}  已完成: {self.completed}  错误: {self.error_count}  "
+            f"吞吐: {self.throughput:.1f} req/s  最大在途: {self.max_in_flight}",
+        ]
+        if self.connections:
+            c = self.connections
+            lines.append(f"连接: 新建 {c.get('opened', 0)}（重连 {c.get('reconnected', 0)}）  "
+                         f"复用 {c.get('reused', 0)}  丢弃 {c.get('discarded', 0)}")
+        if self.cache:
+            c = self.cache
+            lines.append(f"缓存: 命中 {c.get('hits', 0)}  未命中 {c.get('misses', 0)}"
+                         f"（304 {c.get('revalidated', 0)}）  失效 {c.get('invalidations', 0)}  "
+                         f"淘汰 {c.get('evictions', 0)}  直接由缓存返回 {self.from_cache}（不计入统计）")
+        if self.coalesced:
+            lines.append(f"合并: 实际发出 {self.coalesced.get('leaders', 0)} 个 GET，"
+                         f"{self.coalesced.get('coalesced', 0)} 个共享了在途请求的结果")
+        lines += [
+            '-' * 100,
+            header,
+        ]
+        rows = sorted(self.latencies.items()) + [('总计', self.overall())]
+        for name, latency in rows:
+            s = latency.response.summary()
+            errors = self.error_count if name == '总计' else self.errors.get(name, 0)
+            lines.append(f"{name:<40}{latency.count:>8}{errors:>7}{s['p50']:>9.1f}{s['p90']:>9.1f}"
+                         f"{s['p99']:>9.1f}{s['p99.9']:>9.1f}{s['max_ms']:>9.1f}"
+                         f"{latency.service.value_at_percentile(99) / 1000.0:>9.1f}")
+        lines.append('=' * 100)
+        return '\n'.join(lines)
+
+
+def _latency_summary(latency: EndpointLatency) -> Dict:
+    summary = latency.response.summary()
+    summary['service'] = latency.service.summary()
+    return summary
+
+
+async def run_open_loop(endpoints: List[Endpoint], rate: float, duration: float,
+                        fixtures: Fixtures, base_url: str = BASE_URL,
+                        concurrency: int = 1000, seed: Optional[int] = None,
+                        weights: Optional[List[float]] = None,
+                        dashboard: Optional[LiveDashboard] = None, cache: bool = False,
+                        coalesce: bool = False) -> LoadResult:
+    """开环恒定到达率压测
+
+    第 i 个请求的计划发送时间固定为 start + i/rate，无论之前的请求是否返回都按时发出；
+    未指定 weights 时按顺序轮流请求各接口，否则按权重随机选取。
+    cache 为 True 时客户端缓存基础数据接口（见 ResponseCache），直接由缓存返回的请求只计入 from_cache；
+    coalesce 为 True 时合并同时在途的相同 GET。
+    响应延迟从计划发送时间算起，因此客户端排队和服务端阻塞都会体现在结果中，
+    服务延迟则从请求实际开始执行时算起。
+    """
+    rng = random.Random(seed)
+    result = LoadResult(rate=rate, duration=duration)
+    if dashboard:
+        dashboard.watch(result, f"开环 {rate:g} req/s")
+    in_flight = 0
+
+    async def fire(client: AsyncAPIClient, endpoint: Endpoint, intended: float):
+        nonlocal in_flight
+        in_flight += 1
+        result.max_in_flight = max(result.max_in_flight, in_flight)
+        result.sent += 1
+        actual_start = time.perf_counter()
+        path, data, params = endpoint.build(fixtures, rng)
+        try:
+            response, from_cache = await client.fetch(endpoint.method, path, data=data, params=params)
+            ok = response.get('code') == 0
+        except Exception:
+            from_cache, ok = False, False
+        if from_cache:
+            result.sent -= 1
+            result.from_cache += 1
+            in_flight -= 1
+            return
+        result.latency(endpoint.name).record(intended, actual_start, time.perf_counter(), error=not ok,
+                                             detail=f"{endpoint.method} {path}")
+        if not ok:
+            result.errors[endpoint.name] = result.errors.get(endpoint.name, 0) + 1
+        in_flight -= 1
+
+    interval = 1.0 / rate
+    tasks = set()
+    async with AsyncAPIClient(base_url, concurrency=concurrency,
+                              cache=ResponseCache() if cache else None, coalesce=coalesce) as client:
+        start = time.perf_counter()
+        scheduled = 0
+        while True:
+            intended = start + scheduled * interval
+            if intended - start >= duration:
+                break
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if weights:
+                endpoint = rng.choices(endpoints, weights)[0]
+            else:
+                endpoint = endpoints[scheduled % len(endpoints)]
+            task = asyncio.create_task(fire(client, endpoint, intended))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            scheduled += 1
+        if tasks:
+            await asyncio.gather(*tasks)
+        result.elapsed = time.perf_counter() - start
+    result.connections = client.connection_stats.summary()
+    result.cache = client.cache.summary() if cache else {}
+    result.coalesced = client.single_flight.summary() if coalesce else {}
+    if dashboard:
+        dashboard.detach()
+    return result
+
+
+def _scenario_worker(worker_id: int, endpoint_names: List[str], fixtures: Fixtures, base_url: str,
+                     duration: float, rate: float, seed: Optional[int], report_interval: float,
+                     results: multiprocessing.Queue, cache: bool = False,
+                     reports: Optional[multiprocessing.Queue] = None):
+    """工作进程：以独立的 APIClient 闭环轮流请求各接口，定期上报增量直方图
+
+    rate 为本进程的目标速率，0 表示不限速。限速时按计划时间记录响应延迟，
+    请求落后于计划时排队时间也会计入。传入 reports 时失败的请求经 TestReporter
+    发回父进程，与其他进程的记录合并到同一个结果集。
+    """
+    if reports is not None:
+        TestReporter.use_queue(reports)
+    endpoints = resolve_endpoints(endpoint_names)
+    client = APIClient(base_url, record_latency=False, cache=ResponseCache() if cache else None)
+    rng = random.Random(None if seed is None else seed + worker_id)
+    interval = 1.0 / rate if rate else 0
+    snapshot = {'sent': 0, 'from_cache': 0, 'latencies': {}, 'errors': {}}
+    sent = 0
+
+    def flush(final: bool):
+        results.put({
+            'worker': worker_id,
+            'final': final,
+            'sent': snapshot['sent'],
+            'from_cache': snapshot['from_cache'],
+            'latencies': {name: latency.to_dict() for name, latency in snapshot['latencies'].items()},
+            'errors': snapshot['errors'],
+            'connections': client.connection_stats.summary() if final else {},
+            'cache': client.cache.summary() if final and cache else {},
+        })
+        snapshot.update(sent=0, from_cache=0, latencies={}, errors={})
+
+    start = last_flush = time.perf_counter()
+    try:
+        while time.perf_counter() - start < duration:
+            endpoint = endpoints[sent % len(endpoints)]
+            intended = start + sent * interval if interval else time.perf_counter()
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            actual_start = time.perf_counter()
+            path, data, params = endpoint.build(fixtures, rng)
+            error = None
+            try:
+                response, from_cache = client.fetch(endpoint.method, path, data=data, params=params)
+                ok = response.get('code') == 0
+                if not ok:
+                    error = f"code={response.get('code')} {response.get('message', '')}".rstrip()
+            except Exception as e:
+                from_cache, ok, error = False, False, str(e)
+            end = time.perf_counter()
+            sent += 1
+            if from_cache:
+                snapshot['from_cache'] += 1
+            else:
+                snapshot['sent'] += 1
+                if endpoint.name not in snapshot['latencies']:
+                    snapshot['latencies'][endpoint.name] = EndpointLatency()
+                snapshot['latencies'][endpoint.name].record(intended, actual_start, end, error=not ok,
+                                                            detail=f"{endpoint.method} {path}")
+                if not ok:
+                    snapshot['errors'][endpoint.name] = snapshot['errors'].get(endpoint.name, 0) + 1
+                    TestReporter.record(f"压测 {endpoint.name}", TestStatus.FAIL, f"{endpoint.method} {path}",
+                                        end - actual_start, {'worker': worker_id}, error, echo=False)
+            if end - last_flush >= report_interval:
+                flush(False)
+                last_flush = end
+    finally:
+        TestReporter.flush()
+        flush(True)
+
+
+def run_multiprocess(endpoint_names: List[str], workers: int, duration: float, fixtures: Fixtures,
+                     base_url: str = BASE_URL, rate: float = 0, seed: Optional[int] = None,
+                     report_interval: float = 1.0, dashboard: Optional[LiveDashboard] = None,
+                     cache: bool = False) -> LoadResult:
+    """多进程压测：启动 workers 个进程各自施压，协调进程合并上报的直方图和错误数
+
+    rate 为所有进程合计的目标速率，平均分配到各进程；0 表示每个进程都不限速。
+    cache 为 True 时每个进程的客户端各自缓存基础数据接口。每个进程闭环发送、同一时刻最多一个
+    在途请求，max_in_flight 取同时存活的工作进程数的最大值。
+    各进程失败的请求经 TestReporter 的队列汇总到本进程的结果集（RESULT_SINK）。
+    """
+    if workers < 1:
+        raise ValueError(f"workers 必须至少为 1: {workers}")
+    result = LoadResult(rate=rate, duration=duration)
+    if dashboard:
+        dashboard.watch(result, f"{workers} 个进程")
+    results = multiprocessing.Queue()
+    reports = multiprocessing.Queue()
+    listener = TestReporter.listen(reports)
+    processes = [
+        multiprocessing.Process(
+            target=_scenario_worker,
+            args=(i, endpoint_names, fixtures, base_url, duration, rate / workers, seed,
+                  report_interval, results, cache, reports),
+            daemon=True
+        )
+        for i in range(workers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+
+    finished = 0
+    while finished < workers:
+        result.max_in_flight = max(result.max_in_flight, sum(p.is_alive() for p in processes))
+        try:
+            snapshot = results.get(timeout=report_interval * 2)
+        except queue.Empty:
+            if not any(p.is_alive() for p in processes):
+                print(f"警告: {workers - finished} 个工作进程异常退出")
+                break
+            continue
+        result.merge_snapshot(snapshot)
+        finished += snapshot['final']
+        if not dashboard:
+            print(f"\r已完成 {result.completed} 个请求，错误 {result.error_count}，"
+                  f"已结束进程 {finished}/{workers}", end='', flush=True)
+    if not dashboard:
+        print()
+    for process in processes:
+        process.join(timeout=5)
+    listener.stop()
+    RESULT_SINK.flush()
+    result.elapsed = time.perf_counter() - start
+    if dashboard:
+        dashboard.detach()
+    return result
+
+
+WORKLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'workloads')
+
+# 负载文件中的参数生成器，形如 {"uniform": [100, 5000]}
+PARAM_GENERATORS = ('choice', 'uniform', 'randint', 'fixture', 'uuid')
+
+
+def generate_value(spec, fixtures: Fixtures, rng: random.Random):
+    """按负载文件中的描述生成参数值，非生成器的值原样返回"""
+    if isinstance(spec, dict) and len(spec) == 1 and next(iter(spec)) in PARAM_GENERATORS:
+        kind, arg = next(iter(spec.items()))
+        if kind == 'choice':
+            return rng.choice(arg)
+        if kind == 'uniform':
+            return round(rng.uniform(*arg), 2)
+        if kind == 'randint':
+            return rng.randint(*arg)
+        if kind == 'fixture':
+            if arg == 'agent_id':
+                return rng.choice(fixtures.agent_ids)
+            if arg == 'product_id':
+                return rng.choice(fixtures.products)['id']
+            raise ValueError(f"未知的 fixture: {arg}")
+        return f"{arg}{uuid.UUID(int=rng.getrandbits(128)).hex[:8]}"
+    if isinstance(spec, dict):
+        return {key: generate_value(value, fixtures, rng) for key, value in spec.items()}
+    if isinstance(spec, list):
+        return [generate_value(value, fixtures, rng) for value in spec]
+    return spec
+
+
+def _think_time(spec, rng: random.Random) -> float:
+    if isinstance(spec, (list, tuple)):
+        return rng.uniform(*spec)
+    return float(spec or 0)
+
+
+@dataclass
+class WorkloadRequest:
+    endpoint: Endpoint
+    weight: float
+    think_time: object = None  # 秒数或 [最小, 最大]，为空时使用负载的默认值
+
+
+@dataclass
+class Workload:
+    """负载文件描述的加权请求组合"""
+    name: str
+    requests: List[WorkloadRequest]
+    think_time: object = 0
+    description: str = ''
+
+    @classmethod
+    def load(cls, path: str) -> 'Workload':
+        """读取 JSON 或 YAML 格式的负载文件"""
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith(('.yaml', '.yml')):
+                if yaml is None:
+                    raise RuntimeError("读取 YAML 负载文件需要 PyYAML，请先执行: pip install pyyaml")
+                config = yaml.safe_load(f)
+            else:
+                config = json.load(f)
+        return cls(
+            name=config.get('name', path),
+            description=config.get('description', ''),
+            think_time=config.get('think_time', 0),
+            requests=[WorkloadRequest(_workload_endpoint(spec), float(spec.get('weight', 1)),
+                                      spec.get('think_time'))
+                      for spec in config['requests']],
+        )
+
+    @property
+    def endpoints(self) -> List[Endpoint]:
+        return [request.endpoint for request in self.requests]
+
+    @property
+    def weights(self) -> List[float]:
+        return [request.weight for request in self.requests]
+
+    def pick(self, rng: random.Random) -> WorkloadRequest:
+        return rng.choices(self.requests, self.weights)[0]
+
+    def think(self, request: WorkloadRequest, rng: random.Random) -> float:
+        spec = request.think_time if request.think_time is not None else self.think_time
+        return _think_time(spec, rng)
+
+
+def _workload_endpoint(spec: Dict) -> Endpoint:
+    """由负载文件中的一项生成 Endpoint
+
+    endpoint 引用 ENDPOINTS 中的接口，data/params 中的字段会覆盖其默认值；
+    也可以用 method + path 描述目录外的接口，path 支持 {agent_id}、{product_id} 占位符。
+    """
+    base = resolve_endpoints([spec['endpoint']])[0] if 'endpoint' in spec else None
+    method = spec.get('method', base.method if base else 'GET').upper()
+    name = spec.get('name') or (base.name if base else f"{method} {spec['path']}")
+
+    def build(fixtures: Fixtures, rng: random.Random):
+        if base:
+            path, data, params = base.build(fixtures, rng)
+        else:
+            path = spec['path'].format(agent_id=rng.choice(fixtures.agent_ids),
+                                       product_id=rng.choice(fixtures.products)['id'])
+            data, params = None, None
+        if 'data' in spec:
+            data = {**(data or {}), **generate_value(spec['data'], fixtures, rng)}
+        if 'params' in spec:
+            params = {**(params or {}), **generate_value(spec['params'], fixtures, rng)}
+        return path, data, params
+
+    return Endpoint(name, method, build)
+
+
+async def run_closed_loop(workload: Workload, users: int, duration: float, fixtures: Fixtures,
+                          base_url: str = BASE_URL, seed: Optional[int] = None,
+                          dashboard: Optional[LiveDashboard] = None, cache: bool = False,
+                          coalesce: bool = False) -> LoadResult:
+    """闭环压测：users 个虚拟用户各自按权重选取请求，收到响应后等待思考时间再发下一个
+
+    cache 为 True 时所有虚拟用户共用一个缓存基础数据接口的客户端，直接由缓存返回的请求
+    不计入延迟统计；coalesce 为 True 时同时发出的相同 GET 只请求一次。
+    """
+    result = LoadResult(rate=0, duration=duration)
+    if dashboard:
+        dashboard.watch(result, f"闭环 {users} 个用户")
+
+    async def user(client: AsyncAPIClient, rng: random.Random, deadline: float):
+        while time.perf_counter() < deadline:
+            request = workload.pick(rng)
+            endpoint = request.endpoint
+            path, data, params = endpoint.build(fixtures, rng)
+            result.sent += 1
+            start = time.perf_counter()
+            try:
+                response, from_cache = await client.fetch(endpoint.method, path, data=data, params=params)
+                ok = response.get('code') == 0
+            except Exception:
+                from_cache, ok = False, False
+            if from_cache:
+                result.sent -= 1
+                result.from_cache += 1
+            else:
+                result.latency(endpoint.name).record(start, start, time.perf_counter(), error=not ok,
+                                                     detail=f"{endpoint.method} {path}")
+                if not ok:
+                    result.errors[endpoint.name] = result.errors.get(endpoint.name, 0) + 1
+            await asyncio.sleep(min(workload.think(request, rng), max(deadline - time.perf_counter(), 0)))
+
+    master = random.Random(seed)
+    async with AsyncAPIClient(base_url, concurrency=users, cache=ResponseCache() if cache else None,
+                              coalesce=coalesce) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[user(client, random.Random(master.getrandbits(64)), start + duration)
+                               for _ in range(users)])
+        result.elapsed = time.perf_counter() - start
+    result.connections = client.connection_stats.summary()
+    result.cache = client.cache.summary() if cache else {}
+    result.coalesced = client.single_flight.summary() if coalesce else {}
+    result.max_in_flight = users
+    if dashboard:
+        dashboard.detach()
+    return result
+
+
+class BusinessFlowSimulator:
+    """API 层面的业务流程虚拟用户，对应 full_demo_automation.py 在浏览器中走过的流程
+
+    管理端用户：充值 -> 极速开单（含促销赠品）-> 标记发货 -> 调货
+    代理端用户：业绩看板 -> 余额明细 -> 促销进度
+    每个步骤单独记录延迟，接口名形如 "管理端/极速开单"。
+    """
+
+    def __init__(self, fixtures: Fixtures, base_url: str = BASE_URL,
+                 think_time: Tuple[float, float] = (0.5, 2.0), seed: Optional[int] = None,
+                 dashboard: Optional[LiveDashboard] = None, cache: bool = False, coalesce: bool = False):
+        self.fixtures = fixtures
+        self.base_url = base_url
+        self.think_time = think_time
+        self.master_rng = random.Random(seed)
+        self.dashboard = dashboard
+        self.cache = cache
+        self.coalesce = coalesce
+        self.result = None
+
+    async def step(self, client: AsyncAPIClient, name: str, method: str, path: str,
+                   data: Dict = None, params: Dict = None) -> Optional[Dict]:
+        """执行一个业务步骤，失败时返回 None"""
+        self.result.sent += 1
+        start = time.perf_counter()
+        try:
+            response, from_cache = await client.fetch(method, path, data=data, params=params)
+            if response.get('code') != 0:
+                response = None
+        except Exception:
+            response, from_cache = None, False
+        if from_cache:
+            self.result.sent -= 1
+            self.result.from_cache += 1
+            return response
+        self.result.latency(name).record(start, start, time.perf_counter(), error=response is None,
+                                         detail=f"{method} {path}")
+        if response is None:
+            self.result.errors[name] = self.result.errors.get(name, 0) + 1
+        return response
+
+    async def think(self, rng: random.Random):
+        await asyncio.sleep(rng.uniform(*self.think_time))
+
+    def _gift_items(self, order: Dict) -> Tuple[List[str], List[Dict]]:
+        """按促销门槛计算赠品，与极速开单页面的旧格式（单品赠品）一致"""
+        quantity = sum(item['quantity'] for item in order['items'])
+        products = {p['id']: p for p in self.fixtures.products}
+        promotion_ids, gift_items = [], []
+        for promotion in self.fixtures.promotions:
+            times = quantity // promotion['threshold'] if promotion.get('threshold') else 0
+            gifts = [g for g in promotion.get('gifts') or [] if g.get('productId')]
+            if times <= 0 or not gifts:
+                continue
+            promotion_ids.append(promotion['id'])
+            for gift in gifts:
+                gift_items.append({
+                    'productId': gift['productId'],
+                    'productName': products.get(gift['productId'], {}).get('name', gift['productId']),
+                    'quantity': gift['quantity'] * times
+                })
+        return promotion_ids, gift_items
+
+    async def admin_user(self, client: AsyncAPIClient, rng: random.Random, deadline: float):
+        while time.perf_counter() < deadline:
+            agent_id = rng.choice(self.fixtures.agent_ids)
+            await self.step(client, '管理端/充值', 'POST', '/transactions/recharge', {
+                'agentId': agent_id,
+                'amount': round(rng.uniform(1000, 20000), 2),
+                'reason': 'payment',
+                'remark': '虚拟用户充值'
+            })
+            await self.think(rng)
+
+            order = _order_payload(self.fixtures, rng)
+            order['agentId'] = agent_id
+            promotion_ids, gift_items = self._gift_items(order)
+            if promotion_ids:
+                order['promotionId'] = json.dumps(promotion_ids)
+                order['giftItems'] = gift_items
+            created = await self.step(client, '管理端/极速开单', 'POST', '/orders', order)
+            await self.think(rng)
+
+            if created and created.get('data', {}).get('id'):
+                await self.step(client, '管理端/标记发货', 'PUT',
+                                f"/orders/{created['data']['id']}/status", {'status': 'shipped'})
+                await self.think(rng)
+
+            await self.step(client, '管理端/调货', 'POST', '/transactions/transfer',
+                            _transfer_payload(self.fixtures, rng))
+            await self.think(rng)
+
+    async def agent_user(self, client: AsyncAPIClient, rng: random.Random, deadline: float,
+                         agent_id: str):
+        while time.perf_counter() < deadline:
+            await self.step(client, '代理端/业绩看板', 'GET', f'/agents/{agent_id}/statistics')
+            await self.think(rng)
+            await self.step(client, '代理端/余额明细', 'GET', '/transactions', params={'agentId': agent_id})
+            await self.think(rng)
+            await self.step(client, '代理端/促销进度', 'GET', f'/agents/{agent_id}/promotions/progress')
+            await self.think(rng)
+
+    async def run(self, admins: int, agents: int, duration: float) -> LoadResult:
+        """同时运行 admins 个管理端用户和 agents 个代理端用户"""
+        self.result = LoadResult(rate=0, duration=duration)
+        if self.dashboard:
+            self.dashboard.watch(self.result, f"{admins} 管理端 + {agents} 代理端")
+        users = admins + agents
+        async with AsyncAPIClient(self.base_url, concurrency=max(users, 1),
+                                  cache=ResponseCache() if self.cache else None,
+                                  coalesce=self.coalesce) as client:
+            start = time.perf_counter()
+            deadline = start + duration
+            tasks = [self.admin_user(client, random.Random(self.master_rng.getrandbits(64)), deadline)
+                     for _ in range(admins)]
+            tasks += [self.agent_user(client, random.Random(self.master_rng.getrandbits(64)), deadline,
+                                      self.fixtures.agent_ids[i % len(self.fixtures.agent_ids)])
+                      for i in range(agents)]
+            await asyncio.gather(*tasks)
+            self.result.elapsed = time.perf_counter() - start
+        self.result.connections = client.connection_stats.summary()
+        self.result.cache = client.cache.summary() if self.cache else {}
+        self.result.coalesced = client.single_flight.summary() if self.coalesce else {}
+        self.result.max_in_flight = users
+        if self.dashboard:
+            self.dashboard.detach()
+        return self.result
+
+
+def first_degraded_step(stages: List[Tuple[int, LoadResult]], factor: float) -> Optional[Tuple[str, int]]:
+    """找出 p99 最先超过首个阶段 factor 倍的步骤，返回 (步骤, 代理端用户数)"""
+    if not stages:
+        return None
+    baseline = {name: latency.response.value_at_percentile(99)
+                for name, latency in stages[0][1].latencies.items()}
+    for agents, result in stages[1:]:
+        ratios = {name: latency.response.value_at_percentile(99) / baseline[name]
+                  for name, latency in result.latencies.items() if baseline.get(name)}
+        degraded = [name for name, ratio in ratios.items() if ratio >= factor]
+        if degraded:
+            return max(degraded, key=ratios.get), agents
+    return None
+
+
+@dataclass
+class CapacityTrial:
+    rate: float
+    p99_ms: float
+    error_rate: float
+    throughput: float
+    passed: bool
+
+
+@dataclass
+class CapacityResult:
+    """单个接口的容量搜索结果"""
+    endpoint: str
+    p99_budget_ms: float
+    max_error_rate: float
+    capacity: float = 0.0
+    capped: bool = False  # max_rate 仍达标，capacity 只是搜索上限，实际容量更高
+    trials: List[CapacityTrial] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            'endpoint': self.endpoint,
+            'p99_budget_ms': self.p99_budget_ms,
+            'max_error_rate': self.max_error_rate,
+            'capacity': self.capacity,
+            'capped': self.capped,
+            'trials': [trial.__dict__ for trial in self.trials],
+        }
+
+
+def search_capacity(endpoint: Endpoint, fixtures: Fixtures, p99_budget_ms: float,
+                    max_error_rate: float = 0.01, start_rate: float = 10, max_rate: float = 5000,
+                    step_duration: float = 10, precision: float = 0.05, cooldown: float = 2,
+                    base_url: str = BASE_URL, seed: Optional[int] = None,
+                    dashboard: Optional[LiveDashboard] = None) -> CapacityResult:
+    """搜索接口在 p99 预算内可持续的最高速率
+
+    先从 start_rate 起倍增速率直到超出预算，最后一步截断为 max_rate；max_rate 仍达标时
+    停止搜索并标记 capped。否则在最后一次达标与首次超标的速率之间二分，直到区间相对宽度
+    小于 precision。每一轮都是一次开环压测。
+    """
+    result = CapacityResult(endpoint.name, p99_budget_ms, max_error_rate)
+
+    def trial(rate: float) -> bool:
+        load = asyncio.run(run_open_loop([endpoint], rate, step_duration, fixtures, base_url, seed=seed,
+                                         dashboard=dashboard))
+        p99_ms = load.overall().response.value_at_percentile(99) / 1000.0
+        error_rate = load.error_count / load.sent if load.sent else 1.0
+        passed = p99_ms <= p99_budget_ms and error_rate <= max_error_rate
+        result.trials.append(CapacityTrial(rate, p99_ms, round(error_rate, 4),
+                                           round(load.throughput, 2), passed))
+        print(f"  {endpoint.name} @ {rate:.1f} req/s: p99={p99_ms:.1f}ms "
+              f"错误率={error_rate * 100:.2f}% {'达标' if passed else '超标'}")
+        if passed:
+            result.capacity = max(result.capacity, rate)
+        time.sleep(cooldown)
+        return passed
+
+    low, high = 0.0, None
+    rate = min(start_rate, max_rate)
+    while True:
+        if not trial(rate):
+            high = rate
+            break
+        low = rate
+        if rate >= max_rate:
+            result.capped = True
+            return result
+        rate = min(rate * 2, max_rate)
+    while low == 0 or (high - low) / low > precision:
+        mid = (low + high) / 2
+        if mid < 1:
+            break
+        if trial(mid):
+            low = mid
+        else:
+            high = mid
+    return result
+
+
+def resolve_endpoints(names: List[str]) -> List[Endpoint]:
+    unknown = [n for n in names if n not in ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"未知接口: {', '.join(unknown)}\n可选: {', '.join(ENDPOINTS)}")
+    return [ENDPOINTS[n] for n in names]
+
+
+def save_result(data: Dict, output: Optional[str], prefix: str) -> str:
+    output = output or f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return output
+
+
+def save_html(sections: List[Tuple[str, LoadResult]], json_path: str, title: str) -> str:
+    """与 JSON 结果同名的自包含 HTML 报告，每个 (标题, 结果) 一节"""
+    report = HtmlReport(title)
+    for heading, result in sections:
+        report.add_html(f"<p>{heading}: 已发送 {result.sent}，已完成 {result.completed}，错误 {result.error_count}，"
+                        f"吞吐 {result.throughput:.1f} req/s，最大在途 {result.max_in_flight}</p>")
+        report.add_latency(result.latencies, heading)
+    return report.write(os.path.splitext(json_path)[0] + '.html')
+
+
+def record_history(args, result: LoadResult, label: str):
+    """把压测结果写入基准历史库，label 描述压测配置，相同配置的运行之间才互相比较"""
+    if args.no_history:
+        return
+    from benchmark_history import record_run
+    if args.cache:
+        label += ' cache=on'
+    if result.coalesced:  # 多进程压测不合并请求，以结果中的统计为准
+        label += ' coalesce=on'
+    record_run('load', result.latencies, elapsed=result.elapsed, dataset_size=args.dataset_size, label=label)
+
+
+def live_dashboard(args):
+    """按 --live 创建实时面板，用作上下文管理器；未启用时进入后得到 None
+
+    auto 时仅在标准输出为终端时启用。
+    """
+    if args.live == 'off' or (args.live == 'auto' and not sys.stdout.isatty()):
+        return contextlib.nullcontext()
+    return LiveDashboard(window=args.live_window)
+
+
+def cmd_load(args):
+    endpoints = resolve_endpoints(args.endpoints)
+    fixtures = Fixtures.load(args.base_url)
+    print(f"开始开环压测: {args.rate:g} req/s, 持续 {args.duration:g} 秒, 接口: {', '.join(args.endpoints)}\n")
+    with live_dashboard(args) as dashboard:
+        result = asyncio.run(run_open_loop(endpoints, args.rate, args.duration, fixtures,
+                                           args.base_url, args.concurrency, args.seed, dashboard=dashboard,
+                                           cache=args.cache, coalesce=args.coalesce))
+    print(result.report())
+    output = save_result(result.to_dict(), args.output, 'load_report')
+    print(f"\n结果已保存到: {output}")
+    print(f"HTML 报告: {save_html([('开环压测', result)], output, f'开环压测 {args.rate:g} req/s')}")
+    record_history(args, result, f"load rate={args.rate:g} endpoints={','.join(args.endpoints)}")
+
+
+def cmd_multiprocess(args):
+    resolve_endpoints(args.endpoints)
+    fixtures = Fixtures.load(args.base_url)
+    print(f"开始多进程压测: {args.workers} 个进程, 持续 {args.duration:g} 秒, "
+          f"接口: {', '.join(args.endpoints)}\n")
+    with live_dashboard(args) as dashboard:
+        result = run_multiprocess(args.endpoints, args.workers, args.duration, fixtures,
+                                  args.base_url, args.rate, args.seed, dashboard=dashboard, cache=args.cache)
+    print(result.report())
+    output = save_result(result.to_dict(), args.output, 'multiprocess_report')
+    print(f"\n结果已保存到: {output}")
+    print(f"HTML 报告: {save_html([('多进程压测', result)], output, f'多进程压测 {args.workers} 个进程')}")
+    if len(RESULT_SINK):
+        print(f"失败请求明细（各进程汇总）: {RESULT_SINK.path}")
+    record_history(args, result, f"multiprocess workers={args.workers} rate={args.rate:g} "
+                                 f"endpoints={','.join(args.endpoints)}")
+
+
+def cmd_capacity(args):
+    endpoints = resolve_endpoints(args.endpoints)
+    fixtures = Fixtures.load(args.base_url)
+    print(f"开始容量搜索: p99 预算 {args.p99_budget:g}ms, 错误率上限 {args.max_error_rate * 100:g}%\n")
+    results = []
+    with live_dashboard(args) as dashboard:
+        for endpoint in endpoints:
+            results.append(search_capacity(endpoint, fixtures, args.p99_budget, args.max_error_rate,
+                                           args.start_rate, args.max_rate, args.step_duration,
+                                           args.precision, args.cooldown, args.base_url, args.seed,
+                                           dashboard))
+    print(f"\n{'=' * 80}\n容量搜索结果\n{'=' * 80}")
+    for result in results:
+        if result.capped:
+            capacity = f"≥ {result.capacity:.1f} req/s（达到 --max-rate 上限，未测出容量）"
+        elif result.capacity:
+            capacity = f"{result.capacity:.1f} req/s"
+        else:
+            capacity = f"低于 {min(args.start_rate, args.max_rate):g} req/s"
+        print(f"{result.endpoint:<40}{capacity:>20}  ({len(result.trials)} 轮)")
+    print('=' * 80)
+    output = save_result({'generated_at': datetime.now().isoformat(),
+                          'results': [r.to_dict() for r in results]}, args.output, 'capacity_report')
+    print(f"\n结果已保存到: {output}")
+
+
+def cmd_mix(args):
+    workload = Workload.load(args.workload)
+    fixtures = Fixtures.load(args.base_url)
+    total = sum(workload.weights)
+    print(f"负载组合: {workload.name} {workload.description}")
+    for request in workload.requests:
+        print(f"  {request.weight / total * 100:5.1f}%  {request.endpoint.name}")
+    with live_dashboard(args) as dashboard:
+        if args.rate:
+            print(f"\n开环执行: {args.rate:g} req/s, 持续 {args.duration:g} 秒\n")
+            result = asyncio.run(run_open_loop(workload.endpoints, args.rate, args.duration, fixtures,
+                                               args.base_url, seed=args.seed, weights=workload.weights,
+                                               dashboard=dashboard, cache=args.cache, coalesce=args.coalesce))
+        else:
+            print(f"\n闭环执行: {args.users} 个虚拟用户, 持续 {args.duration:g} 秒\n")
+            result = asyncio.run(run_closed_loop(workload, args.users, args.duration, fixtures,
+                                                 args.base_url, args.seed, dashboard=dashboard,
+                                                 cache=args.cache, coalesce=args.coalesce))
+    print(result.report())
+    output = save_result(result.to_dict(), args.output, 'mix_report')
+    print(f"\n结果已保存到: {output}")
+    print(f"HTML 报告: {save_html([(workload.name, result)], output, f'负载组合 {workload.name}')}")
+    mode = f"rate={args.rate:g}" if args.rate else f"users={args.users}"
+    record_history(args, result, f"mix {workload.name} {mode}")
+
+
+def cmd_flow(args):
+    fixtures = Fixtures.load(args.base_url)
+    stages = []
+    with live_dashboard(args) as dashboard:
+        simulator = BusinessFlowSimulator(fixtures, args.base_url, tuple(args.think_time), args.seed, dashboard,
+                                          args.cache, args.coalesce)
+        for agents in args.agents:
+            print(f"\n阶段: {args.admins} 个管理端用户 + {agents} 个代理端用户, 持续 {args.duration:g} 秒")
+            result = asyncio.run(simulator.run(args.admins, agents, args.duration))
+            print(result.report())
+            stages.append((agents, result))
+            record_history(args, result, f"flow admins={args.admins} agents={agents}")
+
+    steps = sorted({name for _, result in stages for name in result.latencies})
+    print(f"\n{'=' * 80}\n各阶段步骤 p99（毫秒）\n{'=' * 80}")
+    print(f"{'步骤':<24}" + ''.join(f"{f'{agents}代理':>12}" for agents, _ in stages))
+    for name in steps:
+        print(f"{name:<24}" + ''.join(
+            f"{result.latencies[name].response.value_at_percentile(99) / 1000.0 if name in result.latencies else 0:>12.1f}"
+            for _, result in stages))
+    degraded = first_degraded_step(stages, args.degrade_factor)
+    if degraded:
+        print(f"\n最先退化的步骤: {degraded[0]}（代理端用户数 {degraded[1]} 时 p99 超过基线 {args.degrade_factor:g} 倍）")
+    else:
+        print(f"\n各步骤 p99 均未超过基线 {args.degrade_factor:g} 倍")
+    output = save_result({'stages': [{'admins': args.admins, 'agents': agents, **result.to_dict()}
+                                     for agents, result in stages],
+                          'first_degraded_step': degraded}, args.output, 'flow_report')
+    print(f"\n结果已保存到: {output}")
+    sections = [(f"{args.admins} 个管理端用户 + {agents} 个代理端用户", result) for agents, result in stages]
+    print(f"HTML 报告: {save_html(sections, output, '业务流程模拟')}")
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必须是正整数: {value}")
+    return number
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Nomur API 压力测试')
+    parser.add_argument('--base-url', default=BASE_URL, help='API 地址')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--output', default=None, help='JSON 结果文件路径')
+    parser.add_argument('--restore-snapshot', default=None, metavar='NAME',
+                        help='开始前还原 db_snapshot.py 创建的数据库快照，保证每轮从相同数据开始')
+    parser.add_argument('--no-history', action='store_true', help='不把结果写入基准历史库')
+    parser.add_argument('--live', choices=['auto', 'on', 'off'], default='auto',
+                        help='每秒刷新的实时面板（RPS、在途、滚动 p50/p99、错误、客户端 CPU），auto 时仅在终端中启用')
+    parser.add_argument('--live-window', type=int, default=10, help='实时面板滚动百分位的窗口（秒）')
+    parser.add_argument('--cache', action='store_true',
+                        help='客户端缓存商品、车型、促销、商品分组、收款账户等基础数据接口（容量搜索不使用）')
+    parser.add_argument('--coalesce', action='store_true',
+                        help='合并同时在途的相同 GET，一次请求满足所有等待者；不加时测量服务端最坏情况'
+                             '（多进程压测各进程单线程，不受影响）')
+    parser.add_argument('--dataset-size', type=int, default=None,
+                        help='记录到基准历史的数据规模（订单行数），默认在压测开始前从数据库读取')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load = subparsers.add_parser('load', help='开环恒定到达率压测')
+    load.add_argument('--rate', type=float, default=200, help='目标速率 (req/s)')
+    load.add_argument('--duration', type=float, default=30, help='持续时间（秒）')
+    load.add_argument('--concurrency', type=int, default=1000, help='最大在途请求数')
+    load.add_argument('--endpoints', nargs='+', default=['POST /orders', 'GET /orders'],
+                      help='压测接口，按顺序轮流发送')
+    load.set_defaults(func=cmd_load)
+
+    multi = subparsers.add_parser('multiprocess', help='多进程闭环压测，合并各进程直方图')
+    multi.add_argument('--workers', type=positive_int, default=multiprocessing.cpu_count(), help='工作进程数')
+    multi.add_argument('--rate', type=float, default=0, help='合计目标速率 (req/s)，0 为不限速')
+    multi.add_argument('--duration', type=float, default=30, help='持续时间（秒）')
+    multi.add_argument('--endpoints', nargs='+', default=['GET /orders', 'GET /agents', 'GET /statistics'],
+                       help='压测接口，每个进程按顺序轮流发送')
+    multi.set_defaults(func=cmd_multiprocess)
+
+    capacity = subparsers.add_parser('capacity', help='搜索各接口在 p99 预算内的最大可持续速率')
+    capacity.add_argument('--endpoints', nargs='+',
+                          default=['GET /statistics', 'GET /agents/:id/statistics',
+                                   'POST /transactions/transfer'],
+                          help='逐个搜索的接口')
+    capacity.add_argument('--p99-budget', type=float, default=200, help='p99 延迟预算（毫秒）')
+    capacity.add_argument('--max-error-rate', type=float, default=0.01, help='错误率上限（0-1）')
+    capacity.add_argument('--start-rate', type=float, default=10, help='起始速率 (req/s)')
+    capacity.add_argument('--max-rate', type=float, default=5000, help='速率上限 (req/s)')
+    capacity.add_argument('--step-duration', type=float, default=10, help='每轮压测时长（秒）')
+    capacity.add_argument('--precision', type=float, default=0.05, help='二分搜索的相对精度')
+    capacity.add_argument('--cooldown', type=float, default=2, help='两轮之间的冷却时间（秒）')
+    capacity.set_defaults(func=cmd_capacity)
+
+    mix = subparsers.add_parser('mix', help='按负载文件中的加权请求组合压测')
+    mix.add_argument('--workload', default=os.path.join(WORKLOAD_DIR, 'admin_agent_mix.json'),
+                     help='负载文件（JSON/YAML）')
+    mix.add_argument('--users', type=int, default=50, help='闭环虚拟用户数')
+    mix.add_argument('--rate', type=float, default=0, help='指定后改为开环执行 (req/s)，忽略思考时间')
+    mix.add_argument('--duration', type=float, default=60, help='持续时间（秒）')
+    mix.set_defaults(func=cmd_mix)
+
+    flow = subparsers.add_parser('flow', help='业务流程虚拟用户模拟，逐阶段增加代理端用户数')
+    flow.add_argument('--admins', type=int, default=10, help='管理端用户数')
+    flow.add_argument('--agents', type=int, nargs='+', default=[50, 100, 200, 400],
+                      help='各阶段的代理端用户数')
+    flow.add_argument('--duration', type=float, default=60, help='每个阶段的持续时间（秒）')
+    flow.add_argument('--think-time', type=float, nargs=2, default=[0.5, 2.0], metavar=('MIN', 'MAX'),
+                      help='步骤之间的思考时间（秒）')
+    flow.add_argument('--degrade-factor', type=float, default=2.0,
+                      help='p99 超过首个阶段多少倍视为退化')
+    flow.set_defaults(func=cmd_flow)
+    return parser
+
+
+def main():
+    """主函数"""
+    args = build_parser().parse_args()
+    if args.restore_snapshot:
+        from db_snapshot import restore_snapshot
+        start = time.perf_counter()
+        swap = restore_snapshot(args.restore_snapshot)
+        print(f"已还原快照 {args.restore_snapshot}，共耗时 {time.perf_counter() - start:.2f} 秒"
+              f"（其中换表 {swap:.2f} 秒）")
+    if not args.no_history and args.dataset_size is None and args.command != 'capacity':
+        from benchmark_history import dataset_size
+        args.dataset_size = dataset_size()
+    args.func(args)
+    if args.restore_snapshot:
+        # 压测结束后再重建暂存副本，下一轮还原只需换表
+        from db_snapshot import prepare_snapshot
+        start = time.perf_counter()
+        prepare_snapshot(args.restore_snapshot)
+        print(f"已为下一轮准备暂存副本，耗时 {time.perf_counter() - start:.1f} 秒")
+
+
+if __name__ == '__main__':
+    main()
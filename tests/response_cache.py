@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+客户端响应缓存
+场景中反复请求的基础数据（商品、车型、促销、商品分组、收款账户）在一次运行中很少变化，
+APIClient / AsyncAPIClient 传入 cache=ResponseCache() 后，这些 GET 在 TTL 内直接使用缓存，
+过期后带 If-None-Match 向服务端确认（304 时沿用缓存），压测流量集中在真正要施压的接口上。
+
+缓存的是响应体字节，命中时重新解码，调用方修改返回的字典不会影响缓存。
+同一客户端对某个资源 POST/PUT/DELETE 后，该资源下的全部缓存立即失效。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+# 路径前缀 -> TTL（秒）；TTL 为 0 时每次都向服务端确认，只省去未变化时的响应体
+DEFAULT_TTLS: Dict[str, float] = {
+    '/products': 30,
+    '/truck-types': 60,
+    '/promotions': 30,
+    '/product-groups': 60,
+    '/payment-accounts': 60,
+}
+
+
+@dataclass
+class CacheEntry:
+    path: str
+    body: bytes
+    etag: Optional[str]
+    expires: float  # time.monotonic()
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires
+
+
+def _path(endpoint: str) -> str:
+    return endpoint.split('?')[0].rstrip('/') or '/'
+
+
+def _resource(endpoint: str) -> str:
+    """资源根路径，如 /products/<id>/stock -> /products"""
+    return '/' + _path(endpoint).lstrip('/').split('/')[0]
+
+
+class ResponseCache:
+    """GET 响应的 TTL/ETag 缓存，按 LRU 淘汰，多线程安全
+
+    ttls 为路径前缀到 TTL 的映射，只缓存匹配的接口（前缀本身及其子路径，取最长匹配）；
+    max_entries 为最多缓存的响应数。统计：hits 为 TTL 内直接命中，misses 为需要请求服务端的次数，
+    其中 revalidated 次服务端返回 304 沿用了缓存；evictions 为 LRU 淘汰数，invalidations 为因写操作失效的条目数。
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 256):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[Tuple[str, str], CacheEntry]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def ttl(self, endpoint: str) -> Optional[float]:
+        """接口的 TTL，不在缓存范围内时为 None"""
+        path = _path(endpoint)
+        matches = [prefix for prefix in self.ttls if path == prefix or path.startswith(prefix.rstrip('/') + '/')]
+        return self.ttls[max(matches, key=len)] if matches else None
+
+    def key(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Tuple[str, str]]:
+        """缓存键 (路径, 排序后的查询参数)，不在缓存范围内时为 None"""
+        if self.ttl(endpoint) is None:
+            return None
+        query = endpoint.split('?', 1)[1] if '?' in endpoint else ''
+        if params:
+            query = '&'.join(filter(None, [query, urlencode(sorted(params.items()), doseq=True)]))
+        return _path(endpoint), query
+
+    def get(self, key: Tuple[str, str]) -> Optional[CacheEntry]:
+        """取出缓存项（可能已过期，过期时用其 etag 向服务端确认），按是否新鲜计入命中或未命中"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            if entry is not None and entry.fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def put(self, key: Tuple[str, str], body: bytes, etag: Optional[str] = None, revalidated: bool = False):
+        """保存响应体并重新计算过期时间；revalidated 表示服务端返回 304、沿用了原来的响应体"""
+        entry = CacheEntry(key[0], body, etag, time.monotonic() + self.ttl(key[0]))
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            if revalidated:
+                self.revalidated += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, endpoint: str):
+        """写操作后调用：删除该资源下的全部缓存"""
+        resource = _resource(endpoint)
+        with self._lock:
+            stale = [key for key, entry in self.entries.items()
+                     if entry.path == resource or entry.path.startswith(resource + '/')]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'revalidated': self.revalidated,
+                    'evictions': self.evictions, 'invalidations': self.invalidations,
+                    'entries': len(self.entries)}
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+测试结果流式落盘
+每条结果追加写成一行 JSON（JSONL），内存中只保留有界的汇总（各状态计数、耗时、
+按测试名计数和最近的若干问题），百万级请求的长时间运行也只占用常量内存。
+
+ReporterBackend 让多个线程、多个进程并行记录到同一个结果集：每个线程写自己的缓冲区，
+满一批、距上次合并超过一定时间或结束时合并；子进程的缓冲区经队列发回父进程，由监听线程合并。
+"""
+
+import atexit
+import json
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+def _to_record(result) -> Dict[str, Any]:
+    """把 TestResult 数据类转换为可序列化的字典（枚举取值）"""
+    record = {key: value.value if isinstance(value, Enum) else value
+              for key, value in vars(result).items()}
+    record['timestamp'] = datetime.now().isoformat(timespec='milliseconds')
+    return record
+
+
+class ResultSink:
+    """追加写入的 JSONL 结果流
+
+    文件在第一次写入时才创建；写入缓冲在距上次刷盘超过 flush_interval 秒或积累
+    flush_every 条后刷盘，进程退出时自动刷盘关闭。summary 中按测试名计数最多保留
+    max_names 个名称（其余计入"(其他)"），issues 只保留最近 max_issues 条。
+    """
+
+    def __init__(self, prefix: str = 'test_results', path: Optional[str] = None,
+                 flush_interval: float = 1.0, flush_every: int = 1000,
+                 max_issues: int = 200, max_names: int = 1000):
+        self.path = path or f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.max_names = max_names
+        self.counts: Counter = Counter()
+        self.names: Counter = Counter()
+        self.issues = deque(maxlen=max_issues)
+        self.total = 0
+        self.issue_count = 0
+        self.duration_total = 0.0
+        self.duration_max = 0.0
+        self._file = None
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, result, is_issue: bool = False):
+        """追加一条结果，is_issue 为 True 时同时计入问题列表"""
+        record = _to_record(result)
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+                atexit.register(self.close)
+            self._file.write(line)
+            self._pending += 1
+
+            self.total += 1
+            self.counts[record.get('status')] += 1
+            duration = record.get('duration') or 0
+            self.duration_total += duration
+            self.duration_max = max(self.duration_max, duration)
+            name = record.get('test_name')
+            if name in self.names or len(self.names) < self.max_names:
+                self.names[name] += 1
+            else:
+                self.names['(其他)'] += 1
+            if is_issue:
+                self.issue_count += 1
+                self.issues.append(result)
+
+            if (self._pending >= self.flush_every
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._file is not None:
+            self._file.flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._pending = 0
+
+    def __len__(self) -> int:
+        return self.total
+
+    def count(self, status) -> int:
+        return self.counts[status.value if isinstance(status, Enum) else status]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'total': self.total,
+            'counts': dict(self.counts),
+            'issues': self.issue_count,
+            'duration_total': round(self.duration_total, 3),
+            'duration_max': round(self.duration_max, 3),
+            'top_tests': self.names.most_common(20),
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """逐行读回已写入的结果"""
+        self.flush()
+        return read_results(self.path)
+
+
+def read_results(path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取 JSONL 结果文件，文件不存在时不产出任何结果"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except FileNotFoundError:
+        return
+
+
+class _WorkerBuffer:
+    """单个线程的结果和统计缓冲，只由所属线程写入"""
+
+    def __init__(self):
+        self.results: List[Tuple[Any, bool]] = []
+        self.stats: Dict[str, Any] = {}
+        self.last_flush = time.monotonic()
+
+
+class ReporterBackend:
+    """测试结果记录后端，支持多线程和多进程并行记录
+
+    - 线程：add / stat 只写当前线程的缓冲区，不加锁；缓冲满 flush_every 条或距上次合并超过
+      flush_interval 秒时，由该线程在下一次 add 时自己合并到 sink 和 stats，结果文件不会因
+      记录得慢而长时间停在旧的位置。其他线程的缓冲区在 collect() 时合并，
+      应在所有工作线程结束后调用（生成报告前会自动调用）
+    - 进程：子进程调用 use_queue(queue) 后，缓冲区改为发送到队列；父进程用 listen(queue)
+      启动监听线程合并，子进程结束前需调用 flush()，全部结束后调用监听线程的 stop()
+
+    stats 为按键汇总的统计（如接口延迟），元素需支持 merge(other) 且可被 pickle。
+    """
+
+    def __init__(self, sink: 'ResultSink', stats: Optional[Dict[str, Any]] = None,
+                 stats_factory: Optional[Callable[[], Any]] = None, flush_every: int = 1000,
+                 flush_interval: float = 1.0):
+        self.sink = sink
+        self.stats = stats if stats is not None else {}
+        self.stats_factory = stats_factory
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.queue = None
+        self._local = threading.local()
+        self._buffers: List[_WorkerBuffer] = []
+        self._lock = threading.Lock()
+
+    def _buffer(self) -> _WorkerBuffer:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = _WorkerBuffer()
+            with self._lock:
+                self._buffers.append(buffer)
+        return buffer
+
+    def add(self, result, is_issue: bool = False):
+        buffer = self._buffer()
+        buffer.results.append((result, is_issue))
+        if (len(buffer.results) >= self.flush_every
+                or time.monotonic() - buffer.last_flush >= self.flush_interval):
+            self._drain(buffer)
+
+    def stat(self, key: str):
+        """当前线程中 key 对应的统计对象，不存在时用 stats_factory 创建"""
+        stats = self._buffer().stats
+        value = stats.get(key)
+        if value is None:
+            value = stats[key] = self.stats_factory()
+        return value
+
+    def _drain(self, buffer: _WorkerBuffer):
+        results, buffer.results = buffer.results, []
+        stats, buffer.stats = buffer.stats, {}
+        buffer.last_flush = time.monotonic()
+        if not results and not stats:
+            return
+        if self.queue is not None:
+            self.queue.put((results, stats))
+        else:
+            self.merge(results, stats)
+
+    def flush(self):
+        """合并当前线程的缓冲区"""
+        self._drain(self._buffer())
+
+    def collect(self):
+        """合并所有线程的缓冲区"""
+        with self._lock:
+            buffers = list(self._buffers)
+        for buffer in buffers:
+            self._drain(buffer)
+
+    def merge(self, results: List[Tuple[Any, bool]], stats: Dict[str, Any]):
+        with self._lock:
+            for result, is_issue in results:
+                self.sink.write(result, is_issue)
+            for key, value in stats.items():
+                if key not in self.stats:
+                    self.stats[key] = self.stats_factory()
+                self.stats[key].merge(value)
+
+    def use_queue(self, queue):
+        """在子进程中调用：之后的结果经队列发回父进程，丢弃从父进程继承来的缓冲区"""
+        self.queue = queue
+        self._local = threading.local()
+        self._buffers = []
+        self._lock = threading.Lock()
+
+    def listen(self, queue) -> 'ReportListener':
+        """在父进程中启动监听线程，合并子进程经队列发来的结果"""
+        listener = ReportListener(self, queue)
+        listener.start()
+        return listener
+
+
+class ReportListener(threading.Thread):
+    """父进程中的监听线程，收到 None 时退出"""
+
+    def __init__(self, backend: ReporterBackend, queue):
+        super().__init__(daemon=True)
+        self.backend = backend
+        self.queue = queue
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            self.backend.merge(*item)
+
+    def stop(self):
+        """等队列中已发送的结果全部合并后退出"""
+        self.queue.put(None)
+        self.join()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Nomur API 数据规模基准测试
+逐级把订单/交易流水灌到 1k、10k、100k、1M 行，测量列表接口的延迟、响应大小和
+服务端 RSS 随行数的变化，找出超线性增长的接口
+"""
+
+import argparse
+import asyncio
+import csv
+import math
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from test_api import BASE_URL, APIClient, AsyncAPIClient
+from load_test import ENDPOINTS, Fixtures
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+except ImportError:  # 仅生成图表时需要
+    plt = None
+
+
+SCALES = [1_000, 10_000, 100_000, 1_000_000]
+LIST_ENDPOINTS = ['/orders', '/transactions', '/agents']
+# 含 YEAR(created_at) 过滤和按代理过滤的统计接口；:hot/:cold 为订单最多/最少的代理
+STATISTICS_ENDPOINTS = ['/statistics', '/agents/:hot/statistics', '/agents/:cold/statistics']
+
+
+@dataclass
+class ScalePoint:
+    """某一数据规模下单个接口的测量结果"""
+    endpoint: str
+    rows: int
+    latency_ms: float
+    response_bytes: int
+    server_rss_mb: Optional[float]
+    samples: List[float] = field(default_factory=list)
+
+
+def find_server_pid() -> Optional[int]:
+    """在本机进程中查找 node index.js（Express 服务）"""
+    for pid in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                cmdline = f.read().split(b'\0')
+        except OSError:
+            continue
+        if cmdline and cmdline[0].endswith(b'node') and any(arg.endswith(b'index.js') for arg in cmdline):
+            return int(pid)
+    return None
+
+
+def read_rss_mb(pid: Optional[int]) -> Optional[float]:
+    """读取进程 RSS（MB），无法读取时返回 None"""
+    if pid is None:
+        return None
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        return None
+    return None
+
+
+async def seed_orders_via_api(count: int, fixtures: Fixtures, base_url: str = BASE_URL,
+                              concurrency: int = 50, seed: Optional[int] = None) -> int:
+    """通过 POST /orders 并发创建订单，每个订单同时产生一条扣款流水，返回实际创建的订单数
+
+    单个请求失败（异常或 code 非 0）不会中断灌数，每批结束时报告该批的失败数。
+    """
+    rng = random.Random(seed)
+    endpoint = ENDPOINTS['POST /orders']
+    done = failed = 0
+    async with AsyncAPIClient(base_url, concurrency=concurrency) as client:
+        async def create():
+            """成功时返回 True，否则返回服务端的错误信息"""
+            nonlocal done
+            path, data, _ = endpoint.build(fixtures, rng)
+            response = await client.post(path, data)
+            if response.get('code') != 0:
+                return response.get('message') or f"code={response.get('code')}"
+            done += 1
+            if done % 1000 == 0:
+                print(f"\r  已创建 {done}/{count} 个订单", end='', flush=True)
+            return True
+
+        # 分批提交，避免一次性创建上百万个协程
+        batch = concurrency * 20
+        for offset in range(0, count, batch):
+            results = await asyncio.gather(*[create() for _ in range(min(batch, count - offset))],
+                                           return_exceptions=True)
+            errors = [r for r in results if r is not True]
+            if errors:
+                failed += len(errors)
+                print(f"\n  警告: 第 {offset // batch + 1} 批有 {len(errors)} 个订单创建失败，如: {errors[0]}")
+    print(f"\r  已创建 {done}/{count} 个订单" + (f"，失败 {failed} 个" if failed else ''))
+    return done
+
+
+def seed_orders_via_sql(count: int, fixtures: Fixtures, db_config: Dict = None,
+                        seed: Optional[int] = None, profile: str = 'uniform', generator=None):
+    """直连 MySQL 批量写入订单和扣款流水，并同步扣减代理余额
+
+    profile 为 seed_data 的数据画像，realistic 时 fixtures.agent_ids 中靠前的代理订单最多。
+    多次调用（如逐级扩大规模）时应传入同一个 generator（DatasetGenerator）：同一种子新建的
+    生成器会重放相同的随机序列，生成与上次相同的订单主键。
+    """
+    from seed_data import PROFILES, BulkSeeder, DatasetGenerator
+
+    seeder = BulkSeeder(db_config)
+    agents = [{'id': agent_id, 'balance': 0.0} for agent_id in fixtures.agent_ids]
+    products = [{'id': p['id'], 'name': p.get('name', ''), 'price': float(p.get('price') or 0),
+                 'weight': float(p.get('weight') or 0)} for p in fixtures.products]
+    seeder.connect()
+    try:
+        generator = generator or DatasetGenerator(seed, profile=PROFILES[profile])
+        seeder.seed_orders(count, agents, products, [], generator, generator.profile.days)
+        seeder.update_agent_balances(agents)
+    finally:
+        seeder.close()
+    print(f"  已写入 {count} 个订单")
+
+
+class ScalingBenchmark:
+    """数据规模基准测试"""
+
+    def __init__(self, base_url: str = BASE_URL, repeat: int = 5, timeout: float = 300,
+                 server_pid: Optional[int] = None, seed_method: str = 'api', profile: str = 'uniform'):
+        self.base_url = base_url
+        self.seed_method = seed_method
+        self.profile = profile
+        self.repeat = repeat
+        self.timeout = timeout
+        self.client = APIClient(base_url, record_latency=False)
+        self.server_pid = server_pid or find_server_pid()
+        self.points: List[ScalePoint] = []
+        self.endpoints = list(LIST_ENDPOINTS)
+
+    def count_orders(self) -> int:
+        # 逐条计数，大数据集下不需要把整个订单列表解码到内存中
+        return sum(1 for _ in self.client.iter_items('/orders'))
+
+    def measure(self, endpoint: str, rows: int, path: Optional[str] = None) -> ScalePoint:
+        """顺序请求 repeat 次，取延迟中位数、最大响应大小和请求后的最大 RSS"""
+        samples, sizes, rss = [], [], []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            response = self.client.session.get(f"{self.base_url}{path or endpoint}", timeout=self.timeout)
+            response.raise_for_status()
+            body = response.content
+            samples.append((time.perf_counter() - start) * 1000.0)
+            sizes.append(len(body))
+            rss.append(read_rss_mb(self.server_pid))
+        samples.sort()
+        rss = [r for r in rss if r is not None]
+        return ScalePoint(endpoint, rows, samples[len(samples) // 2], max(sizes),
+                          max(rss) if rss else None, samples)
+
+    def run(self, scales: List[int], fixtures: Fixtures, seed_concurrency: int = 50,
+            seed: Optional[int] = None, statistics: bool = False) -> List[ScalePoint]:
+        """statistics 为 True 时另测统计接口，热门/冷门代理分别取 agent_ids 的首尾"""
+        paths = {endpoint: endpoint for endpoint in LIST_ENDPOINTS}
+        if statistics and fixtures.agent_ids:
+            paths.update(zip(STATISTICS_ENDPOINTS, [
+                '/statistics',
+                f"/agents/{fixtures.agent_ids[0]}/statistics",
+                f"/agents/{fixtures.agent_ids[-1]}/statistics",
+            ]))
+        self.endpoints = list(paths)
+        generator = None
+        if self.seed_method == 'sql':
+            from seed_data import PROFILES, DatasetGenerator
+
+            # 各规模共用一个生成器，随机序列接着上一级继续，不会重复生成已写入的主键
+            generator = DatasetGenerator(seed, profile=PROFILES[self.profile])
+        for scale in scales:
+            current = self.count_orders()
+            print(f"\n数据规模 {scale} 行（当前订单 {current} 行）")
+            if current < scale and self.seed_method == 'sql':
+                seed_orders_via_sql(scale - current, fixtures, seed=seed, profile=self.profile,
+                                    generator=generator)
+            elif current < scale:
+                asyncio.run(seed_orders_via_api(scale - current, fixtures, self.base_url,
+                                                seed_concurrency, seed))
+            if current < scale:
+                rows = self.count_orders()  # 以实际行数为准，灌数可能有失败
+                if rows < scale:
+                    print(f"  警告: 实际订单 {rows} 行，少于目标规模 {scale} 行")
+            else:
+                rows = current
+            for endpoint, path in paths.items():
+                point = self.measure(endpoint, rows, path)
+                self.points.append(point)
+                rss = f"{point.server_rss_mb:.0f}MB" if point.server_rss_mb is not None else '-'
+                print(f"  GET {endpoint:<26} {point.latency_ms:>10.1f}ms {point.response_bytes / 1024:>12.0f}KB  RSS {rss}")
+        return self.points
+
+    def growth(self) -> Dict[str, List[float]]:
+        """相邻规模之间延迟的对数斜率，约等于 1 为线性，明显大于 1 为超线性"""
+        result = {}
+        for endpoint in self.endpoints:
+            points = [p for p in self.points if p.endpoint == endpoint]
+            result[endpoint] = [
+                round(math.log(b.latency_ms / a.latency_ms) / math.log(b.rows / a.rows), 2)
+                for a, b in zip(points, points[1:])
+                if a.latency_ms > 0 and b.rows > a.rows
+            ]
+        return result
+
+    def save_csv(self, path: str):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['endpoint', 'rows', 'latency_ms', 'response_bytes', 'server_rss_mb'])
+            for p in self.points:
+                writer.writerow([p.endpoint, p.rows, round(p.latency_ms, 2), p.response_bytes,
+                                 '' if p.server_rss_mb is None else round(p.server_rss_mb, 1)])
+
+    def plot(self, path: str) -> bool:
+        """绘制延迟/响应大小/RSS 随行数变化的双对数曲线，未安装 matplotlib 时跳过"""
+        if plt is None:
+            return False
+        fig, axes = plt.subplots(1, 3, figsize=(18, 5))
+        metrics = [('latency_ms', 'Latency (ms)'), ('response_bytes', 'Response size (bytes)'),
+                   ('server_rss_mb', 'Server RSS (MB)')]
+        for ax, (attr, label) in zip(axes, metrics):
+            for endpoint in self.endpoints:
+                points = [p for p in self.points if p.endpoint == endpoint and getattr(p, attr) is not None]
+                if points:
+                    ax.plot([p.rows for p in points], [getattr(p, attr) for p in points],
+                            marker='o', label=f'GET {endpoint}')
+            ax.set_xscale('log')
+            ax.set_yscale('log')
+            ax.set_xlabel('Rows')
+            ax.set_ylabel(label)
+            ax.grid(True, which='both', alpha=0.3)
+            ax.legend()
+        fig.tight_layout()
+        fig.savefig(path)
+        plt.close(fig)
+        return True
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='Nomur API 数据规模基准测试')
+    parser.add_argument('--base-url', default=BASE_URL, help='API 地址')
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES, help='订单/流水的目标行数')
+    parser.add_argument('--repeat', type=int, default=5, help='每个规模下每个接口的请求次数')
+    parser.add_argument('--timeout', type=float, default=300, help='单次请求超时（秒）')
+    parser.add_argument('--server-pid', type=int, default=None, help='服务进程 PID，默认自动查找 node index.js')
+    parser.add_argument('--seed-method', choices=['api', 'sql'], default='api',
+                        help='灌数据方式：api 通过 POST /orders，sql 直连 MySQL 批量写入（见 seed_data.py）')
+    parser.add_argument('--seed-concurrency', type=int, default=50, help='api 方式灌数据的并发数')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--profile', choices=['uniform', 'realistic'], default='uniform',
+                        help='sql 方式灌数据的数据画像，realistic 为代理 Zipf 偏斜、多年春节季节性')
+    parser.add_argument('--statistics', action='store_true',
+                        help='同时测量 /statistics 和热门/冷门代理的 /agents/:id/statistics')
+    parser.add_argument('--output', default=None, help='输出文件前缀')
+    args = parser.parse_args()
+
+    benchmark = ScalingBenchmark(args.base_url, args.repeat, args.timeout, args.server_pid,
+                                 args.seed_method, args.profile)
+    if benchmark.server_pid is None:
+        print("警告: 未找到本机服务进程，将不记录 RSS（可用 --server-pid 指定）")
+    benchmark.run(sorted(args.scales), Fixtures.load(args.base_url), args.seed_concurrency, args.seed,
+                  args.statistics)
+
+    print(f"\n{'=' * 80}\n延迟增长斜率（log 延迟 / log 行数，>1 为超线性）\n{'=' * 80}")
+    for endpoint, slopes in benchmark.growth().items():
+        flag = '  ⚠ 超线性' if any(s > 1.1 for s in slopes) else ''
+        print(f"GET {endpoint:<26} {' -> '.join(f'{s:.2f}' for s in slopes) or '-'}{flag}")
+
+    prefix = args.output or f"scaling_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    benchmark.save_csv(f"{prefix}.csv")
+    print(f"\n结果已保存到: {prefix}.csv")
+    if benchmark.plot(f"{prefix}.png"):
+        print(f"图表已保存到: {prefix}.png")
+    else:
+        print("未安装 matplotlib，跳过图表生成（pip install matplotlib）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Nomur 批量灌数据脚本
+绕过 HTTP 接口，直接向 nomur MySQL 库批量写入商品、代理商、组合、促销、收款账户、
+订单（含 items/gift_items JSON）及对应的交易流水，用于构建千万行级别的基准数据集
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import pymysql
+
+from data_generator import (HOUR_WEIGHTS, PROFILES, QUANTITIES, DatasetProfile, SeasonalCalendar,
+                            SeededDataGenerator, ZipfSampler, spring_festival)
+
+try:
+    import numpy as np
+except ImportError:  # 仅向量化生成订单时需要
+    np = None
+
+
+# 与 server/index.js 中的连接池配置一致
+DB_CONFIG = {
+    'host': 'localhost',
+    'port': 3306,
+    'user': 'root',
+    'password': '',
+    'database': 'nomur',
+}
+
+# 名称前缀与 scripts/delete_test_data.sql 的清理规则一致
+NAME_PREFIX = '测试'
+
+PRODUCT_COLUMNS = ['id', 'name', 'image', 'price', 'weight', 'materials']
+PRODUCT_GROUP_COLUMNS = ['id', 'name', 'description', 'product_ids']
+AGENT_COLUMNS = ['id', 'name', 'phone1', 'phone2', 'address', 'yearly_targets', 'balance', 'sort_order']
+PAYMENT_ACCOUNT_COLUMNS = ['id', 'name', 'account_no', 'bank_name', 'qr_code', 'balance']
+PROMOTION_COLUMNS = ['id', 'name', 'description', 'threshold', 'condition_products',
+                     'condition_group_id', 'gifts', 'is_active', 'start_date', 'end_date']
+ORDER_COLUMNS = ['id', 'agent_id', 'items', 'total_weight', 'total_amount', 'driver_phone',
+                 'promotion_id', 'gift_items', 'images', 'status', 'remark', 'created_at', 'shipped_at']
+TRANSACTION_COLUMNS = ['id', 'agent_id', 'type', 'reason', 'amount', 'related_order_id',
+                       'related_agent_id', 'product_id', 'quantity', 'remark', 'created_at',
+                       'payment_account_id']
+
+
+@dataclass
+class SeedPlan:
+    """各表要生成的行数"""
+    products: int = 50
+    product_groups: int = 10
+    agents: int = 1000
+    payment_accounts: int = 5
+    promotions: int = 20
+    orders: int = 100_000
+    recharges_per_agent: int = 12
+    days: int = 365
+
+
+class DatasetGenerator:
+    """生成与 nomur 表结构对应的行（元组），按列顺序排列
+
+    商品、代理、促销和订单商品项取自 SeededDataGenerator 的数据流，名称和手机号唯一；
+    种子、截止时间和数据画像相同时生成完全相同的数据集。
+    """
+
+    def __init__(self, seed: Optional[int] = None, name_prefix: str = NAME_PREFIX,
+                 now: Optional[datetime] = None, profile: DatasetProfile = PROFILES['uniform']):
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.data = SeededDataGenerator(self.seed, name_prefix)
+        self.rng = random.Random(f"{self.seed}:rows")
+        self.name_prefix = name_prefix
+        self.now = (now or datetime.now()).replace(microsecond=0)
+        self.profile = profile
+        self._order_items = None
+        self._agent_sampler: Optional[ZipfSampler] = None
+        self._calendar: Optional[SeasonalCalendar] = None
+        self._np_rng = None
+
+    def new_id(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def phone(self) -> str:
+        return self.data.unique_phone()
+
+    def timestamp(self, days: int) -> datetime:
+        return self.now - timedelta(seconds=self.rng.randint(0, days * 86400))
+
+    def order_time(self, days: int) -> datetime:
+        """订单时间：按画像的季节权重抽取，非季节画像时均匀分布"""
+        if not self.profile.seasonal:
+            return self.timestamp(days)
+        if self._calendar is None or len(self._calendar.days) != days:
+            self._calendar = SeasonalCalendar(self.now, days, self.profile.yearly_growth)
+        return self._calendar.sample(self.rng)
+
+    def pick_agent(self, agents: List[Dict]) -> Dict:
+        """按画像的活跃度分布挑选下单代理，agents 中靠前的代理更活跃"""
+        if self.profile.agent_skew <= 0:
+            return self.rng.choice(agents)
+        if self._agent_sampler is None or self._agent_sampler.items is not agents:
+            self._agent_sampler = ZipfSampler(agents, self.profile.agent_skew)
+        return self._agent_sampler.sample(self.rng)
+
+    def pick_products(self, products: List[Dict], count: int) -> List[Dict]:
+        """不重复地挑选若干商品，商品有热度偏斜时偏向热门商品"""
+        count = min(len(products), count)
+        if self.profile.product_skew <= 0:
+            return self.rng.sample(products, count)
+        sampler = ZipfSampler(products, self.profile.product_skew)
+        chosen = {}
+        while len(chosen) < count:
+            product = sampler.sample(self.rng)
+            chosen[product['id']] = product
+        return list(chosen.values())
+
+    def products(self, count: int) -> List[Dict]:
+        return list(self.data.products(count))
+
+    def product_rows(self, products: List[Dict]) -> Iterable[tuple]:
+        for p in products:
+            yield (p['id'], p['name'], None, p['price'], p['weight'], '[]')
+
+    def product_groups(self, count: int, products: List[Dict]) -> List[Dict]:
+        return [{'id': self.new_id(), 'name': f"{self.name_prefix}组合{i + 1:03d}",
+                 'product_ids': [p['id'] for p in self.pick_products(products, self.rng.randint(2, 5))]}
+                for i in range(count)]
+
+    def product_group_rows(self, groups: List[Dict]) -> Iterable[tuple]:
+        for g in groups:
+            yield (g['id'], g['name'], '批量生成的商品组合', json.dumps(g['product_ids']))
+
+    def agents(self, count: int, products: List[Dict]) -> List[Dict]:
+        agents = []
+        for i, agent in enumerate(self.data.agents(count)):
+            agent.update(yearly_targets={self.rng.choice(products)['id']: self.rng.choice([300, 500, 800, 1000])},
+                         balance=0.0, sort_order=i)
+            agents.append(agent)
+        return agents
+
+    def agent_rows(self, agents: List[Dict]) -> Iterable[tuple]:
+        for a in agents:
+            yield (a['id'], a['name'], a['phone1'], a['phone2'], a['address'],
+                   json.dumps(a['yearly_targets']), round(a['balance'], 2), a['sort_order'])
+
+    def payment_account_rows(self, count: int) -> List[tuple]:
+        return [(self.new_id(), f"{self.name_prefix}收款账户{i + 1:02d}",
+                 f"6222{self.rng.randint(10 ** 14, 10 ** 15 - 1)}", '测试银行', None, 0.0)
+                for i in range(count)]
+
+    def promotions(self, count: int, products: List[Dict], groups: Sequence[Dict] = (),
+                   days: int = 365) -> List[Dict]:
+        """促销活动
+
+        季节画像下约一半促销围绕春节档期（节前 30 天至节后 15 天），其余为随机的 2~6 周档期，
+        已结束的档期置为停用；部分促销以商品组合或指定商品为满赠条件。
+        非季节画像下所有促销覆盖整个数据时间范围。
+        """
+        first_day = (self.now - timedelta(days=days)).date()
+        promotions = []
+        for p in self.data.promotions(products, count):
+            if not self.profile.seasonal:
+                start, end = first_day, self.now.date().replace(month=12, day=31)
+            elif self.rng.random() < 0.5:
+                festival = spring_festival(self.rng.randint(first_day.year, self.now.year))
+                start, end = festival - timedelta(days=30), festival + timedelta(days=15)
+            else:
+                start = first_day + timedelta(days=self.rng.randrange(max(1, days)))
+                end = start + timedelta(days=self.rng.randint(14, 42))
+            p.update(start_date=start, end_date=end, group_id=None, condition_products=[],
+                     condition_product_ids=set())
+            roll = self.rng.random()
+            if groups and roll < self.profile.group_promotions:
+                group = self.rng.choice(groups)
+                p.update(group_id=group['id'], condition_product_ids=set(group['product_ids']))
+            elif roll < self.profile.group_promotions + self.profile.product_promotions:
+                ids = [x['id'] for x in self.pick_products(products, self.rng.randint(1, 3))]
+                p.update(condition_products=ids, condition_product_ids=set(ids))
+            promotions.append(p)
+        return promotions
+
+    def promotion_rows(self, promotions: List[Dict]) -> Iterable[tuple]:
+        for p in promotions:
+            yield (p['id'], p['name'], p['description'], p['threshold'],
+                   json.dumps(p.get('condition_products', [])), p.get('group_id'),
+                   json.dumps(p['gifts']), int(p['end_date'] >= self.now.date()),
+                   p['start_date'], p['end_date'])
+
+    def order(self, agent: Dict, products: List[Dict], promotions: List[Dict], days: int):
+        """生成一个订单行和对应的发货扣款流水行，并扣减代理余额"""
+        if self._order_items is None:
+            self._order_items = self.data.order_items(products, product_skew=self.profile.product_skew)
+        items = next(self._order_items)
+        total_weight = round(sum(item['quantity'] * item['weight'] for item in items), 2)
+        total_amount = round(sum(item['quantity'] * item['price'] for item in items), 2)
+        created_at = self.order_time(days)
+
+        promotion_ids, gift_items = [], []
+        for promotion in promotions:
+            if 'start_date' in promotion and not promotion['start_date'] <= created_at.date() <= promotion['end_date']:
+                continue
+            condition = promotion.get('condition_product_ids')
+            quantity = sum(item['quantity'] for item in items
+                           if not condition or item['productId'] in condition)
+            times = quantity // promotion['threshold']
+            if times > 0 and self.rng.random() < self.profile.promotion_rate:
+                promotion_ids.append(promotion['id'])
+                gift_items += [{'productId': g['productId'],
+                                'productName': promotion.get('gift_names', {}).get(g['productId'], ''),
+                                'quantity': g['quantity'] * times} for g in promotion['gifts']]
+
+        shipped = self.rng.random() < 0.8
+        order_id = self.new_id()
+        agent['balance'] -= total_amount
+        order_row = (order_id, agent['id'], json.dumps(items, ensure_ascii=False), total_weight,
+                     total_amount, self.phone(), json.dumps(promotion_ids) if promotion_ids else None,
+                     json.dumps(gift_items, ensure_ascii=False) if gift_items else None, '[]',
+                     'shipped' if shipped else 'pending', None, created_at,
+                     created_at + timedelta(hours=self.rng.randint(1, 72)) if shipped else None)
+        tx_row = (self.new_id(), agent['id'], 'deduct', 'shipping', -total_amount, order_id,
+                  None, None, None, '发货扣款', created_at, None)
+        return order_row, tx_row
+
+    def order_batch(self, count: int, agents: List[Dict], products: List[Dict],
+                    promotions: List[Dict], days: int, max_products: int = 3):
+        """用 NumPy 批量生成 count 个订单行和对应的发货扣款流水行，并扣减代理余额
+
+        代理、商品下标、数量、金额、重量、时间和促销命中全部以数组运算完成，
+        items JSON 由预先格式化好的商品片段拼接，字段顺序与 order() 相同。
+        分布与 order() 一致，但随机源不同，同一种子下两种方式生成的数据不相同。
+        """
+        if self._np_rng is None:
+            self._np_rng = np.random.default_rng([self.seed, 12])
+        rng = self._np_rng
+        profile = self.profile
+
+        # 代理按画像的 Zipf 权重抽取；商品在每个订单内按权重不放回抽取（Gumbel-top-k，
+        # 与 order() 中重复时重抽的分布相同），每单保留前 1~width 个
+        agent_idx = rng.choice(len(agents), count, p=_zipf_probabilities(len(agents), profile.agent_skew))
+        width = min(max_products, len(products))
+        keys = (np.log(_zipf_probabilities(len(products), profile.product_skew))
+                + rng.gumbel(size=(count, len(products))))
+        product_idx = np.argpartition(-keys, width - 1, axis=1)[:, :width]
+        product_idx = np.take_along_axis(
+            product_idx, np.argsort(-np.take_along_axis(keys, product_idx, axis=1), axis=1), axis=1)
+        valid = np.arange(width) < rng.integers(1, width + 1, count)[:, None]
+        quantity = np.where(valid, rng.choice(np.array(QUANTITIES), (count, width)), 0)
+
+        prices = np.array([p['price'] for p in products], dtype=float)
+        weights = np.array([p['weight'] for p in products], dtype=float)
+        total_amount = np.round((quantity * prices[product_idx]).sum(axis=1), 2)
+        total_weight = np.round((quantity * weights[product_idx]).sum(axis=1), 2)
+
+        start = np.datetime64(self.now, 's')
+        if profile.seasonal:
+            if self._calendar is None or len(self._calendar.days) != days:
+                self._calendar = SeasonalCalendar(self.now, days, profile.yearly_growth)
+            day_p = np.diff(np.array(self._calendar.cum_weights), prepend=0.0)
+            hour_p = np.array(HOUR_WEIGHTS, dtype=float)
+            created = (np.datetime64(self._calendar.start, 's')
+                       + rng.choice(days, count, p=day_p / day_p.sum()) * 86400
+                       + rng.choice(24, count, p=hour_p / hour_p.sum()) * 3600
+                       + rng.integers(0, 3600, count))
+        else:
+            created = start - rng.integers(0, days * 86400 + 1, count)
+        created_day = created.astype('datetime64[D]')
+        shipped = rng.random(count) < 0.8
+        shipped_at = created + rng.integers(1, 73, count) * 3600
+
+        # 促销命中：每个促销一次数组运算，只为命中的订单拼接预先格式化的 JSON 片段
+        promotion_ids = [[] for _ in range(count)]
+        gift_items = [[] for _ in range(count)]
+        product_pos = {p['id']: i for i, p in enumerate(products)}
+        for promotion in promotions:
+            condition = promotion.get('condition_product_ids')
+            matched = np.zeros(len(products), dtype=bool)
+            if condition:
+                matched[[product_pos[pid] for pid in condition if pid in product_pos]] = True
+            else:
+                matched[:] = True
+            times = (quantity * matched[product_idx]).sum(axis=1) // promotion['threshold']
+            hit = (times > 0) & (rng.random(count) < profile.promotion_rate)
+            if 'start_date' in promotion:
+                hit &= ((created_day >= np.datetime64(promotion['start_date']))
+                        & (created_day <= np.datetime64(promotion['end_date'])))
+            promotion_json = json.dumps(promotion['id'])
+            gifts = [(json.dumps({'productId': g['productId'],
+                                  'productName': promotion.get('gift_names', {}).get(g['productId'], '')},
+                                 ensure_ascii=False)[:-1] + ', "quantity": ', g['quantity'])
+                     for g in promotion['gifts']]
+            hits = np.flatnonzero(hit)
+            for i, n in zip(hits.tolist(), times[hits].tolist()):
+                promotion_ids[i].append(promotion_json)
+                gift_items[i] += [f"{head}{gift_quantity * n}}}" for head, gift_quantity in gifts]
+
+        # 预先格式化每个商品的 JSON 片段，用对象数组逐元素拼接数量，无效列置空后按行连接
+        heads = np.array([json.dumps({'productId': p['id'], 'productName': p['name']}, ensure_ascii=False)[:-1]
+                          + ', "quantity": ' for p in products], dtype=object)
+        tails = np.array([', ' + json.dumps({'price': p['price'], 'weight': p['weight']})[1:]
+                          for p in products], dtype=object)
+        pieces = np.where(valid, heads[product_idx] + quantity.astype(str).astype(object) + tails[product_idx], '')
+        items_json = ['[' + ', '.join(filter(None, row)) + ']' for row in pieces.tolist()]
+
+        spent = np.bincount(agent_idx, weights=total_amount, minlength=len(agents))
+        for i in np.flatnonzero(spent).tolist():
+            agents[i]['balance'] -= float(spent[i])
+
+        created_at = np.char.replace(np.datetime_as_string(created, unit='s'), 'T', ' ').tolist()
+        shipped_at = np.char.replace(np.datetime_as_string(shipped_at, unit='s'), 'T', ' ').tolist()
+        order_ids = _uuid4_batch(rng, count)
+        agent_ids = [agents[i]['id'] for i in agent_idx.tolist()]
+        amounts = total_amount.tolist()
+        order_rows = list(zip(
+            order_ids, agent_ids, items_json, total_weight.tolist(), amounts, self.data.unique_phones(count),
+            ['[' + ', '.join(ids) + ']' if ids else None for ids in promotion_ids],
+            ['[' + ', '.join(gifts) + ']' if gifts else None for gifts in gift_items],
+            ['[]'] * count, ['shipped' if s else 'pending' for s in shipped.tolist()], [None] * count,
+            created_at, [t if s else None for s, t in zip(shipped.tolist(), shipped_at)]))
+        tx_rows = [(tx_id, agent_id, 'deduct', 'shipping', -amount, order_id,
+                    None, None, None, '发货扣款', created, None)
+                   for tx_id, agent_id, amount, order_id, created
+                   in zip(_uuid4_batch(rng, count), agent_ids, amounts, order_ids, created_at)]
+        return order_rows, tx_rows
+
+    def recharge_row(self, agent: Dict, payment_account_ids: Sequence[str], days: int) -> tuple:
+        amount = round(self.rng.uniform(5_000, 100_000), 2)
+        agent['balance'] += amount
+        return (self.new_id(), agent['id'], 'recharge', 'payment', amount, None, None, None, None,
+                '批量充值', self.timestamp(days),
+                self.rng.choice(payment_account_ids) if payment_account_ids else None)
+
+
+def _zipf_probabilities(n: int, exponent: float):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _uuid4_batch(rng, count: int) -> List[str]:
+    """由 NumPy 随机源批量生成 UUID4 字符串"""
+    raw = rng.integers(0, 256, (count, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    text = raw.tobytes().hex()
+    return [f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+            for h in (text[i:i + 32] for i in range(0, len(text), 32))]
+
+
+class BulkSeeder:
+    """批量写入器
+
+    insert 模式使用多行 INSERT（pymysql 的 executemany 会把一批参数合并成一条语句），
+    load-data 模式先写 TSV 临时文件再用 LOAD DATA LOCAL INFILE 导入（需服务端开启 local_infile）。
+    写入期间关闭唯一性和外键检查，每批提交一次。
+    """
+
+    def __init__(self, db_config: Dict = None, batch_size: int = 5000, method: str = 'insert',
+                 vectorized: bool = True):
+        if method not in ('insert', 'load-data'):
+            raise ValueError(f"不支持的写入方式: {method}")
+        self.db_config = {**DB_CONFIG, **(db_config or {})}
+        self.batch_size = batch_size
+        self.method = method
+        # 安装了 NumPy 时订单按批向量化生成，否则逐个生成
+        self.vectorized = vectorized and np is not None
+        self.conn = None
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def connect(self):
+        self.conn = pymysql.connect(charset='utf8mb4', autocommit=False,
+                                    local_infile=self.method == 'load-data', **self.db_config)
+        with self.conn.cursor() as cursor:
+            cursor.execute('SET unique_checks = 0')
+            cursor.execute('SET foreign_key_checks = 0')
+        return self.conn
+
+    def close(self):
+        if self.conn is not None:
+            with self.conn.cursor() as cursor:
+                cursor.execute('SET unique_checks = 1')
+                cursor.execute('SET foreign_key_checks = 1')
+            self.conn.close()
+            self.conn = None
+
+    def insert_rows(self, table: str, columns: List[str], rows: Iterable[tuple]) -> int:
+        """分批写入一张表，返回写入行数"""
+        start = time.perf_counter()
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                total += self._flush(table, columns, batch)
+                batch = []
+        if batch:
+            total += self._flush(table, columns, batch)
+        stat = self.stats.setdefault(table, {'rows': 0, 'seconds': 0.0})
+        stat['rows'] += total
+        stat['seconds'] += time.perf_counter() - start
+        return total
+
+    def _flush(self, table: str, columns: List[str], batch: List[tuple]) -> int:
+        if self.method == 'load-data':
+            self._load_data(table, columns, batch)
+        else:
+            sql = (f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in columns)}) "
+                   f"VALUES ({', '.join(['%s'] * len(columns))})")
+            with self.conn.cursor() as cursor:
+                cursor.executemany(sql, batch)
+        self.conn.commit()
+        return len(batch)
+
+    def _load_data(self, table: str, columns: List[str], batch: List[tuple]):
+        fd, path = tempfile.mkstemp(suffix='.tsv')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='\n') as f:
+                for row in batch:
+                    f.write('\t'.join(_tsv_value(v) for v in row) + '\n')
+            with self.conn.cursor() as cursor:
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+                    f"({', '.join(f'`{c}`' for c in columns)})", (path,))
+        finally:
+            os.remove(path)
+
+    def update_agent_balances(self, agents: List[Dict]):
+        """把生成过程中累计的余额变动（充值减去订单金额）加到代理余额上"""
+        with self.conn.cursor() as cursor:
+            for offset in range(0, len(agents), self.batch_size):
+                cursor.executemany('UPDATE agents SET balance = balance + %s WHERE id = %s',
+                                   [(round(a['balance'], 2), a['id'])
+                                    for a in agents[offset:offset + self.batch_size]])
+                self.conn.commit()
+
+    def seed(self, plan: SeedPlan, generator: DatasetGenerator):
+        """按计划生成并写入整套数据"""
+        products = generator.products(plan.products)
+        self.insert_rows('products', PRODUCT_COLUMNS, generator.product_rows(products))
+        groups = generator.product_groups(plan.product_groups, products)
+        self.insert_rows('product_groups', PRODUCT_GROUP_COLUMNS, generator.product_group_rows(groups))
+        payment_accounts = generator.payment_account_rows(plan.payment_accounts)
+        self.insert_rows('payment_accounts', PAYMENT_ACCOUNT_COLUMNS, payment_accounts)
+        promotions = generator.promotions(plan.promotions, products, groups, plan.days)
+        self.insert_rows('promotions', PROMOTION_COLUMNS, generator.promotion_rows(promotions))
+        agents = generator.agents(plan.agents, products)
+        self.insert_rows('agents', AGENT_COLUMNS, generator.agent_rows(agents))
+
+        # 充值次数随代理活跃度分布，保证热门代理的余额与订单量相称
+        account_ids = [row[0] for row in payment_accounts]
+        self.insert_rows('transactions', TRANSACTION_COLUMNS, (
+            generator.recharge_row(generator.pick_agent(agents), account_ids, plan.days)
+            for _ in range(len(agents) * plan.recharges_per_agent)))
+
+        self.seed_orders(plan.orders, agents, products, promotions, generator, plan.days)
+        self.update_agent_balances(agents)
+
+    def seed_orders(self, count: int, agents: List[Dict], products: List[Dict],
+                    promotions: List[Dict], generator: DatasetGenerator, days: int = 365):
+        """写入订单及对应的发货扣款流水，agents 中的 balance 记录余额变动
+
+        订单与流水按批交替落库，避免在内存中积累全部数据。
+        """
+        for offset in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - offset)
+            start = time.perf_counter()
+            if self.vectorized:
+                order_rows, tx_rows = generator.order_batch(size, agents, products, promotions, days)
+            else:
+                order_rows, tx_rows = [], []
+                for _ in range(size):
+                    order_row, tx_row = generator.order(generator.pick_agent(agents), products,
+                                                        promotions, days)
+                    order_rows.append(order_row)
+                    tx_rows.append(tx_row)
+            stat = self.stats.setdefault('(生成订单)', {'rows': 0, 'seconds': 0.0})
+            stat['rows'] += size
+            stat['seconds'] += time.perf_counter() - start
+            self.insert_rows('orders', ORDER_COLUMNS, order_rows)
+            self.insert_rows('transactions', TRANSACTION_COLUMNS, tx_rows)
+
+    def report(self) -> str:
+        lines = [f"{'表':<20}{'行数':>12}{'耗时(秒)':>12}{'行/秒':>12}"]
+        for table, stat in self.stats.items():
+            rate = stat['rows'] / stat['seconds'] if stat['seconds'] else 0
+            lines.append(f"{table:<20}{int(stat['rows']):>12}{stat['seconds']:>12.1f}{rate:>12.0f}")
+        return '\n'.join(lines)
+
+
+def _tsv_value(value) -> str:
+    """转换为 LOAD DATA 默认格式：NULL 写作 \\N，转义制表符、换行和反斜杠"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='Nomur 批量灌数据（直连 MySQL）')
+    parser.add_argument('--host', default=DB_CONFIG['host'])
+    parser.add_argument('--port', type=int, default=DB_CONFIG['port'])
+    parser.add_argument('--user', default=DB_CONFIG['user'])
+    parser.add_argument('--password', default=DB_CONFIG['password'])
+    parser.add_argument('--database', default=DB_CONFIG['database'])
+    parser.add_argument('--products', type=int, default=SeedPlan.products)
+    parser.add_argument('--product-groups', type=int, default=SeedPlan.product_groups)
+    parser.add_argument('--agents', type=int, default=SeedPlan.agents)
+    parser.add_argument('--payment-accounts', type=int, default=SeedPlan.payment_accounts)
+    parser.add_argument('--promotions', type=int, default=SeedPlan.promotions)
+    parser.add_argument('--orders', type=int, default=SeedPlan.orders)
+    parser.add_argument('--recharges-per-agent', type=int, default=SeedPlan.recharges_per_agent)
+    parser.add_argument('--days', type=int, default=None,
+                        help='订单时间分布在最近多少天内，默认取数据画像的天数')
+    parser.add_argument('--batch-size', type=int, default=5000, help='每批写入行数')
+    parser.add_argument('--method', choices=['insert', 'load-data'], default='insert', help='写入方式')
+    parser.add_argument('--no-numpy', action='store_true', help='不使用 NumPy 向量化生成订单')
+    parser.add_argument('--snapshot', default=None, metavar='NAME',
+                        help='灌完数据后创建数据库快照（见 db_snapshot.py），之后可快速还原')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子，相同种子和截止日期生成相同数据')
+    parser.add_argument('--end-date', default=None, help='数据时间截止日期 YYYY-MM-DD，默认今天')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='uniform',
+                        help='数据画像：uniform 均匀分布，realistic 代理/商品 Zipf 偏斜、多年春节季节性')
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    plan = SeedPlan(args.products, args.product_groups, args.agents, args.payment_accounts,
+                    args.promotions, args.orders, args.recharges_per_agent, args.days or profile.days)
+    seeder = BulkSeeder({'host': args.host, 'port': args.port, 'user': args.user,
+                         'password': args.password, 'database': args.database},
+                        args.batch_size, args.method, not args.no_numpy)
+    now = datetime.strptime(args.end_date, '%Y-%m-%d') if args.end_date else None
+    generator = DatasetGenerator(args.seed, now=now, profile=profile)
+    print(f"开始灌数据（种子 {generator.seed}，画像 {profile.name}）: {plan}")
+    start = time.perf_counter()
+    seeder.connect()
+    try:
+        seeder.seed(plan, generator)
+    finally:
+        seeder.close()
+    print(seeder.report())
+    print(f"\n完成，总耗时 {time.perf_counter() - start:.1f} 秒")
+    if args.snapshot:
+        from db_snapshot import DatabaseSnapshot
+        with DatabaseSnapshot(args.snapshot, seeder.db_config) as snapshot:
+            snapshot.create()
+        print(f"快照已创建: {args.snapshot}")
+
+
+if __name__ == '__main__':
+    main()
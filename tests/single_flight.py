@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+相同请求合并（single-flight）
+大量虚拟用户同时启动时会在同一时刻请求 /statistics、/agents 等相同的 GET。开启合并后，
+同一个键在途时只有第一个调用者真正发出请求，其余调用者等待并共享它的结果（或异常），
+一次网络请求满足所有等待者。SingleFlight 用于多线程，AsyncSingleFlight 用于同一事件循环中的协程。
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """多线程的请求合并，leaders 为实际执行的次数，coalesced 为共享了他人结果的次数"""
+
+    def __init__(self):
+        self.calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """执行 fn 或等待相同键的在途调用，返回 (结果, 是否共享了他人的结果)"""
+        with self._lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+            return call.value, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self.calls[key]
+            call.done.set()
+
+    def summary(self) -> Dict[str, int]:
+        return {'leaders': self.leaders, 'coalesced': self.coalesced}
+
+
+class AsyncSingleFlight:
+    """协程版的请求合并，只能在一个事件循环中使用"""
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """执行 fn 或等待相同键的在途调用，返回 (结果, 是否共享了他人的结果)
+
+        实际执行的协程被取消时，取消只影响它自己：等待者不会收到 CancelledError，
+        而是重新发起，第一个醒来的等待者成为新的执行者，其余等待者改为等它。
+        """
+        while True:
+            future = self.calls.get(key)
+            if future is None:
+                break
+            self.coalesced += 1
+            try:
+                # shield：等待者被取消时不能连带取消共享的调用
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # 等待者自己被取消
+                self.coalesced -= 1
+        future = self.calls[key] = asyncio.get_running_loop().create_future()
+        self.leaders += 1
+        try:
+            value = await fn()
+            future.set_result(value)
+            return value, False
+        except asyncio.CancelledError:
+            future.cancel()  # 唤醒等待者重新发起，见上
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 没有等待者时避免 "exception was never retrieved" 警告
+            raise
+        finally:
+            del self.calls[key]
+
+    def summary(self) -> Dict[str, int]:
+        return {'leaders': self.leaders, 'coalesced': self.coalesced}
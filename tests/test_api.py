@@ -5,21 +5,51 @@ Nomur API 自动化测试脚本
 覆盖所有功能点的API测试
 """
 
+import argparse
 import requests
+import asyncio
+import heapq
 import json
+import os
+import re
+import socket
+import sys
+import threading
 import uuid
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Any, Tuple
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from enum import Enum
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+from html_report import HtmlReport
+from json_stream import JSONArrayParser, iter_json_array, loads as json_loads
+from response_cache import ResponseCache
+from single_flight import AsyncSingleFlight, SingleFlight
+from result_sink import ReporterBackend, ResultSink, read_results
+
+try:
+    import aiohttp
+except ImportError:  # 仅 AsyncAPIClient 需要
+    aiohttp = None
 
 
 # 测试配置
 BASE_URL = "http://127.0.0.1:3001/api"
-TEST_RESULTS = []
-TEST_ISSUES = []
+RESULT_SINK = ResultSink('test_results')  # 每条结果追加写入 JSONL，内存中只保留汇总和最近的问题
+LATENCY_STATS = {}  # 接口名 -> EndpointLatency
+SLOWEST_KEPT = 20  # 每个接口保留的最慢请求数
 
 
 class TestStatus(Enum):
@@ -38,12 +68,211 @@ class TestResult:
     error: Optional[str] = None
 
 
+class LatencyHistogram:
+    """HDR风格的延迟直方图
+
+    以微秒为单位记录，按 2 的幂分段、每段再线性细分 2^(significant_bits-1) 个桶，
+    相对误差不超过 1/2^(significant_bits-1)。桶以稀疏字典保存，可直接合并。
+    """
+
+    def __init__(self, significant_bits: int = 8):
+        self.significant_bits = significant_bits
+        self.counts: Dict[int, int] = {}
+        self.total_count = 0
+        self.total_sum = 0
+        self.min_value = None
+        self.max_value = 0
+
+    def _index(self, value: int) -> int:
+        shift = max(value.bit_length() - self.significant_bits, 0)
+        return (shift << self.significant_bits) | (value >> shift)
+
+    def _value_at(self, index: int) -> int:
+        shift = index >> self.significant_bits
+        sub = index & ((1 << self.significant_bits) - 1)
+        return ((sub + 1) << shift) - 1  # 桶内最大的等价值
+
+    def record_value(self, value_us: int, count: int = 1):
+        """记录一个以微秒为单位的值"""
+        value_us = max(int(value_us), 0)
+        index = self._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += count
+        self.total_sum += value_us * count
+        if self.min_value is None or value_us < self.min_value:
+            self.min_value = value_us
+        if value_us > self.max_value:
+            self.max_value = value_us
+
+    def record(self, seconds: float, count: int = 1):
+        """记录一个以秒为单位的耗时"""
+        self.record_value(int(seconds * 1_000_000), count)
+
+    def record_corrected_value(self, value_us: int, expected_interval_us: int):
+        """记录一个值并修正协调遗漏（coordinated omission）
+
+        闭环测试中一次慢请求会推迟后续请求的发送，这些本应发出却被阻塞的请求
+        按 expected_interval 间隔补记为递减的延迟值，与 HdrHistogram 的做法一致。
+        """
+        value_us = max(int(value_us), 0)
+        expected_interval_us = int(expected_interval_us)
+        self.record_value(value_us)
+        if expected_interval_us <= 0:
+            return
+        missing = value_us - expected_interval_us
+        while missing >= expected_interval_us:
+            self.record_value(missing)
+            missing -= expected_interval_us
+
+    def merge(self, other: 'LatencyHistogram'):
+        """合并另一个直方图"""
+        if other.significant_bits != self.significant_bits:
+            raise ValueError("直方图精度不一致，无法合并")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+        self.total_sum += other.total_sum
+        if other.min_value is not None and (self.min_value is None or other.min_value < self.min_value):
+            self.min_value = other.min_value
+        self.max_value = max(self.max_value, other.max_value)
+        return self
+
+    def value_at_percentile(self, percentile: float) -> int:
+        """返回指定百分位的值（微秒）"""
+        if self.total_count == 0:
+            return 0
+        target = max(1, int(round(percentile / 100.0 * self.total_count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._value_at(index), self.max_value)
+        return self.max_value
+
+    @property
+    def mean(self) -> float:
+        return self.total_sum / self.total_count if self.total_count else 0.0
+
+    def percentiles_ms(self, percentiles=(50, 90, 99, 99.9)) -> Dict[str, float]:
+        """常用百分位（毫秒）"""
+        return {f"p{p:g}": self.value_at_percentile(p) / 1000.0 for p in percentiles}
+
+    def summary(self) -> Dict[str, Any]:
+        result = {
+            'count': self.total_count,
+            'min_ms': (self.min_value or 0) / 1000.0,
+            'mean_ms': round(self.mean / 1000.0, 3),
+            'max_ms': self.max_value / 1000.0,
+        }
+        result.update(self.percentiles_ms())
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'significant_bits': self.significant_bits,
+            'counts': {str(k): v for k, v in self.counts.items()},
+            'total_count': self.total_count,
+            'total_sum': self.total_sum,
+            'min_value': self.min_value,
+            'max_value': self.max_value,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LatencyHistogram':
+        hist = cls(data.get('significant_bits', 8))
+        hist.counts = {int(k): v for k, v in data.get('counts', {}).items()}
+        hist.total_count = data.get('total_count', 0)
+        hist.total_sum = data.get('total_sum', 0)
+        hist.min_value = data.get('min_value')
+        hist.max_value = data.get('max_value', 0)
+        return hist
+
+
+@dataclass
+class EndpointLatency:
+    """单个接口的延迟统计
+
+    response 从计划发送时间算起，包含排队等待，是用户实际感受到的延迟；
+    service 从实际发送时间算起，只反映服务端处理和网络耗时。两者的差距即为排队延迟。
+    errors 为其中失败的请求数；timeline 按墙钟秒记录 [完成数, 错误数]，用于绘制吞吐和错误随时间的变化；
+    slowest 是响应延迟最大的 SLOWEST_KEPT 个请求（小顶堆，元素为 (秒, 完成时间戳, 说明)）。
+    """
+    response: LatencyHistogram = field(default_factory=LatencyHistogram)
+    service: LatencyHistogram = field(default_factory=LatencyHistogram)
+    errors: int = 0
+    timeline: Dict[int, List[int]] = field(default_factory=dict)
+    slowest: List[Tuple[float, float, str]] = field(default_factory=list)
+
+    def record(self, intended_start: float, actual_start: float, end: float,
+               expected_interval: float = 0, error: bool = False, detail: str = ''):
+        """记录一次请求，时间均取自 time.perf_counter()
+
+        expected_interval 为闭环测试中请求的预期间隔（秒），大于 0 时按该间隔修正协调遗漏；
+        开环测试的 intended_start 已是计划时间，无需修正。detail 为请求说明（如实际路径），
+        只在该请求进入最慢列表时保留。
+        """
+        self.response.record_corrected_value(int((end - intended_start) * 1_000_000),
+                                             int(expected_interval * 1_000_000))
+        self.service.record(end - actual_start)
+        now = time.time()
+        bucket = self.timeline.get(int(now))
+        if bucket is None:
+            bucket = self.timeline[int(now)] = [0, 0]
+        bucket[0] += 1
+        if error:
+            self.errors += 1
+            bucket[1] += 1
+        entry = (end - intended_start, now, detail)
+        if len(self.slowest) < SLOWEST_KEPT:
+            heapq.heappush(self.slowest, entry)
+        elif entry[0] > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def merge(self, other: 'EndpointLatency'):
+        self.response.merge(other.response)
+        self.service.merge(other.service)
+        self.errors += other.errors
+        for second, (count, errors) in other.timeline.items():
+            bucket = self.timeline.setdefault(second, [0, 0])
+            bucket[0] += count
+            bucket[1] += errors
+        self.slowest = heapq.nlargest(SLOWEST_KEPT, self.slowest + other.slowest)
+        heapq.heapify(self.slowest)
+        return self
+
+    @property
+    def count(self) -> int:
+        return self.service.total_count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'response': self.response.to_dict(), 'service': self.service.to_dict(), 'errors': self.errors,
+                'timeline': {str(k): v for k, v in self.timeline.items()},
+                'slowest': [list(entry) for entry in self.slowest]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EndpointLatency':
+        return cls(response=LatencyHistogram.from_dict(data['response']),
+                   service=LatencyHistogram.from_dict(data['service']),
+                   errors=data.get('errors', 0),
+                   timeline={int(k): list(v) for k, v in data.get('timeline', {}).items()},
+                   slowest=[tuple(entry) for entry in data.get('slowest', [])])
+
+
+# 各线程先写自己的缓冲区，生成报告前合并到 RESULT_SINK 和 LATENCY_STATS
+REPORTER = ReporterBackend(RESULT_SINK, LATENCY_STATS, EndpointLatency)
+
+
 class TestReporter:
-    """测试结果记录器"""
+    """测试结果记录器
+
+    可在多个线程中并行调用；多进程时子进程先调用 use_queue(queue)、结束前调用 flush()，
+    父进程用 listen(queue) 合并，所有结果最终写入同一个结果集。
+    """
     
     @staticmethod
     def record(test_name: str, status: TestStatus, message: str = "", 
-               duration: float = 0, details: Dict = None, error: str = None):
+               duration: float = 0, details: Dict = None, error: str = None, echo: bool = True):
+        """记录一条结果，echo 为 False 时只写入结果集、不打印（如压测中的大量失败请求）"""
         result = TestResult(
             test_name=test_name,
             status=status,
@@ -52,24 +281,86 @@ class TestReporter:
             details=details or {},
             error=error
         )
-        TEST_RESULTS.append(result)
-        if status != TestStatus.PASS:
-            TEST_ISSUES.append(result)
+        REPORTER.add(result, is_issue=status != TestStatus.PASS)
+        if not echo:
+            return
         
+        # 一次写出整条输出，避免多线程时行内交错
         status_icon = "✓" if status == TestStatus.PASS else "✗"
-        print(f"{status_icon} [{status.value}] {test_name}: {message}")
+        line = f"{status_icon} [{status.value}] {test_name}: {message}\n"
         if error:
-            print(f"   错误: {error}")
+            line += f"   错误: {error}\n"
+        print(line, end='')
+    
+    @staticmethod
+    def record_latency(endpoint: str, intended_start: float, actual_start: float, end: float,
+                       expected_interval: float = 0, error: bool = False, detail: str = ''):
+        """按接口记录一次请求的延迟，时间均取自 time.perf_counter()"""
+        REPORTER.stat(endpoint).record(intended_start, actual_start, end, expected_interval, error, detail)
+    
+    @staticmethod
+    def merge_latency(stats: Dict[str, EndpointLatency]):
+        """合并其他来源（如压测结果）的接口延迟统计"""
+        REPORTER.merge([], stats)
+    
+    @staticmethod
+    def flush():
+        """合并当前线程（子进程中为发回父进程）尚未合并的结果"""
+        REPORTER.flush()
+    
+    @staticmethod
+    def collect():
+        """合并所有线程的缓冲区，应在工作线程全部结束后调用"""
+        REPORTER.collect()
+    
+    @staticmethod
+    def use_queue(queue):
+        """子进程中调用，之后的结果和延迟统计经 queue 发回父进程"""
+        REPORTER.use_queue(queue)
+    
+    @staticmethod
+    def listen(queue):
+        """父进程中调用，返回监听线程，所有子进程 flush 后调用其 stop()"""
+        return REPORTER.listen(queue)
+    
+    @staticmethod
+    def latency_report() -> str:
+        """接口延迟分布（毫秒），响应延迟已修正协调遗漏"""
+        REPORTER.collect()
+        report = f"{'接口':<40}{'请求数':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'p99.9':>9}{'max':>9}{'服务p99':>9}\n"
+        for endpoint, latency in sorted(LATENCY_STATS.items()):
+            s = latency.response.summary()
+            report += (f"{endpoint:<40}{latency.count:>8}{s['p50']:>9.1f}{s['p90']:>9.1f}"
+                       f"{s['p99']:>9.1f}{s['p99.9']:>9.1f}{s['max_ms']:>9.1f}"
+                       f"{latency.service.value_at_percentile(99) / 1000.0:>9.1f}\n")
+        return report
+    
+    @staticmethod
+    def format_result(result: Dict) -> str:
+        text = f"\n[{result['status']}] {result['test_name']}\n"
+        text += f"  消息: {result['message']}\n"
+        text += f"  耗时: {result['duration']:.3f}秒\n"
+        if result.get('details'):
+            text += f"  详情: {json.dumps(result['details'], ensure_ascii=False, indent=2)}\n"
+        if result.get('error'):
+            text += f"  错误: {result['error']}\n"
+        return text
     
     @staticmethod
     def generate_report():
-        """生成测试报告"""
-        total = len(TEST_RESULTS)
-        passed = len([r for r in TEST_RESULTS if r.status == TestStatus.PASS])
-        failed = len([r for r in TEST_RESULTS if r.status == TestStatus.FAIL])
-        errors = len([r for r in TEST_RESULTS if r.status == TestStatus.ERROR])
+        """生成测试报告
+
+        详细结果从 JSONL 结果文件逐行读回并直接写入报告文件，不在内存中拼接；
+        控制台只输出汇总、最近的问题和延迟分布。
+        """
+        REPORTER.collect()
+        RESULT_SINK.flush()
+        total = len(RESULT_SINK)
+        passed = RESULT_SINK.count(TestStatus.PASS)
+        failed = RESULT_SINK.count(TestStatus.FAIL)
+        errors = RESULT_SINK.count(TestStatus.ERROR)
         
-        report = f"""
+        summary = f"""
 {'='*80}
 测试报告
 {'='*80}
@@ -78,69 +369,385 @@ class TestReporter:
 通过: {passed} ({passed/total*100:.1f}%)
 失败: {failed} ({failed/total*100:.1f}%)
 错误: {errors} ({errors/total*100:.1f}%)
+结果明细: {RESULT_SINK.path}
 {'='*80}
-
-详细结果:
 """
         
-        for result in TEST_RESULTS:
-            report += f"\n[{result.status.value}] {result.test_name}\n"
-            report += f"  消息: {result.message}\n"
-            report += f"  耗时: {result.duration:.3f}秒\n"
-            if result.details:
-                report += f"  详情: {json.dumps(result.details, ensure_ascii=False, indent=2)}\n"
-            if result.error:
-                report += f"  错误: {result.error}\n"
-        
-        if TEST_ISSUES:
-            report += f"\n{'='*80}\n发现的问题:\n{'='*80}\n"
-            for issue in TEST_ISSUES:
-                report += f"\n[{issue.status.value}] {issue.test_name}\n"
-                report += f"  消息: {issue.message}\n"
+        tail = ""
+        if RESULT_SINK.issues:
+            tail += f"\n{'='*80}\n发现的问题:\n{'='*80}\n"
+            if RESULT_SINK.issue_count > len(RESULT_SINK.issues):
+                tail += f"（共 {RESULT_SINK.issue_count} 个，仅列出最近 {len(RESULT_SINK.issues)} 个，完整记录见结果明细）\n"
+            for issue in RESULT_SINK.issues:
+                tail += f"\n[{issue.status.value}] {issue.test_name}\n"
+                tail += f"  消息: {issue.message}\n"
                 if issue.error:
-                    report += f"  错误: {issue.error}\n"
+                    tail += f"  错误: {issue.error}\n"
+        
+        if LATENCY_STATS:
+            tail += f"\n{'='*80}\n接口延迟分布（毫秒）:\n{'='*80}\n"
+            tail += TestReporter.latency_report()
         
-        report += f"\n{'='*80}\n"
+        tail += f"\n{'='*80}\n"
         
-        # 保存到文件
+        # 保存到文件，详细结果逐条写入
         report_file = f"test_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
         with open(report_file, 'w', encoding='utf-8') as f:
-            f.write(report)
+            f.write(summary)
+            f.write("\n详细结果:\n")
+            for result in read_results(RESULT_SINK.path):
+                f.write(TestReporter.format_result(result))
+            f.write(tail)
         
+        # 同名的自包含 HTML 报告：延迟分布、吞吐/错误随时间变化、最慢请求
+        html_report = HtmlReport('Nomur API 测试报告')
+        html_report.add_latency(LATENCY_STATS)
+        html_report.add_results(RESULT_SINK.path)
+        html_file = html_report.write(report_file[:-len('.txt')] + '.html')
+        
+        report = summary + tail
         print(report)
         print(f"\n报告已保存到: {report_file}")
+        print(f"HTML 报告: {html_file}")
         
         return report
 
 
+_ID_SEGMENT = re.compile(r'/[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}|/\d+(?=/|$)')
+
+
+def endpoint_key(method: str, endpoint: str) -> str:
+    """将请求归并为接口名，如 GET /agents/<uuid>/statistics -> GET /agents/:id/statistics"""
+    return f"{method.upper()} {_ID_SEGMENT.sub('/:id', endpoint.split('?')[0])}"
+
+
+def request_key(endpoint: str, params: Optional[Dict] = None) -> str:
+    """完整的请求地址（查询参数排序），用于判断两个 GET 是否相同"""
+    return f"{endpoint}?{urlencode(sorted(params.items()), doseq=True)}" if params else endpoint
+
+
+@dataclass
+class RequestTiming:
+    """一次请求各阶段的耗时（秒）
+
+    dns 和 connect 只在新建连接时非零，connect 包含 TLS 握手；ttfb 为连接就绪到收到响应头，
+    主要是服务端处理时间；transfer 为读取响应体，decode 为 JSON 解码，后两者随响应体大小增长，
+    与 ttfb 对比即可区分服务端变慢还是客户端开销。size 为响应体字节数（解压后）。
+    """
+    method: str
+    endpoint: str
+    status: Optional[int] = None
+    dns: float = 0.0
+    connect: float = 0.0
+    ttfb: float = 0.0
+    transfer: float = 0.0
+    decode: float = 0.0
+    total: float = 0.0
+    reused: bool = True
+    size: int = 0
+    error: bool = False
+
+    PHASES = ('dns', 'connect', 'ttfb', 'transfer', 'decode', 'total')
+
+
+class PhaseTimingStats:
+    """按接口汇总 RequestTiming，可直接作为 APIClient 的 timing_hook，多线程安全"""
+
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self.reused: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, timing: RequestTiming):
+        key = endpoint_key(timing.method, timing.endpoint)
+        with self._lock:
+            phases = self.phases.get(key)
+            if phases is None:
+                phases = self.phases[key] = {name: LatencyHistogram() for name in RequestTiming.PHASES}
+            for name in RequestTiming.PHASES:
+                phases[name].record(getattr(timing, name))
+            self.reused[key] = self.reused.get(key, 0) + timing.reused
+            self.bytes[key] = self.bytes.get(key, 0) + timing.size
+
+    def report(self, percentile: float = 50) -> str:
+        """各接口分阶段耗时（毫秒，默认取中位数）、连接复用率和平均响应大小"""
+        report = (f"{'接口':<40}{'请求数':>8}" + ''.join(f"{name:>10}" for name in RequestTiming.PHASES)
+                  + f"{'复用率':>8}{'平均KB':>10}\n")
+        with self._lock:
+            for key, phases in sorted(self.phases.items()):
+                count = phases['total'].total_count
+                report += f"{key[:40]:<40}{count:>8}"
+                report += ''.join(f"{phases[name].value_at_percentile(percentile) / 1000.0:>10.2f}"
+                                  for name in RequestTiming.PHASES)
+                report += f"{self.reused[key] / count * 100:>7.0f}%{self.bytes[key] / count / 1024:>10.1f}\n"
+        return report
+
+
+@dataclass
+class ConnectionStats:
+    """客户端连接统计，多线程安全
+
+    opened 为新建的连接数，其中 reconnected 个是已建立过的连接失效（服务端关闭 keep-alive）后重建的；
+    reused 为复用空闲连接的请求数；discarded 为连接池已满、用完即关闭的连接数，持续增长说明
+    pool_maxsize 小于并发线程数。
+    """
+    opened: int = 0
+    reconnected: int = 0
+    reused: int = 0
+    discarded: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, name: str, count: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + count)
+
+    def summary(self) -> Dict[str, int]:
+        return {'opened': self.opened, 'reconnected': self.reconnected,
+                'reused': self.reused, 'discarded': self.discarded}
+
+
+# 当前线程正在计时的请求，由下面的连接类在建立连接时写入
+_CURRENT_TIMING = threading.local()
+
+
+class _TimedConnectionMixin:
+    """记录 DNS 解析和建立连接耗时的 urllib3 连接
+
+    先自行解析地址并计时，再依次连接解析出的地址（与 urllib3 的 create_connection 一致），
+    避免重复解析。没有正在计时的请求时按原流程处理。
+    """
+
+    def _new_conn(self):
+        timing = getattr(_CURRENT_TIMING, 'value', None)
+        if timing is None:
+            return super()._new_conn()
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except OSError:
+            infos = []  # 解析失败交给 urllib3 按原流程抛出 NameResolutionError
+        timing.dns += time.perf_counter() - start
+        error = None
+        try:
+            for address in list(dict.fromkeys(info[4][0] for info in infos)) or [host]:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    error = e
+            raise error
+        finally:
+            self._dns_host = host
+
+    connection_stats: Optional[ConnectionStats] = None
+    _was_connected = False
+
+    def connect(self):
+        if self.connection_stats is not None:
+            self.connection_stats.add('opened')
+            if self._was_connected:
+                self.connection_stats.add('reconnected')
+        self._was_connected = True
+        timing = getattr(_CURRENT_TIMING, 'value', None)
+        if timing is None:
+            return super().connect()
+        start, dns = time.perf_counter(), timing.dns
+        timing.reused = False
+        try:
+            return super().connect()
+        finally:
+            timing.connect += time.perf_counter() - start - (timing.dns - dns)
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedPoolMixin:
+    """把连接统计传给新建的连接，并统计因连接池已满而关闭的连接"""
+
+    connection_stats: Optional[ConnectionStats] = None
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.connection_stats = self.connection_stats
+        return conn
+
+    def _put_conn(self, conn):
+        # 放不回连接池的连接会被 urllib3 直接关闭
+        connected = conn is not None and conn.sock is not None
+        super()._put_conn(conn)
+        if connected and conn.sock is None and self.connection_stats is not None:
+            self.connection_stats.add('discarded')
+
+
+class _TimedHTTPConnectionPool(_TimedPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(_TimedPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedPoolManager(PoolManager):
+    """创建可计时连接池，并让各主机的连接池共用同一个 ConnectionStats"""
+
+    def __init__(self, *args, connection_stats: Optional[ConnectionStats] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connection_stats = connection_stats
+        self.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool}
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.connection_stats = self.connection_stats
+        return pool
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """连接池使用可计时连接、并把连接数记入 connection_stats 的 HTTPAdapter
+
+    pool_connections 为缓存连接池的主机数，pool_maxsize 为每个主机保留的连接数上限；
+    pool_block 为 True 时每个主机最多同时使用 pool_maxsize 个连接，超出的请求等待空闲连接，
+    否则临时新建连接、用完后关闭（计入 discarded）。
+    """
+
+    def __init__(self, connection_stats: Optional[ConnectionStats] = None, **kwargs):
+        self.connection_stats = connection_stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _TimedPoolManager(num_pools=connections, maxsize=maxsize, block=block,
+                                             connection_stats=self.connection_stats, **pool_kwargs)
+
+
 class APIClient:
-    """API客户端封装"""
+    """API客户端封装
+
+    每次请求的分阶段耗时（RequestTiming）保存在当前线程的 last_timing 中，
+    设置 timing_hook 时同时回调，如传入 PhaseTimingStats 按接口汇总。
+    多线程共用一个客户端时 pool_maxsize 应不小于线程数，否则多出的连接用完即关闭，
+    每次都要重新建立；connection_stats 记录新建、复用和丢弃的连接数。
+    decoder 为响应体（bytes）的 JSON 解码函数，默认安装 orjson 时用 orjson；
+    大列表用 iter_items 边下载边解析，逐条产出记录。
+    传入 cache（ResponseCache）时缓存基础数据接口的 GET 响应，命中的请求不计入延迟统计。
+    coalesce 为 True 时合并多个线程同时发出的相同 GET（single_flight 统计合并次数），
+    只有实际发出的请求计入延迟统计；可随时修改 coalesce 切换。
+    """
     
-    def __init__(self, base_url: str = BASE_URL):
+    def __init__(self, base_url: str = BASE_URL, record_latency: bool = True,
+                 timing_hook: Optional[Callable[[RequestTiming], None]] = None,
+                 pool_connections: int = 10, pool_maxsize: int = 10, pool_block: bool = False,
+                 decoder: Callable[[bytes], Any] = json_loads, cache: Optional[ResponseCache] = None,
+                 coalesce: bool = False):
         self.base_url = base_url
+        self.record_latency = record_latency
+        self.timing_hook = timing_hook
+        self.decoder = decoder
+        self.cache = cache
+        self.coalesce = coalesce
+        self.single_flight = SingleFlight()
+        self.connection_stats = ConnectionStats()
         self.session = requests.Session()
         self.session.headers.update({'Content-Type': 'application/json'})
+        adapter = TimedHTTPAdapter(self.connection_stats, pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._local = threading.local()
+    
+    @property
+    def last_timing(self) -> Optional[RequestTiming]:
+        """当前线程最近一次请求的分阶段耗时"""
+        return getattr(self._local, 'timing', None)
     
     def request(self, method: str, endpoint: str, data: Dict = None, 
                 params: Dict = None) -> Dict:
         """发送请求"""
+        return self.fetch(method, endpoint, data, params)[0]
+    
+    def fetch(self, method: str, endpoint: str, data: Dict = None,
+              params: Dict = None) -> Tuple[Any, bool]:
+        """发送请求，返回 (结果, 是否直接由缓存返回)，压测据此把没有到达服务端的请求排除在统计之外"""
+        if self.coalesce and method.upper() == 'GET':
+            (result, body, from_cache), shared = self.single_flight.do(
+                request_key(endpoint, params), lambda: self._request('GET', endpoint, params=params))
+            # 共享的响应体重新解码，每个调用方得到独立的对象
+            return (self.decoder(body) if shared else result), from_cache
+        result, _, from_cache = self._request(method, endpoint, data, params)
+        return result, from_cache
+    
+    def _request(self, method: str, endpoint: str, data: Dict = None,
+                 params: Dict = None) -> Tuple[Any, bytes, bool]:
+        """发送请求，返回 (解码后的结果, 响应体, 是否直接由缓存返回)"""
         url = f"{self.base_url}{endpoint}"
+        cache_key = self.cache.key(endpoint, params) if self.cache is not None and method.upper() == 'GET' else None
+        cached = self.cache.get(cache_key) if cache_key is not None else None
+        if cached is not None and cached.fresh:
+            return self.decoder(cached.body), cached.body, True  # 缓存命中不发请求，也不计入延迟统计
+        headers = {'If-None-Match': cached.etag} if cached is not None and cached.etag else None
+        timing = RequestTiming(method.upper(), endpoint)
+        start_time = time.perf_counter()
+        failed = True
+        _CURRENT_TIMING.value = timing
         try:
+            # stream=True 时收到响应头即返回，响应体的读取和解码分别计时
             if method.upper() == 'GET':
-                response = self.session.get(url, params=params, timeout=10)
+                response = self.session.get(url, params=params, headers=headers, timeout=10, stream=True)
             elif method.upper() == 'POST':
-                response = self.session.post(url, json=data, timeout=10)
+                response = self.session.post(url, json=data, timeout=10, stream=True)
             elif method.upper() == 'PUT':
-                response = self.session.put(url, json=data, timeout=10)
+                response = self.session.put(url, json=data, timeout=10, stream=True)
             elif method.upper() == 'DELETE':
-                response = self.session.delete(url, timeout=10)
+                response = self.session.delete(url, timeout=10, stream=True)
             else:
                 raise ValueError(f"不支持的HTTP方法: {method}")
+            headers_at = time.perf_counter()
+            _CURRENT_TIMING.value = None
+            timing.status = response.status_code
+            timing.ttfb = headers_at - start_time - timing.dns - timing.connect
+            body = response.content  # 读完响应体后连接归还连接池
+            body_at = time.perf_counter()
+            timing.transfer = body_at - headers_at
+            timing.size = len(body)
+            revalidated = response.status_code == 304 and cached is not None
+            if revalidated:
+                body = cached.body
             
             response.raise_for_status()
-            return response.json()
+            result = self.decoder(body)
+            timing.decode = time.perf_counter() - body_at
+            if cache_key is not None and isinstance(result, dict) and result.get('code') == 0:
+                self.cache.put(cache_key, body, response.headers.get('ETag') or (cached.etag if revalidated else None),
+                               revalidated)
+            failed = False
+            return result, body, False
         except requests.exceptions.RequestException as e:
             raise Exception(f"请求失败: {str(e)}")
+        finally:
+            if self.cache is not None and method.upper() in ('POST', 'PUT', 'DELETE'):
+                self.cache.invalidate(endpoint)
+            _CURRENT_TIMING.value = None
+            end_time = time.perf_counter()
+            timing.total = end_time - start_time
+            timing.error = failed
+            self._local.timing = timing
+            if timing.reused and timing.status is not None:
+                self.connection_stats.add('reused')
+            if self.timing_hook is not None:
+                self.timing_hook(timing)
+            if self.record_latency:
+                TestReporter.record_latency(endpoint_key(method, endpoint), start_time, start_time,
+                                            end_time, error=failed,
+                                            detail=f"{method.upper()} {endpoint}")
     
     def get(self, endpoint: str, params: Dict = None) -> Dict:
         return self.request('GET', endpoint, params=params)
@@ -153,20 +760,390 @@ class APIClient:
     
     def delete(self, endpoint: str) -> Dict:
         return self.request('DELETE', endpoint)
+    
+    def iter_items(self, endpoint: str, params: Dict = None, key: str = 'data',
+                   chunk_size: int = 64 * 1024) -> Iterator[Any]:
+        """GET 列表接口，边下载边解析，逐条产出响应中 key 数组的元素
+
+        内存中只保留当前的一块响应体，适合订单、流水等大列表；响应中没有该数组
+        （如 code 非 0）时抛出异常。延迟在整个响应读完后记录。
+        """
+        url = f"{self.base_url}{endpoint}"
+        start_time = time.perf_counter()
+        failed = True
+        try:
+            with self.session.get(url, params=params, timeout=10, stream=True) as response:
+                response.raise_for_status()
+                parser = JSONArrayParser(key)
+                yield from iter_json_array(response.iter_content(chunk_size), parser)
+                if not parser.found:
+                    raise Exception(f"响应中没有 {key} 数组: {parser.envelope}")
+            failed = False
+        except GeneratorExit:
+            failed = False  # 调用方提前停止迭代不算失败
+            raise
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"请求失败: {str(e)}")
+        finally:
+            if self.record_latency:
+                TestReporter.record_latency(endpoint_key('GET', endpoint), start_time, start_time,
+                                            time.perf_counter(), error=failed, detail=f"GET {endpoint}")
+
+
+class AsyncAPIClient:
+    """异步API客户端封装
+
+    与 APIClient 提供相同的 get/post/put/delete 接口，基于 aiohttp 复用
+    keep-alive 连接，并通过信号量限制同时在途的请求数。分阶段耗时通过
+    aiohttp 的请求跟踪回调采集，设置 timing_hook 时每次请求回调一个 RequestTiming。
+    连接总数不超过 concurrency，limit_per_host 大于 0 时再限制单个主机的连接数；
+    aiohttp 达到上限时等待空闲连接而不是丢弃，因此 connection_stats 只统计新建和复用。
+    cache 与 APIClient 相同；coalesce 为 True 时合并同时在途的相同 GET，
+    所有等待的协程共享一次请求的结果。
+    """
+    
+    def __init__(self, base_url: str = BASE_URL, concurrency: int = 100,
+                 timeout: float = 10, keepalive_timeout: float = 30,
+                 timing_hook: Optional[Callable[[RequestTiming], None]] = None,
+                 limit_per_host: int = 0, decoder: Callable[[bytes], Any] = json_loads,
+                 cache: Optional[ResponseCache] = None, coalesce: bool = False):
+        if aiohttp is None:
+            raise RuntimeError("AsyncAPIClient 需要 aiohttp，请先执行: pip install aiohttp")
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.timing_hook = timing_hook
+        self.limit_per_host = limit_per_host
+        self.decoder = decoder
+        self.cache = cache
+        self.coalesce = coalesce
+        self.single_flight = AsyncSingleFlight()
+        self.connection_stats = ConnectionStats()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.session = None
+    
+    def _trace_config(self):
+        """统计连接数，并把 DNS 解析、建立连接和收到响应头的时间记入请求的 trace_request_ctx
+
+        ctx 是每个请求各自的命名空间；trace_request_ctx 由 request() 传入（含 RequestTiming），
+        直接使用 session 发出的请求没有该对象，只统计连接数。
+        """
+        async def dns_start(session, ctx, params):
+            ctx.dns_start = time.perf_counter()
+        
+        async def dns_end(session, ctx, params):
+            if ctx.trace_request_ctx is not None:
+                ctx.trace_request_ctx.timing.dns += time.perf_counter() - ctx.dns_start
+        
+        async def connect_start(session, ctx, params):
+            ctx.connect_start = time.perf_counter()
+            if ctx.trace_request_ctx is not None:
+                ctx.connect_dns = ctx.trace_request_ctx.timing.dns
+        
+        async def connect_end(session, ctx, params):
+            self.connection_stats.add('opened')
+            if ctx.trace_request_ctx is None:
+                return
+            timing = ctx.trace_request_ctx.timing
+            timing.reused = False
+            # aiohttp 在建立连接的过程中解析 DNS，扣除后才是 TCP/TLS 耗时
+            timing.connect += time.perf_counter() - ctx.connect_start - (timing.dns - ctx.connect_dns)
+        
+        async def connection_reused(session, ctx, params):
+            self.connection_stats.add('reused')
+        
+        async def request_end(session, ctx, params):
+            if ctx.trace_request_ctx is not None:
+                ctx.trace_request_ctx.headers_at = time.perf_counter()
+        
+        config = aiohttp.TraceConfig()
+        config.on_dns_resolvehost_start.append(dns_start)
+        config.on_dns_resolvehost_end.append(dns_end)
+        config.on_connection_create_start.append(connect_start)
+        config.on_connection_create_end.append(connect_end)
+        config.on_connection_reuseconn.append(connection_reused)
+        config.on_request_end.append(request_end)
+        return config
+    
+    async def _get_session(self):
+        # 延迟到事件循环中创建会话，连接池上限与并发数一致
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'Content-Type': 'application/json'},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[self._trace_config()]
+            )
+        return self.session
+    
+    async def request(self, method: str, endpoint: str, data: Dict = None,
+                      params: Dict = None) -> Dict:
+        """发送请求"""
+        return (await self.fetch(method, endpoint, data, params))[0]
+    
+    async def fetch(self, method: str, endpoint: str, data: Dict = None,
+                    params: Dict = None) -> Tuple[Any, bool]:
+        """发送请求，返回 (结果, 是否直接由缓存返回)"""
+        method = method.upper()
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+            raise ValueError(f"不支持的HTTP方法: {method}")
+        if self.coalesce and method == 'GET':
+            (result, body, from_cache), shared = await self.single_flight.do(
+                request_key(endpoint, params), lambda: self._request('GET', endpoint, params=params))
+            return (self.decoder(body) if shared else result), from_cache
+        result, _, from_cache = await self._request(method, endpoint, data, params)
+        return result, from_cache
+    
+    async def _request(self, method: str, endpoint: str, data: Dict = None,
+                       params: Dict = None) -> Tuple[Any, bytes, bool]:
+        """发送请求，返回 (解码后的结果, 响应体, 是否直接由缓存返回)"""
+        url = f"{self.base_url}{endpoint}"
+        cache_key = self.cache.key(endpoint, params) if self.cache is not None and method == 'GET' else None
+        cached = self.cache.get(cache_key) if cache_key is not None else None
+        if cached is not None and cached.fresh:
+            return self.decoder(cached.body), cached.body, True
+        headers = {'If-None-Match': cached.etag} if cached is not None and cached.etag else None
+        session = await self._get_session()
+        async with self.semaphore:
+            timing = RequestTiming(method, endpoint)
+            trace = SimpleNamespace(timing=timing, headers_at=None)
+            start = time.perf_counter()
+            failed = True
+            try:
+                async with session.request(
+                    method, url,
+                    params=params if method == 'GET' else None,
+                    json=data if method in ('POST', 'PUT') else None,
+                    headers=headers,
+                    trace_request_ctx=trace
+                ) as response:
+                    headers_at = trace.headers_at or time.perf_counter()
+                    timing.status = response.status
+                    timing.ttfb = headers_at - start - timing.dns - timing.connect
+                    body = await response.read()
+                    body_at = time.perf_counter()
+                    timing.transfer = body_at - headers_at
+                    timing.size = len(body)
+                    revalidated = response.status == 304 and cached is not None
+                    if revalidated:
+                        body = cached.body
+                    response.raise_for_status()
+                    result = self.decoder(body)
+                    timing.decode = time.perf_counter() - body_at
+                    if cache_key is not None and isinstance(result, dict) and result.get('code') == 0:
+                        self.cache.put(cache_key, body,
+                                       response.headers.get('ETag') or (cached.etag if revalidated else None),
+                                       revalidated)
+                    failed = False
+                    return result, body, False
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise Exception(f"请求失败: {str(e) or type(e).__name__}")
+            finally:
+                if self.cache is not None and method != 'GET':
+                    self.cache.invalidate(endpoint)
+                timing.total = time.perf_counter() - start
+                timing.error = failed
+                if self.timing_hook is not None:
+                    self.timing_hook(timing)
+    
+    async def get(self, endpoint: str, params: Dict = None) -> Dict:
+        return await self.request('GET', endpoint, params=params)
+    
+    async def post(self, endpoint: str, data: Dict = None) -> Dict:
+        return await self.request('POST', endpoint, data=data)
+    
+    async def put(self, endpoint: str, data: Dict = None) -> Dict:
+        return await self.request('PUT', endpoint, data=data)
+    
+    async def delete(self, endpoint: str) -> Dict:
+        return await self.request('DELETE', endpoint)
+    
+    async def iter_items(self, endpoint: str, params: Dict = None, key: str = 'data',
+                         chunk_size: int = 64 * 1024) -> AsyncIterator[Any]:
+        """与 APIClient.iter_items 相同，用 async for 逐条取出列表接口的记录"""
+        session = await self._get_session()
+        async with self.semaphore:
+            try:
+                async with session.get(f"{self.base_url}{endpoint}", params=params) as response:
+                    response.raise_for_status()
+                    parser = JSONArrayParser(key)
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        for item in parser.feed(chunk):
+                            yield item
+                    for item in parser.close():
+                        yield item
+                    if not parser.found:
+                        raise Exception(f"响应中没有 {key} 数组: {parser.envelope}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise Exception(f"请求失败: {str(e) or type(e).__name__}")
+    
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+    
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+# 清理顺序：先删引用方再删被引用方（删除订单时服务端会连带删除其发货扣款流水）
+CLEANUP_ORDER = ['order_ids', 'transaction_ids', 'promotion_ids', 'agent_ids', 'product_ids',
+                 'payment_account_ids', 'truck_type_ids', 'driver_ids']
+
+# 各类实体的删除接口。收款账户的 DELETE 只是软删除（is_active=0），司机没有删除接口，
+# 这两类只能用 SQL 清理（SQL_ONLY_KINDS）
+CLEANUP_ENDPOINTS = {
+    'order_ids': '/orders/{}',
+    'transaction_ids': '/transactions/{}',
+    'promotion_ids': '/promotions/{}',
+    'agent_ids': '/agents/{}',
+    'product_ids': '/products/{}',
+    'truck_type_ids': '/truck-types/{}',
+}
+SQL_ONLY_KINDS = [kind for kind in CLEANUP_ORDER if kind not in CLEANUP_ENDPOINTS]
+
+CLEANUP_TABLES = {
+    'order_ids': 'orders',
+    'transaction_ids': 'transactions',
+    'promotion_ids': 'promotions',
+    'agent_ids': 'agents',
+    'product_ids': 'products',
+    'payment_account_ids': 'payment_accounts',
+    'truck_type_ids': 'truck_types',
+    'driver_ids': 'drivers',
+}
+
+
+class RunTracker:
+    """记录一次测试运行创建的实体，结束时按依赖顺序批量清理
+
+    每次运行有唯一的 run_id，创建实体时把它写进名称或备注（tag），
+    即使没拿到返回的 ID，SQL 清理也能按 tag 找回这些实体。
+    """
+
+    def __init__(self, run_id: Optional[str] = None):
+        self.run_id = run_id or f"{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:4]}"
+        self.entities: Dict[str, List[str]] = {kind: [] for kind in CLEANUP_ORDER}
+
+    def tag(self, text: str) -> str:
+        return f"{text}_{self.run_id}"
+
+    def track(self, kind: str, entity_id: str):
+        self.entities[kind].append(entity_id)
+
+    def count(self) -> int:
+        return sum(len(ids) for ids in self.entities.values())
+
+    def cleanup_api(self, base_url: str = BASE_URL, headers: Dict = None,
+                    concurrency: int = 8) -> Dict[str, Dict]:
+        """通过 DELETE 接口清理：各类实体按依赖顺序依次处理，同类实体并发删除
+
+        删除订单和流水需要管理员身份，headers 传入 admin-id / admin-role。
+        返回 {类别: {'deleted', 'failed', 'seconds'}}，删除成功的 ID 会从记录中移除；
+        没有硬删除接口的类别（SQL_ONLY_KINDS）不处理，记为 {'left': 残留数}，需再用 cleanup_sql 清理。
+        """
+        client = APIClient(base_url, record_latency=False, pool_maxsize=max(concurrency, 10))
+        client.session.headers.update(headers or {})
+
+        def delete(path: str) -> bool:
+            try:
+                return client.delete(path).get('code') == 0
+            except Exception:
+                return False
+
+        stats = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for kind in CLEANUP_ORDER:
+                ids = self.entities[kind]
+                if not ids:
+                    continue
+                if kind not in CLEANUP_ENDPOINTS:
+                    stats[kind] = {'deleted': 0, 'failed': 0, 'left': len(ids), 'seconds': 0.0}
+                    continue
+                start = time.perf_counter()
+                results = list(pool.map(delete, [CLEANUP_ENDPOINTS[kind].format(i) for i in ids]))
+                ids[:] = [i for i, ok in zip(ids, results) if not ok]
+                stats[kind] = {'deleted': sum(results), 'failed': len(ids),
+                               'seconds': time.perf_counter() - start}
+        return stats
+
+    def cleanup_sql(self, db_config: Dict = None, batch_size: int = 1000,
+                    kinds: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """直连 MySQL 清理：先按 tag 补全实体 ID，再按依赖顺序分批 DELETE ... WHERE id IN (...)
+
+        除记录的 ID 外，还会删除这些订单/代理关联的全部流水和订单。
+        kinds 限定只清理其中的类别，如 api 清理后补删 SQL_ONLY_KINDS。
+        """
+        import pymysql
+        from seed_data import DB_CONFIG
+
+        conn = pymysql.connect(charset='utf8mb4', autocommit=False, **{**DB_CONFIG, **(db_config or {})})
+        pattern = f"%{self.run_id}%"
+        kinds = [kind for kind in CLEANUP_ORDER if kinds is None or kind in kinds]
+        stats = {}
+        try:
+            with conn.cursor() as cursor:
+                ids = {kind: set(values) for kind, values in self.entities.items()}
+                for kind, table, column in [('product_ids', 'products', 'name'), ('agent_ids', 'agents', 'name'),
+                                            ('promotion_ids', 'promotions', 'name'),
+                                            ('payment_account_ids', 'payment_accounts', 'name'),
+                                            ('truck_type_ids', 'truck_types', 'name'),
+                                            ('driver_ids', 'drivers', 'name'),
+                                            ('transaction_ids', 'transactions', 'remark'),
+                                            ('order_ids', 'orders', 'remark')]:
+                    if kind not in kinds:
+                        continue
+                    cursor.execute(f"SELECT id FROM `{table}` WHERE `{column}` LIKE %s", (pattern,))
+                    ids[kind].update(row[0] for row in cursor.fetchall())
+
+                def delete(kind: str, column: str, values):
+                    values = list(values)
+                    start = time.perf_counter()
+                    deleted = 0
+                    for offset in range(0, len(values), batch_size):
+                        batch = values[offset:offset + batch_size]
+                        deleted += cursor.execute(
+                            f"DELETE FROM `{CLEANUP_TABLES[kind]}` WHERE `{column}` IN "
+                            f"({', '.join(['%s'] * len(batch))})", batch)
+                    conn.commit()
+                    stat = stats.setdefault(kind, {'deleted': 0, 'failed': 0, 'seconds': 0.0})
+                    stat['deleted'] += deleted
+                    stat['seconds'] += time.perf_counter() - start
+
+                if 'order_ids' in kinds:
+                    delete('transaction_ids', 'related_order_id', ids['order_ids'])
+                if 'agent_ids' in kinds:
+                    delete('transaction_ids', 'agent_id', ids['agent_ids'])
+                    delete('order_ids', 'agent_id', ids['agent_ids'])
+                for kind in kinds:
+                    delete(kind, 'id', ids[kind])
+        finally:
+            conn.close()
+        for kind in kinds:
+            self.entities[kind].clear()
+        return stats
 
 
 class NomurTester:
     """Nomur API测试器"""
     
-    def __init__(self):
+    def __init__(self, run_id: Optional[str] = None, cleanup: str = 'api', db_config: Dict = None,
+                 cleanup_concurrency: int = 8):
         self.client = APIClient()
+        self.tracker = RunTracker(run_id)
+        self.cleanup = cleanup
+        self.db_config = db_config
+        self.cleanup_concurrency = cleanup_concurrency
+        self.admin_headers = {}
+        # *_ids 与 tracker.entities 是同一组列表，测试中 append 的 ID 即被记录待清理
         self.test_data = {
-            'product_ids': [],
-            'agent_ids': [],
-            'order_ids': [],
-            'transaction_ids': [],
-            'promotion_ids': [],
-            'payment_account_ids': [],
+            **self.tracker.entities,
             'admin_phone': '13800000001',  # 测试用的管理员手机号
             'agent_phone': '13800000002',  # 测试用的代理手机号
         }
@@ -276,6 +1253,7 @@ class NomurTester:
             
             data = response.get('data', {})
             if response.get('code') == 0 and data.get('authorized'):
+                self.admin_headers = {'admin-id': data.get('userId'), 'admin-role': data.get('role')}
                 TestReporter.record('管理员认证', TestStatus.PASS, f"认证成功: {data.get('userName')}", 
                                   duration, details=data)
             else:
@@ -311,7 +1289,7 @@ class NomurTester:
         start_time = time.time()
         try:
             product_data = {
-                'name': f'测试商品_{uuid.uuid4().hex[:8]}',
+                'name': self.tracker.tag(f'测试商品_{uuid.uuid4().hex[:8]}'),
                 'image': 'https://example.com/product.jpg',
                 'price': 299.00,
                 'weight': 5.5,
@@ -399,7 +1377,7 @@ class NomurTester:
         start_time = time.time()
         try:
             agent_data = {
-                'name': f'测试代理_{uuid.uuid4().hex[:8]}',
+                'name': self.tracker.tag(f'测试代理_{uuid.uuid4().hex[:8]}'),
                 'phone1': f'138{int(time.time()) % 100000000:08d}',
                 'phone2': '',
                 'address': '测试地址123号',
@@ -521,7 +1499,7 @@ class NomurTester:
                 'agentId': agent_id,
                 'amount': 1000.00,
                 'reason': 'payment',
-                'remark': '测试充值'
+                'remark': self.tracker.tag('测试充值')
             }
             response = self.client.post('/transactions/recharge', recharge_data)
             duration = time.time() - start_time
@@ -549,7 +1527,7 @@ class NomurTester:
                 'agentId': agent_id,
                 'amount': 100.00,
                 'reason': 'shipping',
-                'remark': '测试扣款'
+                'remark': self.tracker.tag('测试扣款')
             }
             response = self.client.post('/transactions/deduct', deduct_data)
             duration = time.time() - start_time
@@ -591,6 +1569,7 @@ class NomurTester:
             duration = time.time() - start_time
             
             if response.get('code') == 0 and response.get('data', {}).get('inTxId'):
+                self.test_data['transaction_ids'] += [response['data']['inTxId'], response['data']['outTxId']]
                 TestReporter.record('调货', TestStatus.PASS, '调货成功', duration)
             else:
                 TestReporter.record('调货', TestStatus.FAIL, '调货失败', duration, details=response)
@@ -640,7 +1619,8 @@ class NomurTester:
                 'totalWeight': 55.0,
                 'totalAmount': 2990.00,
                 'driverPhone': '13800000000',
-                'images': []
+                'images': [],
+                'remark': self.tracker.tag('测试订单')
             }
             response = self.client.post('/orders', order_data)
             duration = time.time() - start_time
@@ -724,7 +1704,7 @@ class NomurTester:
         try:
             product_id = self.test_data['product_ids'][0]
             promotion_data = {
-                'name': f'测试促销_{uuid.uuid4().hex[:8]}',
+                'name': self.tracker.tag(f'测试促销_{uuid.uuid4().hex[:8]}'),
                 'description': '测试促销描述',
                 'threshold': 100,
                 'gifts': [{
@@ -770,7 +1750,7 @@ class NomurTester:
         start_time = time.time()
         try:
             account_data = {
-                'name': f'测试账户_{uuid.uuid4().hex[:8]}',
+                'name': self.tracker.tag(f'测试账户_{uuid.uuid4().hex[:8]}'),
                 'accountNo': '6222000000000000',
                 'bankName': '测试银行',
                 'qrCode': ''
@@ -849,13 +1829,14 @@ class NomurTester:
         start_time = time.time()
         try:
             driver_data = {
-                'name': f'测试司机_{uuid.uuid4().hex[:8]}',
+                'name': self.tracker.tag(f'测试司机_{uuid.uuid4().hex[:8]}'),
                 'phone': f'139{int(time.time()) % 100000000:08d}'
             }
             response = self.client.post('/drivers', driver_data)
             duration = time.time() - start_time
             
             if response.get('code') == 0 and response.get('data', {}).get('id'):
+                self.test_data['driver_ids'].append(response['data']['id'])
                 TestReporter.record('创建司机', TestStatus.PASS, '创建成功', duration)
             else:
                 TestReporter.record('创建司机', TestStatus.FAIL, '创建失败', duration, details=response)
@@ -887,7 +1868,7 @@ class NomurTester:
         start_time = time.time()
         try:
             truck_data = {
-                'name': f'测试车型_{uuid.uuid4().hex[:8]}',
+                'name': self.tracker.tag(f'测试车型_{uuid.uuid4().hex[:8]}'),
                 'minWeight': 1000,
                 'maxWeight': 5000,
                 'isDefault': False
@@ -896,6 +1877,7 @@ class NomurTester:
             duration = time.time() - start_time
             
             if response.get('code') == 0 and response.get('data', {}).get('id'):
+                self.test_data['truck_type_ids'].append(response['data']['id'])
                 TestReporter.record('创建车型', TestStatus.PASS, '创建成功', duration)
             else:
                 TestReporter.record('创建车型', TestStatus.FAIL, '创建失败', duration, details=response)
@@ -953,16 +1935,252 @@ class NomurTester:
     # ==================== 清理测试数据 ====================
     
     def cleanup_test_data(self):
-        """清理测试数据（可选）"""
-        # 注意：实际项目中可能需要根据业务需求决定是否清理测试数据
-        TestReporter.record('清理测试数据', TestStatus.PASS, '测试数据保留在数据库中（可根据需要清理）', 0)
+        """按依赖顺序清理本轮创建的测试数据（cleanup 为 api / sql / none）"""
+        if self.cleanup == 'none':
+            TestReporter.record('清理测试数据', TestStatus.PASS,
+                                f"测试数据保留在数据库中（运行ID: {self.tracker.run_id}）", 0)
+            return
+
+        total = self.tracker.count()
+        start_time = time.time()
+        try:
+            sql_error = None
+            if self.cleanup == 'sql':
+                stats = self.tracker.cleanup_sql(self.db_config)
+            else:
+                stats = self.tracker.cleanup_api(self.client.base_url, self.admin_headers,
+                                                 self.cleanup_concurrency)
+                # 收款账户、司机没有硬删除接口，改为直连 MySQL 删除；连不上时如实报告残留
+                leftover = [kind for kind in SQL_ONLY_KINDS if self.tracker.entities[kind]]
+                if leftover:
+                    try:
+                        stats.update(self.tracker.cleanup_sql(self.db_config, kinds=leftover))
+                    except Exception as e:
+                        sql_error = f"{type(e).__name__}: {e}"
+            duration = time.time() - start_time
+            deleted = sum(stat['deleted'] for stat in stats.values())
+            failed = sum(stat['failed'] for stat in stats.values())
+            left = {kind: stat['left'] for kind, stat in stats.items() if stat.get('left')}
+            details = {kind: {**stat, 'seconds': round(stat['seconds'], 3)} for kind, stat in stats.items()}
+            details['run_id'] = self.tracker.run_id
+            message = f"{self.cleanup} 方式删除 {deleted} 条（记录 {total} 个实体），耗时 {duration:.2f}秒"
+            if failed:
+                message += f"，{failed} 个删除失败"
+            if left:
+                message += (f"，{'、'.join(f'{kind} {count} 个' for kind, count in left.items())}"
+                            f"没有硬删除接口、SQL 清理失败（{sql_error}），仍留在数据库中")
+            if failed or left:
+                TestReporter.record('清理测试数据', TestStatus.FAIL, message, duration, details=details)
+            else:
+                TestReporter.record('清理测试数据', TestStatus.PASS, message, duration, details=details)
+        except Exception as e:
+            duration = time.time() - start_time
+            TestReporter.record('清理测试数据', TestStatus.ERROR, str(e), duration, error=traceback.format_exc())
+
+
+# 性能门禁的固定基准组合：只读接口，{agent_id} 取 GET /agents 返回的第一个代理
+GATE_ENDPOINTS = [
+    '/orders',
+    '/agents',
+    '/agents/{agent_id}',
+    '/agents/{agent_id}/promotions/progress',
+    '/agents/{agent_id}/statistics',
+    '/products',
+    '/promotions',
+    '/transactions',
+    '/statistics',
+]
+GATE_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perf_baseline.json')
+GATE_PERCENTILES = (50, 95, 99)
+
+
+class PerfGate:
+    """性能回归门禁
+
+    按固定顺序轮流请求 GATE_ENDPOINTS，先预热 warmup 轮（不计入），再测量 requests 轮，
+    得到各接口的 p50/p95/p99，与已提交的基线 JSON 比较。基线格式：
+    {"profile": {"requests": 100, "warmup": 5}, "tolerance": 0.2, "min_delta_ms": 2,
+     "endpoints": {"GET /orders": {"p50": 12.3, "p95": 20.1, "p99": 31.0, "tolerance": 0.3}, ...}}
+    某个百分位超过 基线 × (1 + tolerance) + min_delta_ms 即为退化；接口级的 tolerance 覆盖全局值，
+    min_delta_ms 避免亚毫秒级接口因抖动误报。
+    """
+
+    def __init__(self, base_url: str = BASE_URL, requests_per_endpoint: int = 100, warmup: int = 5):
+        self.client = APIClient(base_url, record_latency=False)
+        self.requests_per_endpoint = requests_per_endpoint
+        self.warmup = warmup
+        self.stats: Dict[str, EndpointLatency] = {}
+
+    def paths(self) -> List[str]:
+        agents = self.client.get('/agents').get('data') or []
+        if not agents:
+            raise RuntimeError("数据库中没有代理商，无法执行固定基准组合")
+        return [path.format(agent_id=agents[0]['id']) for path in GATE_ENDPOINTS]
+
+    def run(self) -> Dict[str, EndpointLatency]:
+        paths = self.paths()
+        for round_index in range(self.warmup + self.requests_per_endpoint):
+            for path in paths:
+                start = time.perf_counter()
+                failed = False
+                try:
+                    failed = self.client.get(path).get('code') != 0
+                except Exception:
+                    failed = True
+                end = time.perf_counter()
+                if round_index >= self.warmup:
+                    key = endpoint_key('GET', path)
+                    self.stats.setdefault(key, EndpointLatency()).record(start, start, end, error=failed,
+                                                                         detail=f"GET {path}")
+        return self.stats
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {endpoint: {f"p{p}": round(latency.response.value_at_percentile(p) / 1000.0, 3)
+                           for p in GATE_PERCENTILES}
+                for endpoint, latency in sorted(self.stats.items())}
+
+    def save_baseline(self, path: str, tolerance: float, min_delta_ms: float):
+        baseline = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'profile': {'requests': self.requests_per_endpoint, 'warmup': self.warmup},
+            'tolerance': tolerance,
+            'min_delta_ms': min_delta_ms,
+            'endpoints': self.summary(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+
+    def check(self, baseline: Dict, tolerance: Optional[float] = None) -> List[str]:
+        """返回退化描述列表，为空表示通过；tolerance 不为 None 时覆盖基线中的全局容差"""
+        default_tolerance = tolerance if tolerance is not None else baseline.get('tolerance', 0.2)
+        min_delta_ms = baseline.get('min_delta_ms', 0)
+        current = self.summary()
+        failures = []
+        for endpoint, expected in sorted(baseline.get('endpoints', {}).items()):
+            if endpoint not in current:
+                failures.append(f"{endpoint}: 本次未测量")
+                continue
+            errors = self.stats[endpoint].errors
+            if errors:
+                failures.append(f"{endpoint}: {errors} 个请求失败")
+            endpoint_tolerance = expected.get('tolerance', default_tolerance)
+            for p in GATE_PERCENTILES:
+                name = f"p{p}"
+                if name not in expected:
+                    continue
+                limit = expected[name] * (1 + endpoint_tolerance) + min_delta_ms
+                if current[endpoint][name] > limit:
+                    failures.append(f"{endpoint}: {name} {current[endpoint][name]:.1f}ms 超过上限 {limit:.1f}ms"
+                                    f"（基线 {expected[name]:.1f}ms，容差 {endpoint_tolerance * 100:g}%）")
+        return failures
+
+    def report(self, baseline: Optional[Dict] = None) -> str:
+        expected = (baseline or {}).get('endpoints', {})
+        lines = [f"{'接口':<44}{'请求数':>8}{'错误':>6}" + ''.join(f"{f'p{p}':>18}" for p in GATE_PERCENTILES)]
+        for endpoint, values in self.summary().items():
+            cells = []
+            for p in GATE_PERCENTILES:
+                base = expected.get(endpoint, {}).get(f"p{p}")
+                cell = f"{values[f'p{p}']:.1f}"
+                if base:
+                    cell += f"({values[f'p{p}'] / base * 100 - 100:+.0f}%)"
+                cells.append(f"{cell:>18}")
+            latency = self.stats[endpoint]
+            lines.append(f"{endpoint:<44}{latency.count:>8}{latency.errors:>6}" + ''.join(cells))
+        return '\n'.join(lines)
+
+
+def run_perf_gate(args) -> int:
+    """执行性能门禁，返回进程退出码"""
+    baseline = None
+    if not args.update_baseline:
+        try:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"基线文件不存在: {args.baseline}\n请先对本地服务执行 --perf-gate --update-baseline 生成并提交")
+            return 2
+    profile = (baseline or {}).get('profile', {})
+    requests_per_endpoint = args.gate_requests or profile.get('requests', 100)
+    warmup = profile.get('warmup', 5) if args.gate_warmup is None else args.gate_warmup
+
+    gate = PerfGate(args.base_url, requests_per_endpoint, warmup)
+    print(f"性能门禁: {len(GATE_ENDPOINTS)} 个接口，每个预热 {warmup} 次、测量 {requests_per_endpoint} 次\n")
+    start = time.perf_counter()
+    gate.run()
+    elapsed = time.perf_counter() - start
+    print(gate.report(baseline))
+    if not args.no_history:
+        from benchmark_history import dataset_size, record_run
+        size = args.dataset_size if args.dataset_size is not None else dataset_size()
+        record_run('perf_gate', gate.stats, elapsed=elapsed, dataset_size=size,
+                   label=f"requests={requests_per_endpoint} warmup={warmup}")
+
+    if args.update_baseline:
+        tolerance = args.tolerance if args.tolerance is not None else 0.2
+        gate.save_baseline(args.baseline, tolerance, args.min_delta_ms)
+        print(f"\n基线已写入: {args.baseline}")
+        return 0
+    failures = gate.check(baseline, args.tolerance)
+    if failures:
+        print(f"\n✗ 性能门禁未通过，{len(failures)} 项退化:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\n✓ 性能门禁通过")
+    return 0
 
 
 def main():
     """主函数"""
-    tester = NomurTester()
+    parser = argparse.ArgumentParser(description='Nomur API 自动化测试')
+    parser.add_argument('--run-id', default=None, help='运行ID，写入测试数据名称用于清理，默认自动生成')
+    parser.add_argument('--cleanup', choices=['api', 'sql', 'none'], default='api',
+                        help='测试结束后的清理方式：api 并发调用删除接口（收款账户、司机没有硬删除接口，'
+                             '仍直连 MySQL 删除），sql 直连 MySQL 批量删除，none 保留数据')
+    parser.add_argument('--cleanup-concurrency', type=int, default=8, help='api 清理的并发数')
+    parser.add_argument('--no-history', action='store_true', help='不把接口延迟写入基准历史库')
+    parser.add_argument('--dataset-size', type=int, default=None,
+                        help='记录到基准历史的数据规模（订单行数），默认从数据库读取')
+    parser.add_argument('--base-url', default=BASE_URL, help='性能门禁的 API 地址')
+    parser.add_argument('--perf-gate', action='store_true',
+                        help='只运行固定基准组合并与基线比较，有接口退化时退出码为 1')
+    parser.add_argument('--baseline', default=GATE_BASELINE, help='性能基线 JSON 文件')
+    parser.add_argument('--update-baseline', action='store_true', help='用本次结果重写基线文件')
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help='允许的百分位增幅（0.2 即 20%%），默认取基线文件中的值')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help='写入基线的绝对容差（毫秒），避免极快接口因抖动误报')
+    parser.add_argument('--gate-requests', type=int, default=None,
+                        help='每个接口的测量次数，默认取基线文件中的值（100）')
+    parser.add_argument('--gate-warmup', type=int, default=None, help='每个接口的预热次数')
+    parser.add_argument('--phase-timing', action='store_true',
+                        help='输出各接口分阶段耗时（DNS/连接/首字节/传输/解码）、连接复用率和响应大小')
+    args = parser.parse_args()
+
+    if args.perf_gate:
+        sys.exit(run_perf_gate(args))
+
+    tester = NomurTester(args.run_id, args.cleanup, cleanup_concurrency=args.cleanup_concurrency)
+    phase_stats = PhaseTimingStats() if args.phase_timing else None
+    tester.client.timing_hook = phase_stats
+    print(f"运行ID: {tester.tracker.run_id}")
+    # 数据规模在测试写入数据之前读取
+    size = None
+    if not args.no_history:
+        from benchmark_history import dataset_size
+        size = args.dataset_size if args.dataset_size is not None else dataset_size()
+    start = time.perf_counter()
     tester.run_all_tests()
+    elapsed = time.perf_counter() - start
     TestReporter.generate_report()
+    if phase_stats is not None:
+        print(f"\n接口分阶段耗时（毫秒，中位数）:\n{phase_stats.report()}")
+        print(f"连接: {tester.client.connection_stats.summary()}")
+    if not args.no_history and LATENCY_STATS:
+        from benchmark_history import record_run
+        record_run('api_test', LATENCY_STATS, elapsed=elapsed, dataset_size=size)
 
 
 if __name__ == '__main__':
@@ -22,11 +22,14 @@ from dataclasses import dataclass, field
 from enum import Enum
 import os
 
+from html_report import HtmlReport
+from result_sink import ReporterBackend, ResultSink, read_results
+
 
 # 测试配置
 BASE_URL = "https://nomur.linkmate.site"  # 生产环境地址
-TEST_RESULTS = []
-TEST_ISSUES = []
+RESULT_SINK = ResultSink('selenium_test_results')  # 每条结果追加写入 JSONL，内存中只保留汇总和最近的问题
+REPORTER = ReporterBackend(RESULT_SINK)  # 各线程先写自己的缓冲区，生成报告前合并
 WAIT_TIMEOUT = 10  # 等待超时时间（秒）
 
 
@@ -63,25 +66,27 @@ class TestReporter:
             error=error,
             details=details or {}
         )
-        TEST_RESULTS.append(result)
-        if status not in [TestStatus.PASS, TestStatus.SKIP]:
-            TEST_ISSUES.append(result)
+        REPORTER.add(result, is_issue=status not in [TestStatus.PASS, TestStatus.SKIP])
         
+        # 一次写出整条输出，避免多线程时行内交错
         status_icon = "✓" if status == TestStatus.PASS else ("⊘" if status == TestStatus.SKIP else "✗")
-        print(f"{status_icon} [{status.value}] {test_name}: {message}")
+        line = f"{status_icon} [{status.value}] {test_name}: {message}\n"
         if error:
-            print(f"   错误: {error[:200]}")  # 限制错误信息长度
+            line += f"   错误: {error[:200]}\n"  # 限制错误信息长度
+        print(line, end='')
     
     @staticmethod
     def generate_report():
-        """生成测试报告"""
-        total = len(TEST_RESULTS)
-        passed = len([r for r in TEST_RESULTS if r.status == TestStatus.PASS])
-        failed = len([r for r in TEST_RESULTS if r.status == TestStatus.FAIL])
-        errors = len([r for r in TEST_RESULTS if r.status == TestStatus.ERROR])
-        skipped = len([r for r in TEST_RESULTS if r.status == TestStatus.SKIP])
+        """生成测试报告，详细结果从 JSONL 结果文件逐条读回写入报告文件"""
+        REPORTER.collect()
+        RESULT_SINK.flush()
+        total = len(RESULT_SINK)
+        passed = RESULT_SINK.count(TestStatus.PASS)
+        failed = RESULT_SINK.count(TestStatus.FAIL)
+        errors = RESULT_SINK.count(TestStatus.ERROR)
+        skipped = RESULT_SINK.count(TestStatus.SKIP)
         
-        report = f"""
+        summary = f"""
 {'='*80}
 Selenium UI自动化测试报告
 {'='*80}
@@ -92,39 +97,49 @@ Selenium UI自动化测试报告
 失败: {failed} ({failed/total*100:.1f}% if total > 0 else 0)
 错误: {errors} ({errors/total*100:.1f}% if total > 0 else 0)
 跳过: {skipped} ({skipped/total*100:.1f}% if total > 0 else 0)
+结果明细: {RESULT_SINK.path}
 {'='*80}
-
-详细结果:
 """
         
-        for result in TEST_RESULTS:
-            report += f"\n[{result.status.value}] {result.test_name}\n"
-            report += f"  消息: {result.message}\n"
-            report += f"  耗时: {result.duration:.3f}秒\n"
-            if result.screenshot:
-                report += f"  截图: {result.screenshot}\n"
-            if result.error:
-                report += f"  错误: {result.error}\n"
-        
-        if TEST_ISSUES:
-            report += f"\n{'='*80}\n发现的问题:\n{'='*80}\n"
-            for issue in TEST_ISSUES:
-                report += f"\n[{issue.status.value}] {issue.test_name}\n"
-                report += f"  消息: {issue.message}\n"
+        tail = ""
+        if RESULT_SINK.issues:
+            tail += f"\n{'='*80}\n发现的问题:\n{'='*80}\n"
+            if RESULT_SINK.issue_count > len(RESULT_SINK.issues):
+                tail += f"（共 {RESULT_SINK.issue_count} 个，仅列出最近 {len(RESULT_SINK.issues)} 个，完整记录见结果明细）\n"
+            for issue in RESULT_SINK.issues:
+                tail += f"\n[{issue.status.value}] {issue.test_name}\n"
+                tail += f"  消息: {issue.message}\n"
                 if issue.screenshot:
-                    report += f"  截图: {issue.screenshot}\n"
+                    tail += f"  截图: {issue.screenshot}\n"
                 if issue.error:
-                    report += f"  错误: {issue.error}\n"
+                    tail += f"  错误: {issue.error}\n"
         
-        report += f"\n{'='*80}\n"
+        tail += f"\n{'='*80}\n"
         
         # 保存到文件
         report_file = f"selenium_test_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
         with open(report_file, 'w', encoding='utf-8') as f:
-            f.write(report)
+            f.write(summary)
+            f.write("\n详细结果:\n")
+            for result in read_results(RESULT_SINK.path):
+                f.write(f"\n[{result['status']}] {result['test_name']}\n")
+                f.write(f"  消息: {result['message']}\n")
+                f.write(f"  耗时: {result['duration']:.3f}秒\n")
+                if result.get('screenshot'):
+                    f.write(f"  截图: {result['screenshot']}\n")
+                if result.get('error'):
+                    f.write(f"  错误: {result['error']}\n")
+            f.write(tail)
+        
+        # 同名的自包含 HTML 报告，截图以 base64 内嵌
+        html_report = HtmlReport('Nomur Selenium UI 测试报告')
+        html_report.add_results(RESULT_SINK.path)
+        html_file = html_report.write(report_file[:-len('.txt')] + '.html')
         
+        report = summary + tail
         print(report)
         print(f"\n报告已保存到: {report_file}")
+        print(f"HTML 报告: {html_file}")
         
         return report
 